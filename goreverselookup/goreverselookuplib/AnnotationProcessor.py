@@ -11,6 +11,11 @@ from tqdm import trange, tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 from .FileUtil import FileUtil
 from .CacheUtils import ConnectionCacher, Cacher
+from .HttpUtils import AsyncRetryPolicy
+from .HttpTransport import HttpTransport
+from .JsonUtil import JsonStreamArrayParser
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import aiohttp, asyncio
 
 import logging
@@ -21,18 +26,43 @@ class GOApi:
     """
     This class enables the user to interact with the Gene Ontology database via http requests.
     """
+    # the databases (and their taxa), whose products are accepted in the GO Term product queries
+    APPROVED_DATABASES = [["UniProtKB", ["NCBITaxon:9606"]],
+                      ["ZFIN", ["NCBITaxon:7955"]],
+                      #["RNAcentral", ["NCBITaxon:9606"]],
+                      ["Xenbase", ["NCBITaxon:8364"]],
+                      ["MGI", ["NCBITaxon:10090"]],
+                      ["RGD", ["NCBITaxon:10116"]]]
+    # the timeout of a streamed window of get_products_paginated_async: there is no total timeout (a big window can take long to stream),
+    # but a connection attempt or a stalled read (no bytes received) fails after these amounts of seconds and is retried by the AsyncRetryPolicy
+    PAGE_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+    
     def __init__(self):
-        # Set up a retrying session
+        self.s = self._create_session()
+        self._thread_local = threading.local() # the sessions of the get_products worker threads (a requests.Session isn't guaranteed to be thread-safe)
+
+    def _create_session(self) -> requests.Session:
+        """
+        Returns a retrying requests.Session, which also supports the record/replay modes of HttpTransport.
+        """
         retry_strategy = Retry(
             total=3,
             status_forcelist=[429, 500, 502, 503, 504],
             backoff_factor=0.3
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HttpTransport.get_adapter(max_retries=retry_strategy)
         session = requests.Session()
         session.mount("http://", adapter)
         session.mount("https://", adapter)
-        self.s = session
+        return session
+
+    def _get_thread_session(self) -> requests.Session:
+        """
+        Returns the session of the current (get_products worker) thread, which is created on the first call in each thread.
+        """
+        if getattr(self._thread_local, "session", None) == None:
+            self._thread_local.session = self._create_session()
+        return self._thread_local.session
 
     def get_data(self, term_id, get_url_only = False):
         """
@@ -60,22 +90,27 @@ class GOApi:
             logger.warning(f"Error: {e}")
             return None
 
-    def get_products(self, term_id, get_url_only=False, request_params = {"rows": 10000000}): 
+    def get_products(self, term_id, get_url_only=False, request_params = {"rows": 10000000}, page_size:int = 10000, max_concurrent_pages:int = 4): 
         """
         Fetches product IDs (gene ids) associated with a given term ID from the Gene Ontology API. The product IDs can be of any of the following
         databases: UniProt, ZFIN, Xenbase, MGI, RGD [TODO: enable the user to specify databases himself]
 
         The request uses this link: http://api.geneontology.org/api/bioentity/function/{term_id}/genes
 
+        The associations are fetched in start/rows windows of 'page_size' rows. The first window also returns the total amount of associations ('numFound'),
+        the remaining windows are then fetched concurrently (at most 'max_concurrent_pages' at once). The response of each window is streamed and the associations
+        are filtered against APPROVED_DATABASES as they are parsed, so that big terms (eg. GO:0001525) are never held in memory as a whole json document.
+
+        Parameters:
+          - (str) term_id
+          - (bool) get_url_only: if True, only the url (with request_params) is returned
+          - (dict) request_params: the request parameters. request_params['rows'] is the maximum amount of associations fetched for the term.
+          - (int) page_size: the amount of rows in a single window
+          - (int) max_concurrent_pages: the maximum amount of windows fetched at once
+
         Returns:
-          - (string as json) data: a json string, representing the api request response
+          - (list) products: a list of product ids, or None if any of the windows failed
         """
-        APPROVED_DATABASES = [["UniProtKB", ["NCBITaxon:9606"]],
-                      ["ZFIN", ["NCBITaxon:7955"]],
-                      #["RNAcentral", ["NCBITaxon:9606"]],
-                      ["Xenbase", ["NCBITaxon:8364"]],
-                      ["MGI", ["NCBITaxon:10090"]],
-                      ["RGD", ["NCBITaxon:10116"]]]
         url = f"http://api.geneontology.org/api/bioentity/function/{term_id}/genes"
         params = request_params
         
@@ -89,23 +124,63 @@ class GOApi:
             url = prepared_request.url
             return url
 
-        products_set = set()
-        max_retries = 5 # try api requests for max 5 times
+        max_rows = int(request_params.get("rows", 10000000))
+        page_size = min(page_size, max_rows)
+        
+        first_page = self._get_products_page(term_id, url, {**request_params, "start": 0, "rows": page_size})
+        if first_page == None:
+            return None
+        products_set = first_page["products"]
+        
+        if first_page["numFound"] != None:
+            # the total amount of associations is known, fetch the remaining windows concurrently
+            windows = self.get_page_windows(first_page["numFound"], page_size, max_rows)
+            with ThreadPoolExecutor(max_workers=max_concurrent_pages) as executor:
+                # each worker thread uses its own session, the sessions aren't shared between the threads
+                pages = list(executor.map(lambda window: self._get_products_page(term_id, url, {**request_params, "start": window[0], "rows": window[1]}, session=self._get_thread_session()), windows))
+            if None in pages:
+                return None
+            for page in pages:
+                products_set.update(page["products"])
+        else:
+            # the total amount of associations is unknown, fetch the windows one after another until a window isn't full
+            start = page_size
+            page = first_page
+            while page["numParsed"] == page_size and start < max_rows:
+                page = self._get_products_page(term_id, url, {**request_params, "start": start, "rows": min(page_size, max_rows - start)})
+                if page == None:
+                    return None
+                products_set.update(page["products"])
+                start += page_size
+
+        products = list(products_set)
+        logger.info(f"Fetched products for GO term {term_id}")
+        return products
+
+    def _get_products_page(self, term_id:str, url:str, params:dict, max_retries:int = 5, session:requests.Session = None):
+        """
+        Fetches a single start/rows window of the product associations for 'term_id' (see get_products). The response is streamed
+        and only the products from APPROVED_DATABASES are kept. The window is fetched with 'session' (self.s if not supplied).
+
+        Returns a dictionary {"products": (set) product ids, "numFound": (int) total amount of associations or None, "numParsed": (int) amount of parsed associations}
+        or None, if the window couldn't be fetched in 'max_retries' attempts.
+        """
+        if session == None:
+            session = self.s
         for i in range(max_retries):
             try:
-                response = self.s.get(url, params=params, timeout=5)
-                response.raise_for_status()
-
-                json = response.json()
-                for assoc in json['associations']:
-                    if assoc['object']['id'] == term_id and any((database[0] in assoc['subject']['id'] and any(taxon in assoc['subject']['taxon']['id'] for taxon in database[1])) for database in APPROVED_DATABASES):
-                        product_id = assoc['subject']['id']
-                        products_set.add(product_id)
-                products = list(products_set)
-                logger.info(f"Fetched products for GO term {term_id}")
-                return products
-        
-            except (requests.exceptions.RequestException, JSONDecodeError) as e :
+                products_set = set()
+                parser = JsonStreamArrayParser("associations")
+                with session.get(url, params=params, timeout=5, stream=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=65536):
+                        for assoc in parser.feed(chunk):
+                            if self.is_approved_association(assoc, term_id):
+                                products_set.add(assoc['subject']['id'])
+                parser.close()
+                return {"products": products_set, "numFound": parser.get_int_field("numFound"), "numParsed": parser.element_count}
+        
+            except (requests.exceptions.RequestException, ValueError) as e : # ValueError also covers JSONDecodeError
                 if i == (max_retries - 1): # this was the last http request, it failed
                     logger.error(f"Experienced an http exception or a JSONDecodeError while fetching products for {term_id}")
                     error_log_filepath = FileUtil.find_win_abs_filepath("log_output/error_log")
@@ -125,7 +200,86 @@ class GOApi:
                 else:
                     #time.sleep(500) # sleep 500ms before trying another http request
                     time.sleep(0.5) # time.sleep is in SECONDS !!!
+        return None
+
+    @classmethod
+    def is_approved_association(cls, assoc:dict, term_id:str) -> bool:
+        """
+        Returns True if the association 'assoc' (an element of the 'associations' of a product query response) belongs to 'term_id'
+        and its subject (product) is from one of the APPROVED_DATABASES (and their taxa).
+        """
+        return assoc['object']['id'] == term_id and any((database[0] in assoc['subject']['id'] and any(taxon in assoc['subject']['taxon']['id'] for taxon in database[1])) for database in cls.APPROVED_DATABASES)
+
+    @classmethod
+    def get_page_windows(cls, num_found:int, page_size:int, max_rows:int) -> list:
+        """
+        Returns the (start, rows) windows, which remain to be fetched after the first window of 'page_size' rows, if there are 'num_found' associations in total,
+        but at most 'max_rows' should be fetched.
+        """
+        total_rows = min(num_found, max_rows)
+        return [(start, min(page_size, total_rows - start)) for start in range(page_size, total_rows, page_size)]
+
+    @classmethod
+    async def get_products_paginated_async(cls, term_id:str, session:aiohttp.ClientSession, retry_policy:AsyncRetryPolicy, request_params = {"rows":20000}, page_size:int = 5000, max_concurrent_pages:int = 4):
+        """
+        The async variant of get_products: the start/rows windows are fetched concurrently through 'session' (at most 'max_concurrent_pages' at once),
+        each window is streamed and its associations are filtered against APPROVED_DATABASES as they are parsed.
+        Transient errors are retried according to 'retry_policy', failed terms are recorded in retry_policy.statistics.failed_items.
+
+        Returns:
+          - (list) products: a list of product ids, or None if any of the windows failed after all retries
+        """
+        url = f"http://api.geneontology.org/api/bioentity/function/{term_id}/genes"
+        max_rows = int(request_params.get("rows", 10000000))
+        page_size = min(page_size, max_rows)
+
+        first_page = await cls._get_products_page_async(term_id, session, url, {**request_params, "start": 0, "rows": page_size}, retry_policy)
+        if first_page == None:
+            return None
+        products_set = first_page["products"]
+
+        if first_page["numFound"] != None:
+            semaphore = asyncio.Semaphore(max_concurrent_pages)
+            async def fetch_window(window):
+                async with semaphore:
+                    return await cls._get_products_page_async(term_id, session, url, {**request_params, "start": window[0], "rows": window[1]}, retry_policy)
+            pages = await asyncio.gather(*[fetch_window(window) for window in cls.get_page_windows(first_page["numFound"], page_size, max_rows)])
+            if None in pages:
                 return None
+            for page in pages:
+                products_set.update(page["products"])
+        else:
+            start = page_size
+            page = first_page
+            while page["numParsed"] == page_size and start < max_rows:
+                page = await cls._get_products_page_async(term_id, session, url, {**request_params, "start": start, "rows": min(page_size, max_rows - start)}, retry_policy)
+                if page == None:
+                    return None
+                products_set.update(page["products"])
+                start += page_size
+        
+        return list(products_set)
+
+    @classmethod
+    async def _get_products_page_async(cls, term_id:str, session:aiohttp.ClientSession, url:str, params:dict, retry_policy:AsyncRetryPolicy):
+        """
+        The async variant of _get_products_page.
+        """
+        async def consume(response:aiohttp.ClientResponse):
+            products_set = set()
+            parser = JsonStreamArrayParser("associations")
+            async for chunk in response.content.iter_chunked(65536):
+                for assoc in parser.feed(chunk):
+                    if cls.is_approved_association(assoc, term_id):
+                        products_set.add(assoc['subject']['id'])
+            parser.close()
+            return {"products": products_set, "numFound": parser.get_int_field("numFound"), "numParsed": parser.element_count}
+        
+        # bugfix: timeout=None disabled all timeouts (a stalled window hung forever), see PAGE_TIMEOUT
+        page = await retry_policy.request(session, url, consume, params=params, timeout=cls.PAGE_TIMEOUT, item_id=term_id)
+        if page == None or "products" not in page: # failed after all retries or a definitive error response
+            return None
+        return page
     
     async def get_products_async(self, term_id):
         """
@@ -271,7 +425,7 @@ class GOApi:
             http://api.geneontology.org/api/bioentity/gene/{gene_id}/function
         """
         url = f'http://api.geneontology.org/api/bioentity/gene/{gene_id}/function'
-        response = requests.get(url, params=request_params)
+        response = self.s.get(url, params=request_params)
         result_go_terms = []
 
         if response.status_code == 200:
@@ -581,6 +735,8 @@ class UniProtAPI:
     """
     This class enables the user to interact with the UniProtKB database via http requests.
     """
+    HOST = "rest.uniprot.org"
+
     def __init__(self):
         # Set up a retrying session
         retry_strategy = Retry(
@@ -588,13 +744,21 @@ class UniProtAPI:
             status_forcelist=[429, 500, 502, 503, 504],
             backoff_factor=0.3
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HttpTransport.get_adapter(max_retries=retry_strategy) # a HTTPAdapter, which also supports the record/replay modes of HttpTransport
         session = requests.Session()
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         self.s = session
         self.uniprot_query_exceptions = []
         self.async_request_sleep_delay = 0.5
+        self.retry_policy = AsyncRetryPolicy() # retry policy of the async requests, can be replaced with a policy shared between multiple apis
+
+    def is_available(self) -> bool:
+        """
+        Returns False if the circuit breaker of rest.uniprot.org (see self.retry_policy) is open, ie. UniProt is currently considered down
+        and the async requests are short-circuited. Callers should then fall back to offline sources (eg. GOAnnotiationsFile.get_uniprotkb_genename).
+        """
+        return not self.retry_policy.is_circuit_open(self.HOST)
     
     def get_uniprot_id(self, gene_name, get_url_only = False):
         """
@@ -612,8 +776,10 @@ class UniProtAPI:
         - str: UniProt ID if found, None otherwise OR the query url, if get_url_only is True
         """
         # data key is in the format [class_name][function_name][function_params]
-        uniprot_data_key = f"[{self.__class__.__name__}][{self.get_uniprot_id.__name__}][gene_name={gene_name}]"
-        previous_uniprot_id = Cacher.get_data("uniprot", uniprot_data_key)
+        uniprot_data_key = Cacher.function_key(self.__class__.__name__, "get_uniprot_id", gene_name=gene_name)
+        cache_status, previous_uniprot_id = Cacher.lookup("uniprot", uniprot_data_key)
+        if cache_status == Cacher.NEGATIVE and not get_url_only: # UniProt has no (reviewed) entry for this gene name
+            return None
         if previous_uniprot_id != None:
             logger.debug(f"Cached uniprot id {previous_uniprot_id} for gene name {gene_name}")
             return previous_uniprot_id
@@ -648,6 +814,7 @@ class UniProtAPI:
 
         # If no results were found, return None
         if len(results) == 0:
+            Cacher.store_negative("uniprot", uniprot_data_key, reason="No UniProt results")
             return None
 
         # If only one result was found, accept it automatically
@@ -670,6 +837,7 @@ class UniProtAPI:
 
         # If no reviewed result was found, return None
         if len(reviewed_ids) == 0:
+            Cacher.store_negative("uniprot", uniprot_data_key, reason="No reviewed UniProt results")
             return None
 
         # If only one reviewed result was found, accept it automatically
@@ -827,8 +995,10 @@ class UniProtAPI:
             uniprot_id = uniprot_id.split(":")[1]
         
         # Attempt to return previously cached function return value
-        uniprot_data_key = f"[{self.__class__.__name__}][{self.get_uniprot_info.__name__}][uniprot_id={uniprot_id}]"
-        previous_info = Cacher.get_data("uniprot", uniprot_data_key)
+        uniprot_data_key = Cacher.function_key(self.__class__.__name__, "get_uniprot_info", uniprot_id=uniprot_id) # shared with get_uniprot_info_async
+        cache_status, previous_info = Cacher.lookup("uniprot", uniprot_data_key)
+        if cache_status == Cacher.NEGATIVE: # UniProt has no entry for this uniprot id
+            return {}
         if previous_info != None:
             logger.debug(f"Returning cached info for uniprot id {uniprot_id}: {previous_info}")
             return previous_info
@@ -843,7 +1013,7 @@ class UniProtAPI:
             response_json = previous_response
         else:
             try:
-                response = requests.get(url, timeout=5)
+                response = self.s.get(url, timeout=5)
                 response.raise_for_status()
                 response_json = response.json()
                 Cacher.store_data("url", url, response_json)
@@ -855,6 +1025,9 @@ class UniProtAPI:
         logger.debug(f"url = {url}")
         logger.debug(f"response_json = {response_json}")
         results = response_json["results"]
+        if len(results) == 0:
+            Cacher.store_negative("uniprot", uniprot_data_key, reason="No UniProt results")
+            return {}
         return_value = self._process_uniprot_info_query_results(results, uniprot_id)
         
         # cache function result
@@ -979,6 +1152,11 @@ class UniProtAPI:
         
         Parameters:
           - (str) uniprot_id
+          - (aiohttp.ClientSession) session
+        
+        Transient errors (429, 5xx, timeouts) are retried according to self.retry_policy. If the query fails after all retries, None is returned
+        and the 'uniprot_id' is recorded in self.retry_policy.statistics.failed_items. If UniProt has no entry for the 'uniprot_id' (a definitive error response
+        or no results, also when cached as a negative entry), an empty dictionary is returned, the same as in get_uniprot_info.
         
         If the query is successful, returns the following dictionary:
             {
@@ -1087,12 +1265,15 @@ class UniProtAPI:
         }
         """
         # Extract UniProt ID if given in "database:identifier" format
+        item_id = uniprot_id # the id, under which a failed query is recorded in the retry statistics
         if ":" in uniprot_id:
             uniprot_id = uniprot_id.split(":")[1]
 
         # Attempt to cache previous function result
-        uniprot_data_key = f"[{self.__class__.__name__}][{self.get_uniprot_info_async.__name__}][uniprot_id={uniprot_id}]"
-        previous_result = Cacher.get_data("uniprot", uniprot_data_key)
+        uniprot_data_key = Cacher.function_key(self.__class__.__name__, "get_uniprot_info", uniprot_id=uniprot_id) # shared with get_uniprot_info
+        cache_status, previous_result = Cacher.lookup("uniprot", uniprot_data_key)
+        if cache_status == Cacher.NEGATIVE: # a previous query received a definitive error response (or no results); the same value as returned by get_uniprot_info
+            return {}
         if previous_result != None:
             logger.debug(f"Returning cached info for uniprot id {uniprot_id}: {previous_result}")
             return previous_result
@@ -1106,23 +1287,13 @@ class UniProtAPI:
         if previous_response != None:
             response_json = previous_response
         else:
-            asyncio.sleep(self.async_request_sleep_delay)
-            QUERY_RETRIES = 3 # TODO: make parameter
-            i = 0
-            for _ in range (QUERY_RETRIES):
-                if i == (QUERY_RETRIES-1):
-                    return None
-                i += 1
-                try:
-                    response = await session.get(url, timeout=5)
-                    response_json = await response.json()
-                    Cacher.store_data("url", url, response_json)
-                # except(requests.exceptions.RequestException, TimeoutError, asyncio.CancelledError, asyncio.exceptions.TimeoutError, aiohttp.ServerDisconnectedError, aiohttp.ClientResponseError) as e:
-                except Exception as e:
-                    logger.warning(f"Exception when querying info for {uniprot_id}. Exception: {str(e)}")
-                    self.uniprot_query_exceptions.append({f"{uniprot_id}": f"{str(e)}"})
-                    await asyncio.sleep(2) # sleep before retrying
-                    continue
+            response_json = await self.retry_policy.get_json(session, url, timeout=5, item_id=item_id)
+            if response_json == None:
+                self.uniprot_query_exceptions.append({f"{uniprot_id}": f"{self.retry_policy.statistics.failed_items.get(item_id)}"})
+                return None
+            if "results" in response_json: # don't cache error responses
+                Cacher.store_data("url", url, response_json)
+            await asyncio.sleep(self.async_request_sleep_delay)
             
         # single query retry
         #try:
@@ -1132,6 +1303,11 @@ class UniProtAPI:
         #    self.uniprot_query_exceptions.append({f"{uniprot_id}": f"{str(e)}"})
         #    return None
         
+        if "results" not in response_json:
+            # retry_policy.get_json only returns the error responses of non-retryable statuses (eg. 400), which are definitive
+            logger.warning(f"Uniprot query for {uniprot_id} returned an error response: {response_json}")
+            Cacher.store_negative("uniprot", uniprot_data_key, reason=str(response_json))
+            return {} # a definitive answer (no info), the same value as for an empty result; None is only returned for failed requests
         results = response_json["results"]
         return_value = self._process_uniprot_info_query_results(results, uniprot_id)
         
@@ -1141,6 +1317,8 @@ class UniProtAPI:
         return return_value
         
 class EnsemblAPI:
+    HOST = "rest.ensembl.org"
+
     def __init__(self):
         # Set up a retrying session
         retry_strategy = Retry(
@@ -1148,13 +1326,21 @@ class EnsemblAPI:
             status_forcelist=[429, 500, 502, 503, 504],
             backoff_factor=0.3
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HttpTransport.get_adapter(max_retries=retry_strategy) # a HTTPAdapter, which also supports the record/replay modes of HttpTransport
         session = requests.Session()
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         self.s = session
         self.ortholog_query_exceptions = [] # the list of exceptions during the ortholog query
         self.async_request_sleep_delay = 0.5
+        self.retry_policy = AsyncRetryPolicy() # retry policy of the async requests, can be replaced with a policy shared between multiple apis
+
+    def is_available(self) -> bool:
+        """
+        Returns False if the circuit breaker of rest.ensembl.org (see self.retry_policy) is open, ie. Ensembl is currently considered down
+        and the async requests are short-circuited. Callers should then rely on offline sources (eg. HumanOrthologFinder) and cached responses.
+        """
+        return not self.retry_policy.is_circuit_open(self.HOST)
 
     def get_human_ortholog(self, id:str):
         """
@@ -1165,8 +1351,10 @@ class EnsemblAPI:
         
         This function uses request caching. It will use previously saved url request responses instead of performing new (the same as before) connections
         """
-        ensembl_data_key = f"[{self.__class__.__name__}][{self.get_human_ortholog.__name__}][id={id}]"
-        previous_result = Cacher.get_data("ensembl", ensembl_data_key)
+        ensembl_data_key = Cacher.function_key(self.__class__.__name__, "get_human_ortholog", id=id) # shared with get_human_ortholog_async
+        cache_status, previous_result = Cacher.lookup("ensembl", ensembl_data_key)
+        if cache_status == Cacher.NEGATIVE: # Ensembl has no (human) ortholog for this id
+            return None
         if previous_result != None:
             logger.debug(f"Returning cached ortholog for id {id}: {previous_result}")
             return previous_result
@@ -1199,13 +1387,20 @@ class EnsemblAPI:
             try:
                 response = self.s.get(url, headers={"Content-Type": "application/json"}, timeout=5)
                 response.raise_for_status()
-                response_json = response.json()["data"][0]["homologies"]
+                response_json = response.json()
                 # ConnectionCacher.store_url(url, response=response_json)
-                Cacher.store_data("url", url, response_json)
+                Cacher.store_data("url", url, response_json) # the whole response is cached, the same as in get_human_ortholog_async
+            except requests.exceptions.HTTPError as e:
+                if e.response != None and e.response.status_code in [400, 404]: # eg. {'error': 'No valid lookup found for symbol Oxct2a'}, a definitive answer
+                    Cacher.store_negative("ensembl", ensembl_data_key, reason=e.response.text)
+                return None
             except requests.exceptions.RequestException:
                 return None
+        if isinstance(response_json, dict): # a list is the homologies list, which was cached by the older versions of this function
+            response_json = response_json["data"][0]["homologies"]
             
         if response_json == []:
+            Cacher.store_negative("ensembl", ensembl_data_key, reason="No homologies")
             return None
 
         max_perc_id = 0.0
@@ -1233,10 +1428,14 @@ class EnsemblAPI:
         Parameters:
           - (str) id
         
-        This function uses request caching. It will use previously saved url request responses instead of performing new (the same as before) connections
+        This function uses request caching. It will use previously saved url request responses instead of performing new (the same as before) connections.
+        Transient errors (429, 5xx, timeouts) are retried according to self.retry_policy. If the request fails after all retries, the 'id' is recorded
+        in self.retry_policy.statistics.failed_items.
         """
-        ensembl_data_key = f"[{self.__class__.__name__}][{self.get_human_ortholog_async.__name__}][id={id}]"
-        previous_result = Cacher.get_data("ensembl", ensembl_data_key)
+        ensembl_data_key = Cacher.function_key(self.__class__.__name__, "get_human_ortholog", id=id) # shared with get_human_ortholog
+        cache_status, previous_result = Cacher.lookup("ensembl", ensembl_data_key)
+        if cache_status == Cacher.NEGATIVE: # Ensembl has no (human) ortholog for this id
+            return None
         if previous_result != None:
             logger.debug(f"Returning cached ortholog for id {id}: {previous_result}")
             return previous_result
@@ -1264,27 +1463,27 @@ class EnsemblAPI:
         if previous_response != None:
             response_json = previous_response
         else:
-            try:
-                response = await session.get(url, headers={"Content-Type": "application/json"}, timeout=10)
-                # response.raise_for_status()
-                response_json = await response.json()
-                Cacher.store_data("url", url, response_json)
-                await asyncio.sleep(self.async_request_sleep_delay)
-            # except (requests.exceptions.RequestException, TimeoutError, asyncio.CancelledError, asyncio.exceptions.TimeoutError, aiohttp.ClientResponseError) as e:
-            except Exception as e:
-                logger.warning(f"Exception for {id_url} for request: https://rest.ensembl.org/homology/symbol/{species}/{id_url}?target_species=human;type=orthologues;sequence=none. Exception: {str(e)}")
-                self.ortholog_query_exceptions.append({f"{id}": f"{str(e)}"})
+            response_json = await self.retry_policy.get_json(session, url, headers={"Content-Type": "application/json"}, timeout=10, item_id=id)
+            if response_json == None:
+                self.ortholog_query_exceptions.append({f"{id}": f"{self.retry_policy.statistics.failed_items.get(id)}"})
                 return None
+            if "error" not in response_json: # bugfix: error responses (eg. {'error': 'No valid lookup found for symbol Oxct2a'}) are only cached as negative entries, which expire after negative_ttl
+                Cacher.store_data("url", url, response_json)
+            await asyncio.sleep(self.async_request_sleep_delay)
 
         # TODO: implement this safety check, server may send text only, which causes error (content_type == "text/plain")
         #if response.content_type == "application/json":
         #    response_json = await response.json()
         
         if response_json == [] or "error" in response_json:
+            # retry_policy.get_json only returns the error responses of non-retryable statuses, eg. {'error': 'No valid lookup found for symbol Oxct2a'}, which are definitive
+            Cacher.store_negative("ensembl", ensembl_data_key, reason=str(response_json))
             return None
         elif response_json != [] and "error" not in response_json:
-            response_json = response_json["data"][0]["homologies"]
+            if isinstance(response_json, dict): # a list is the homologies list, which was cached by the older versions of get_human_ortholog
+                response_json = response_json["data"][0]["homologies"]
             if response_json == []: # if there are no homologies, return None
+                Cacher.store_negative("ensembl", ensembl_data_key, reason="No homologies")
                 return None
         
             max_perc_id = 0.0
@@ -1332,8 +1531,10 @@ class EnsemblAPI:
             logger.debug(f"ERROR: {id}. This means a particular RGD, Zfin, MGI or Xenbase gene does not have a human ortholog and you are safe to ignore it.")
             return {}
         
-        ensembl_data_key = f"[{self.__class__.__name__}][{self.get_info.__name__}][id={id}]"
-        previous_result = Cacher.get_data("ensembl", ensembl_data_key)
+        ensembl_data_key = Cacher.function_key(self.__class__.__name__, "get_info", id=id) # shared with get_info_async
+        cache_status, previous_result = Cacher.lookup("ensembl", ensembl_data_key)
+        if cache_status == Cacher.NEGATIVE: # Ensembl has no entry for this id
+            return {}
         if previous_result != None:
             logger.debug(f"Returning cached ortholog for id {id}: {previous_result}")
             return previous_result
@@ -1503,8 +1704,10 @@ class EnsemblAPI:
             logger.debug(f"ERROR: {id}. This means a particular RGD, Zfin, MGI or Xenbase gene does not have a human ortholog and you are safe to ignore it.")
             return {}
         
-        ensembl_data_key = f"[{self.__class__.__name__}][{self.get_info_async.__name__}][id={id}]"
-        previous_result = Cacher.get_data("ensembl", ensembl_data_key)
+        ensembl_data_key = Cacher.function_key(self.__class__.__name__, "get_info", id=id) # shared with get_info
+        cache_status, previous_result = Cacher.lookup("ensembl", ensembl_data_key)
+        if cache_status == Cacher.NEGATIVE: # Ensembl has no entry for this id
+            return {}
         if previous_result != None:
             logger.debug(f"Returning cached ortholog for id {id}: {previous_result}")
             return previous_result
@@ -1534,17 +1737,14 @@ class EnsemblAPI:
             if previous_response != None:
                 response_json = previous_response
             else:
-                response = await session.get(
-                    url,
-                    headers={"Content-Type": "application/json"},
-                    timeout=5
-                    )
-                # response.raise_for_status()
-                response_json = await response.json()
-                # ConnectionCacher.store_url(url, response_json)
-                Cacher.store_data("url", url, response_json)
+                # the failure isn't recorded here, as the xrefs fallback below can still resolve the id; it is recorded only if the fallback also fails
+                response_json = await self.retry_policy.get_json(session, url, headers={"Content-Type": "application/json"}, timeout=5, item_id=id, record_failure=False)
+                if response_json == None:
+                    raise aiohttp.ClientError(f"Request failed after all retries: {url}")
+                if "error" not in response_json: # error responses are only cached as negative entries (see get_human_ortholog_async)
+                    Cacher.store_data("url", url, response_json)
                 await asyncio.sleep(self.async_request_sleep_delay)
-        except (requests.exceptions.RequestException, TimeoutError, asyncio.CancelledError, asyncio.exceptions.TimeoutError, aiohttp.ClientResponseError):
+        except (requests.exceptions.RequestException, TimeoutError, asyncio.CancelledError, asyncio.exceptions.TimeoutError, aiohttp.ClientError):
             # If the request fails, try the xrefs URL instead
             try:
                 # TODO: 19.08.2023: the below link doesn't work for any other {species} in endpoint other than human. Ie.
@@ -1559,14 +1759,11 @@ class EnsemblAPI:
                     if previous_response != None:
                         response_json = previous_response
                     else:
-                        response = await session.get(
-                            url,
-                            headers={"Content-Type": "application/json"},
-                            timeout=5
-                        )
-                        # response.raise_for_status()
-                        response_json = await response.json()
-                        Cacher.store_data("url", url, response_json)
+                        response_json = await self.retry_policy.get_json(session, url, headers={"Content-Type": "application/json"}, timeout=5, item_id=id)
+                        if response_json == None:
+                            raise aiohttp.ClientError(f"Request failed after all retries: {url}")
+                        if "error" not in response_json: # error responses are only cached as negative entries (see get_human_ortholog_async)
+                            Cacher.store_data("url", url, response_json)
                         await asyncio.sleep(self.async_request_sleep_delay)
                     # Use the first ENS ID in the xrefs response to make a new lookup request
                     ensembl_id = next((xref["id"] for xref in response_json if "ENS" in xref["id"]), None)
@@ -1580,23 +1777,25 @@ class EnsemblAPI:
                     if previous_response != None:
                         response_json = previous_response
                     else:
-                        response = await session.get(
-                            url,
-                            headers={"Content-Type": "application/json"},
-                            timeout=5
-                        )
-                        # response.raise_for_status()
-                        response_json = await response.json()
-                        Cacher.store_data("url", url, response_json)
+                        response_json = await self.retry_policy.get_json(session, url, headers={"Content-Type": "application/json"}, timeout=5, item_id=id)
+                        if response_json == None:
+                            raise aiohttp.ClientError(f"Request failed after all retries: {url}")
+                        if "error" not in response_json: # error responses are only cached as negative entries (see get_human_ortholog_async)
+                            Cacher.store_data("url", url, response_json)
                         await asyncio.sleep(self.async_request_sleep_delay)
                 else:
                     raise Exception("no ensembl id returned")
             except Exception as e:
                 logger.warning(f"Failed to fetch Ensembl info for {id}.")
+                if not self.retry_policy.statistics.has_failed(id):
+                    # both the lookup and the xrefs fallback failed (the failed requests of the fallback are already recorded by the retry policy)
+                    self.retry_policy.statistics.record_failure(id, f"Lookup and xrefs fallback failed: {e}")
                 return {}
         
-        if "error" in response_json or response_json == None:
+        if response_json == None or "error" in response_json:
+            # retry_policy.get_json only returns the error responses of non-retryable statuses (eg. 400: No valid lookup found), which are definitive
             logger.warning(f"Failed to fetch Ensembl info for {id}.")
+            Cacher.store_negative("ensembl", ensembl_data_key, reason=str(response_json))
             return {}
                  
         # Extract gene information from API response
@@ -1629,20 +1828,18 @@ class EnsemblAPI:
                 if previous_response != None:
                     response_json = previous_response
                 else:
-                    response = await session.get(
-                        url,
-                        headers={"Content-Type": "application/json"},
-                        timeout=5
-                    )
-                    response.raise_for_status() # TODO: solve Too Many Requests error (429) -> aiohttp.client_exceptions.ClientResponseError: 429, message='Too Many Requests', url=URL('https://rest.ensembl.org/xrefs/id/ENST00000301012?all_levels=1;external_db=UniProt%25')
-                    response_json = await response.json()
-                    Cacher.store_data("url", url, response_json)
+                    # 429 (Too Many Requests) responses are retried by the retry policy
+                    response_json = await self.retry_policy.get_json(session, url, headers={"Content-Type": "application/json"}, timeout=5, item_id=id)
+                    if response_json == None:
+                        raise aiohttp.ClientError(f"Request failed after all retries: {url}")
+                    if "error" not in response_json: # error responses are only cached as negative entries (see get_human_ortholog_async)
+                        Cacher.store_data("url", url, response_json)
                     await asyncio.sleep(self.async_request_sleep_delay)
             # except (requests.exceptions.RequestException, TimeoutError, asyncio.CancelledError, asyncio.exceptions.TimeoutError, aiohttp.ClientResponseError):
             #    pass
             except Exception as e:
                 logger.warning(f"Exception: {e}")
-                pass
+                response_json = [] # bugfix: the uniprot id loop below would otherwise iterate over the previous (lookup) response
 
             uniprot_id = ""
             # bugfix: attribute error, because some 'entry' objects in loop were read as strings
@@ -0,0 +1,125 @@
+import asyncio
+import aiohttp
+import atexit
+import weakref
+import logging
+from .AnnotationProcessor import GOAnnotiationsFile, UniProtAPI, EnsemblAPI, HumanOrthologFinder
+from .HttpUtils import AsyncRetryPolicy
+
+logger = logging.getLogger(__name__)
+
+_live_runtimes = weakref.WeakSet() # the runtimes, which are closed at exit; weak references, so that registering a runtime doesn't keep it (and its GOAF, HumanOrthologFinder) alive
+
+def _close_live_runtimes():
+    for runtime in list(_live_runtimes):
+        runtime.close()
+
+atexit.register(_close_live_runtimes)
+
+class AsyncRuntime:
+    """
+    A long-lived async runtime, which is shared by all async stages of a ReverseLookup model. It holds:
+      - one event loop, on which all async stages are run (instead of a separate asyncio.run call for each stage)
+      - one aiohttp.ClientSession with a keep-alive connection pool and DNS caching, so that the connections (and TLS handshakes) to
+        rest.uniprot.org, rest.ensembl.org and api.geneontology.org are reused between the stages
+      - the shared UniProtAPI, EnsemblAPI, HumanOrthologFinder and GOAnnotiationsFile instances, which are created on first use
+        (HumanOrthologFinder and GOAnnotiationsFile read large files, so they are only constructed once per runtime)
+
+    Parameters:
+      - (int) max_connections: the maximum amount of simultaneous connections in the pool. Stage-specific limits are enforced with semaphores.
+      - (int) keepalive_timeout: the amount of seconds an idle connection is kept open in the pool
+      - (int) dns_cache_ttl: the amount of seconds the resolved host addresses are cached
+      - (AsyncRetryPolicy) retry_policy: the retry policy assigned to the shared api instances
+      - (GOAnnotiationsFile) goaf: an existing GOAnnotiationsFile instance (eg. the Workflow's goaf), to avoid reading the GOAF again
+
+    Usage:
+        runtime = AsyncRuntime()
+        runtime.run(some_coroutine(runtime.uniprot_api))
+        ...
+        runtime.close() # the runtimes, which are still alive, are also closed at exit
+
+    Inside a coroutine run with runtime.run, the shared session is obtained with 'session = await runtime.get_session()'.
+    """
+    def __init__(self, max_connections:int = 100, keepalive_timeout:int = 60, dns_cache_ttl:int = 600, retry_policy:AsyncRetryPolicy = None, goaf:GOAnnotiationsFile = None):
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.retry_policy = retry_policy if retry_policy != None else AsyncRetryPolicy()
+
+        self.loop = None
+        self._session = None
+        self._goaf = goaf
+        self._uniprot_api = None
+        self._ensembl_api = None
+        self._human_ortholog_finder = None
+        self._closed = False
+        _live_runtimes.add(self) # bugfix: atexit.register(self.close) kept every runtime (one per ReverseLookup model) alive until interpreter exit
+
+    def run(self, coroutine):
+        """
+        Runs 'coroutine' on the runtime's event loop until it completes and returns its result. This replaces asyncio.run, which creates
+        (and destroys) a new event loop on each call, together with all the connections bound to that loop.
+        """
+        if self.loop == None or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+            self._closed = False
+        return self.loop.run_until_complete(coroutine)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the shared aiohttp.ClientSession. It is created on the first call (it has to be created inside the running event loop).
+        """
+        if self._session == None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=0, # no per-host limit for the pool, stages limit their own concurrency
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @property
+    def uniprot_api(self) -> UniProtAPI:
+        if self._uniprot_api == None:
+            self._uniprot_api = UniProtAPI()
+            self._uniprot_api.retry_policy = self.retry_policy
+        return self._uniprot_api
+
+    @property
+    def ensembl_api(self) -> EnsemblAPI:
+        if self._ensembl_api == None:
+            self._ensembl_api = EnsemblAPI()
+            self._ensembl_api.retry_policy = self.retry_policy
+        return self._ensembl_api
+
+    @property
+    def human_ortholog_finder(self) -> HumanOrthologFinder:
+        if self._human_ortholog_finder == None:
+            self._human_ortholog_finder = HumanOrthologFinder()
+        return self._human_ortholog_finder
+
+    @property
+    def goaf(self) -> GOAnnotiationsFile:
+        if self._goaf == None:
+            self._goaf = GOAnnotiationsFile()
+        return self._goaf
+
+    @goaf.setter
+    def goaf(self, goaf:GOAnnotiationsFile):
+        self._goaf = goaf
+
+    def close(self):
+        """
+        Closes the shared session (and its connection pool) and the event loop. The runtime can still be used afterwards, as run() creates a new event loop.
+        """
+        if self._closed == True or self.loop == None or self.loop.is_closed():
+            return
+        if self._session != None and not self._session.closed:
+            self.loop.run_until_complete(self._session.close())
+            self.loop.run_until_complete(asyncio.sleep(0.25)) # allow the underlying ssl connections to close, see aiohttp docs on graceful shutdown
+        self._session = None
+        self.loop.close()
+        self._closed = True
+        logger.debug("Closed the async runtime.")
@@ -0,0 +1,245 @@
+import json
+import os
+import logging
+from .CacheUtils import Cacher
+from .Timer import Timer
+
+logger = logging.getLogger(__name__)
+
+class CachePrewarmer:
+    """
+    Fills the cache with the requests, which a run of a ReverseLookup model (eg. WorkflowTwo on an input.txt) will need, so that the
+    following runs of the model are served from the cache (eg. run the prewarm overnight and the analysis during the day).
+
+    The requests of each network stage are predicted from the model (its GO Terms), the local indexes (the OBO file, the GO Annotations File
+    and the HumanOrthologFinder files) and the answers, which are already cached:
+      - fetch_all_go_term_names_descriptions: the GO Terms, which aren't in the OBO file
+      - fetch_all_go_term_products: the GO Terms without products
+      - fetch_ortholog_products: the non-human products (from the cached GO Term products), which aren't found by HumanOrthologFinder,
+                                 followed by EnsemblAPI.get_info of the found ortholog. The UniProtKB products are resolved with the GOAF.
+      - fetch_product_infos: the queries of Product.fetch_info_async, in the same order (UniProt info, Ensembl info of the ensg id, genename
+                             and uniprot id), until the required keys are filled
+    Each predicted request is looked up in the Cacher (hit, negative hit or miss). The requests, which follow a missing answer (eg. the products
+    of a GO Term, whose products aren't cached yet), can't be predicted and are reported as 'unknown'. They are predicted after the
+    preceding stage was prewarmed.
+
+    The stages are run with the model's own (cache-aware) async stages, which only send the requests missing from the cache. Once all the
+    remaining requests are cached, the remaining stages are skipped. The concurrency of the stages is the one of WorkflowTwo, the retry policy
+    of the model backs off on 429 and opens the circuit breaker of a failing host.
+
+    Parameters:
+      - (ReverseLookup) model: the model to prewarm, eg. ReverseLookup.from_input_file("input.txt"). The model is modified by the stages, but not saved.
+      - (float) default_request_time: the amount of seconds of a request, used to estimate the remaining network cost, if the average
+                                      request time isn't known from the cache statistics (see CacheStatistics.set_request_time)
+      - (list) required_keys: the Product attributes, which fetch_product_infos attempts to fill
+
+    Usage:
+        model = ReverseLookup.from_input_file("input_files/input.txt")
+        prewarmer = CachePrewarmer(model)
+        prewarmer.plan() # only predict and report, without network requests
+        prewarmer.run() # fetch the missing requests
+    """
+    STAGES = ["fetch_all_go_term_names_descriptions", "fetch_all_go_term_products", "fetch_ortholog_products", "fetch_product_infos"]
+    # the concurrency of the stages (see WorkflowTwo)
+    STAGE_SETTINGS = {
+        "fetch_all_go_term_names_descriptions": {"run_async": True},
+        "fetch_all_go_term_products": {"web_download": True, "run_async": True, "recalculate": False, "max_connections": 60, "request_params": {"rows": 50000}, "delay": 0.0},
+        "fetch_ortholog_products": {"refetch": False, "run_async": True, "max_connections": 15, "req_delay": 0.1, "semaphore_connections": 5},
+        "fetch_product_infos": {"refetch": False, "run_async": True, "max_connections": 15, "semaphore_connections": 10, "req_delay": 0.1}
+    }
+    HOSTS = {"go": "api.geneontology.org", "uniprot": "rest.uniprot.org", "ensembl": "rest.ensembl.org"}
+    REPORT_FILEPATH = "cache/prewarm_report.json"
+
+    def __init__(self, model, default_request_time:float = 0.5, required_keys = ["genename", "description", "ensg_id", "enst_id", "refseq_nt_id"]):
+        self.model = model
+        self.default_request_time = default_request_time
+        self.required_keys = required_keys
+        self._local_orthologs = {} # product id -> the result of HumanOrthologFinder.find_human_ortholog, the file search is only performed once per product
+
+    def plan(self, log:bool = True) -> dict:
+        """
+        Predicts the requests of all network stages and looks them up in the Cacher. Returns {stage: stage plan}, where a stage plan is
+        {"predicted": int, "hits": int, "negative_hits": int, "misses": int, "unknown": int, "missing_hosts": {host: misses}}.
+        """
+        Cacher.set_stage("prewarm_plan")
+        try:
+            plans = {stage: self._new_stage_plan() for stage in self.STAGES}
+            self._plan_names_descriptions(plans["fetch_all_go_term_names_descriptions"])
+            product_ids = self._plan_products(plans["fetch_all_go_term_products"])
+            products = self._plan_orthologs(plans["fetch_ortholog_products"], product_ids)
+            self._plan_infos(plans["fetch_product_infos"], products)
+        finally:
+            Cacher.set_stage("")
+        if log:
+            self.log_plan(plans)
+        return plans
+
+    def run(self, report_filepath:str = "") -> dict:
+        """
+        Prewarms the cache: the stages are run on the model, until the requests of all remaining stages are cached. The stages are planned
+        again after each stage, as the requests of the later stages depend on the earlier answers.
+
+        Returns (and saves to 'report_filepath', REPORT_FILEPATH by default) the report {"initial": plans, "final": plans, "estimated_remaining_time": seconds}.
+        """
+        logger.info(f"Started cache prewarming for {len(self.model.goterms)} GO Terms.")
+        timer = Timer()
+        initial_plans = self.plan()
+        try:
+            for i, stage in enumerate(self.STAGES):
+                plans = initial_plans if i == 0 else self.plan(log=False)
+                # the later stages need the model state (eg. the products) of the earlier stages, which are run even if they are cached
+                remaining_requests = sum(plans[remaining_stage]["misses"] + plans[remaining_stage]["unknown"] for remaining_stage in self.STAGES[i:])
+                if remaining_requests == 0:
+                    logger.info(f"Prewarm: all requests of the remaining stages are cached.")
+                    break
+                logger.info(f"Prewarm: running {stage}, {plans[stage]['misses']} missing (and {plans[stage]['unknown']} unknown) requests.")
+                getattr(self.model, stage)(**self.STAGE_SETTINGS[stage])
+                if stage == "fetch_all_go_term_products":
+                    self.model.create_products_from_goterms()
+                elif stage == "fetch_ortholog_products":
+                    self.model.prune_products()
+        finally:
+            self.model.async_runtime.close()
+        final_plans = self.plan()
+        report = {
+            "timestamp": Timer.get_current_time(),
+            "elapsed_time": timer.get_elapsed_time(),
+            "initial": initial_plans,
+            "final": final_plans,
+            "estimated_remaining_time": self.estimate_remaining_time(final_plans)
+        }
+        if report_filepath == "":
+            report_filepath = self.REPORT_FILEPATH
+        if os.path.dirname(report_filepath) != "":
+            os.makedirs(os.path.dirname(report_filepath), exist_ok=True)
+        with open(report_filepath, "w") as f:
+            json.dump(report, f, indent=4)
+        logger.info(f"Finished cache prewarming, the report was saved to {report_filepath}")
+        return report
+
+    def get_request_time(self) -> float:
+        """
+        Returns the average amount of seconds of a request, from the cache statistics of the previous stages, or default_request_time.
+        """
+        request_times = list(Cacher.statistics.request_times.values())
+        return sum(request_times) / len(request_times) if request_times != [] else self.default_request_time
+
+    def estimate_remaining_time(self, plans:dict) -> float:
+        """
+        Returns the estimated amount of seconds (of sequential requests) of the missing and unknown requests of 'plans'.
+        The wall time of a run is shorter, as the requests of the async stages are concurrent.
+        """
+        remaining_requests = sum(stage_plan["misses"] + stage_plan["unknown"] for stage_plan in plans.values())
+        return round(remaining_requests * self.get_request_time(), 1)
+
+    def log_plan(self, plans:dict):
+        for stage, stage_plan in plans.items():
+            logger.info(f"Prewarm plan for {stage}: {stage_plan['predicted']} predicted requests, {stage_plan['hits']} hits, {stage_plan['negative_hits']} negative hits, {stage_plan['misses']} misses, {stage_plan['unknown']} unknown {stage_plan['missing_hosts']}")
+        # the products of the GO Terms with missing products are unknown, the requests of these products aren't included in the estimate
+        logger.info(f"Expected remaining network cost: at least ~{self.estimate_remaining_time(plans)} s of requests (at {self.get_request_time():.2f} s per request).")
+
+    def _new_stage_plan(self) -> dict:
+        return {"predicted": 0, "hits": 0, "negative_hits": 0, "misses": 0, "unknown": 0, "missing_hosts": {}}
+
+    def _lookup(self, stage_plan:dict, data_location:str, data_key:str):
+        """
+        Looks up a predicted request and counts it in 'stage_plan'. Returns (status, data_value), see Cacher.lookup.
+        The lookup is only a probe (record=False): planning doesn't refresh the LRU recency of the predicted entries and isn't counted in the cache statistics.
+        """
+        status, data_value = Cacher.lookup(data_location, data_key, record=False)
+        stage_plan["predicted"] += 1
+        match status:
+            case Cacher.HIT:
+                stage_plan["hits"] += 1
+            case Cacher.NEGATIVE:
+                stage_plan["negative_hits"] += 1
+            case Cacher.MISS:
+                stage_plan["misses"] += 1
+                host = self.HOSTS[data_location]
+                stage_plan["missing_hosts"][host] = stage_plan["missing_hosts"].get(host, 0) + 1
+        return status, data_value
+
+    def _plan_names_descriptions(self, stage_plan:dict):
+        for goterm in self.model.goterms:
+            if goterm.name != None and goterm.description != None:
+                continue
+            if goterm.id in self.model.obo_parser.all_goterms:
+                continue
+            self._lookup(stage_plan, "go", Cacher.function_key("GOTerm", "fetch_name_description", go_id=goterm.id))
+
+    def _plan_products(self, stage_plan:dict) -> set:
+        """
+        Returns the ids of the known products of all GO Terms (from the model or the cache).
+        """
+        product_ids = set()
+        for goterm in self.model.goterms:
+            if goterm.products != []:
+                product_ids.update(goterm.products)
+                continue
+            status, products = self._lookup(stage_plan, "go", Cacher.function_key("GOTerm", "fetch_products", go_id=goterm.id))
+            if status == Cacher.HIT:
+                product_ids.update(products)
+        return product_ids
+
+    def _find_local_ortholog(self, product_id:str):
+        if product_id not in self._local_orthologs:
+            self._local_orthologs[product_id] = self.model.async_runtime.human_ortholog_finder.find_human_ortholog(product_id)
+        return self._local_orthologs[product_id]
+
+    def _plan_orthologs(self, stage_plan:dict, product_ids:set) -> list:
+        """
+        Returns the predicted state of the products after the ortholog stage, as dicts with the uniprot_id, genename and ensg_id keys.
+        Products, whose ortholog answer is missing, are omitted (their info requests are unknown).
+        """
+        products = []
+        for product in self.model.products:
+            product_ids.discard(product.id_synonyms[0])
+            if product.had_orthologs_computed:
+                products.append({key: getattr(product, key) for key in ["uniprot_id", "genename", "ensg_id"] + self.required_keys})
+            else:
+                product_ids.add(product.id_synonyms[0])
+        for product_id in product_ids:
+            product = {"uniprot_id": None, "genename": None, "ensg_id": None}
+            if ":" not in product_id:
+                product["genename"] = product_id
+            elif "UniProtKB" in product_id:
+                product["uniprot_id"] = product_id # the genename is taken from the GOAF
+                product["genename"] = self.model.async_runtime.goaf.get_uniprotkb_genename(product_id)
+            else:
+                genename = self._find_local_ortholog(product_id)
+                if genename != None:
+                    product["genename"] = genename
+                else:
+                    status, ensg_id = self._lookup(stage_plan, "ensembl", Cacher.function_key("EnsemblAPI", "get_human_ortholog", id=product_id))
+                    if status == Cacher.MISS:
+                        stage_plan["unknown"] += 1 # the get_info request of the ortholog
+                        continue
+                    if status == Cacher.HIT and ensg_id not in [None, ""]:
+                        status, info = self._lookup(stage_plan, "ensembl", Cacher.function_key("EnsemblAPI", "get_info", id=ensg_id))
+                        if status == Cacher.MISS:
+                            continue
+                        if status == Cacher.HIT:
+                            product.update({key: value for key, value in info.items() if value not in [None, ""]})
+            products.append(product)
+        return products
+
+    def _plan_infos(self, stage_plan:dict, products:list):
+        for product in products:
+            if not (product.get("uniprot_id") or product.get("genename") or product.get("ensg_id")):
+                continue
+            queries = [] # the queries of Product.fetch_info_async, in order
+            if product.get("uniprot_id"):
+                queries.append(("uniprot", Cacher.function_key("UniProtAPI", "get_uniprot_info", uniprot_id=product["uniprot_id"].split(":")[-1])))
+            for query_id in ["ensg_id", "genename", "uniprot_id"]:
+                if product.get(query_id):
+                    queries.append(("ensembl", Cacher.function_key("EnsemblAPI", "get_info", id=product[query_id])))
+            for data_location, data_key in queries:
+                if all(product.get(key) not in [None, ""] for key in self.required_keys):
+                    break
+                status, info = self._lookup(stage_plan, data_location, data_key)
+                if status == Cacher.MISS:
+                    break # the following queries depend on this answer
+                if status == Cacher.HIT and isinstance(info, dict):
+                    for key, value in info.items():
+                        if value not in [None, "", []] and product.get(key) in [None, "", []]:
+                            product[key] = value
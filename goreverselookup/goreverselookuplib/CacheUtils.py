@@ -2,7 +2,14 @@ from .Metrics import Metrics,basic_mirna_score
 import json
 import os
 import logging
+import sqlite3
+import threading
+import queue
 import time
+import zlib
+import re
+import urllib.parse
+import pathlib
 from .JsonUtil import JsonUtil
 from .Timer import Timer
 import asyncio
@@ -11,24 +18,896 @@ import atexit
 
 logger = logging.getLogger(__name__)
 
+class CacheBackend():
+    """
+    The storage layer under Cacher. A backend stores the cache entries ({"data_value": ..., "timestamp": ...}) of the
+    data locations ("url", "uniprot", "ensembl", "go") and is chosen with Cacher.init(backend=...).
+
+    Implementations:
+      - JsonCacheBackend: the original behaviour, all entries are kept in memory and each data location is (re)written as a whole json file
+      - SqliteCacheBackend: entries are stored in a single SQLite database in WAL mode, with O(1) per-entry upserts and lazy (per-key) reads
+    
+    Entries may have an "entry_type": "negative" entries (see Cacher.store_negative) record a definitive "not found" answer, entries without
+    an entry_type are regular (positive) entries.
+
+    Besides get and set, the backends track the last access of the entries (touch), so that the least recently used entries
+    can be evicted once the cache exceeds its maximum size (evict), and delete the entries older than the time-to-live of their data location (purge_expired).
+    """
+    def get(self, data_location:str, data_key:str):
+        """
+        Returns the entry {"data_value": ..., "timestamp": ...} stored at data_key, or None if it doesn't exist.
+        """
+        raise NotImplementedError()
+
+    def set(self, data_location:str, data_key:str, entry:dict):
+        """
+        Stores the entry {"data_value": ..., "timestamp": ...} at data_key.
+        """
+        raise NotImplementedError()
+
+    def delete(self, data_location:str, data_key:str):
+        raise NotImplementedError()
+
+    def touch(self, data_location:str, data_key:str):
+        """
+        Records an access (cache hit) of data_key, which is used for the LRU eviction.
+        """
+        pass
+
+    def count(self, data_location:str) -> int:
+        raise NotImplementedError()
+
+    def keys(self, data_location:str) -> list:
+        """
+        Returns the data keys of all entries of 'data_location'.
+        """
+        raise NotImplementedError()
+
+    def get_meta(self, name:str):
+        """
+        Returns the value of the backend metadata 'name' (eg. "key_version"), or None if it isn't set.
+        """
+        raise NotImplementedError()
+
+    def set_meta(self, name:str, value:str):
+        raise NotImplementedError()
+
+    def get_size(self) -> int:
+        """
+        Returns the (approximate) size of the stored entries in bytes.
+        """
+        raise NotImplementedError()
+
+    def evict(self, max_size:int) -> int:
+        """
+        Deletes the least recently used entries, until the size of the cache is below 90% of max_size (in bytes). Returns the amount of evicted entries.
+        """
+        raise NotImplementedError()
+
+    def purge_expired(self, data_location:str, oldest_timestamp:str, entry_type:str = None) -> int:
+        """
+        Deletes the entries of 'data_location' with a timestamp older than 'oldest_timestamp'. If entry_type is specified (eg. "negative"),
+        only the entries of this type are deleted. Returns the amount of deleted entries.
+        """
+        raise NotImplementedError()
+
+    def begin_batch(self):
+        """
+        Starts a batch of writes, which are committed together in end_batch (used by CacheWriter).
+        """
+        pass
+
+    def end_batch(self):
+        pass
+
+    def save(self, data_location:str = ""):
+        """
+        Persists the entries of 'data_location' (or of all data locations, if data_location is empty).
+        """
+        pass
+
+    def close(self):
+        pass
+
+class FileLock():
+    """
+    An inter-process lock, which is held while the lock file exists. The lock file is created atomically (O_CREAT | O_EXCL), which
+    works on all platforms. A lock file older than 'stale_timeout' seconds (eg. left behind by a killed process) is removed.
+
+    Usage:
+        with FileLock("cache/connection_cache.json.lock"):
+            ...
+    """
+    def __init__(self, filepath:str, timeout:float = 60.0, stale_timeout:float = 300.0):
+        self.filepath = filepath
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+
+    def __enter__(self):
+        if os.path.dirname(self.filepath) != "":
+            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+        start_time = time.time()
+        while True:
+            try:
+                fd = os.open(self.filepath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode("utf-8"))
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.filepath) > self.stale_timeout:
+                        logger.warning(f"Removing stale lock file {self.filepath}")
+                        os.remove(self.filepath)
+                        continue
+                except OSError:
+                    continue # the lock file was removed in the meantime
+                if time.time() - start_time > self.timeout:
+                    raise TimeoutError(f"Could not acquire {self.filepath} in {self.timeout} seconds.")
+                time.sleep(0.1)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            os.remove(self.filepath)
+        except OSError:
+            pass
+
+class JsonCacheBackend(CacheBackend):
+    """
+    Keeps each data location fully in memory (self.data[data_location]) and saves it as a whole json file with JsonUtil.save_json.
+    Saving is O(cache size), therefore this backend is best used with Cacher.init(store_data_atexit=True).
+    Each data location is loaded on its first access (eg. a rescoring run, which only reads GO responses, never loads the url cache), and only
+    the loaded data locations are saved. The json files can't be memory-mapped, in read-only mode they are loaded the same way, but never saved.
+    The last access of an entry is stored in the entry itself ("last_access"), the entry sizes are estimated from their json representation.
+
+    The json files are read and written while holding a FileLock ({filepath}.lock). On save, the entries on disk are merged into the
+    in-memory entries (the newer timestamp wins), so that processes sharing the cache files (eg. parallel workflows) don't overwrite
+    each other's entries at exit. The sqlite backend should be preferred for parallel workflows, as it shares the entries immediately.
+
+    Parameters:
+      - (dict) filepaths: data location -> json filepath, eg. {"url": "cache/connection_cache.json", ...}
+      - (str) meta_filepath: the json file of the backend metadata (see get_meta), eg. "cache/cache_meta.json"
+      - (bool) read_only: if True, the json files are never written
+      - (function) load_callback: called with the data location after it was loaded (eg. to delete its expired entries)
+    """
+    def __init__(self, filepaths:dict, meta_filepath:str = "cache/cache_meta.json", read_only:bool = False, load_callback = None):
+        self.filepaths = filepaths
+        self.meta_filepath = meta_filepath
+        self.read_only = read_only
+        self.load_callback = load_callback
+        self.data = {} # data location -> entries, only the loaded data locations
+        self._deleted_keys = {} # data location -> keys deleted by this process, which are not merged back from disk on save
+        self._load_lock = threading.Lock() # the CacheWriter thread and the thread pools may access a data location for the first time concurrently
+
+    def _entries(self, data_location:str) -> dict:
+        """
+        Returns the entries of 'data_location', which are loaded from its json file on the first access.
+        """
+        entries = self.data.get(data_location)
+        if entries != None:
+            return entries
+        with self._load_lock:
+            if data_location not in self.data:
+                filepath = self.filepaths[data_location]
+                with FileLock(f"{filepath}.lock"):
+                    entries = JsonUtil.load_json(filepath) if os.path.exists(filepath) else {}
+                self._deleted_keys[data_location] = set()
+                self.data[data_location] = entries
+                logger.debug(f"Loaded {len(entries)} {data_location} cache entries from {filepath}")
+                if self.load_callback != None:
+                    self.load_callback(data_location)
+        return self.data[data_location]
+
+    def is_loaded(self, data_location:str) -> bool:
+        return data_location in self.data
+
+    def get(self, data_location:str, data_key:str):
+        return self._entries(data_location).get(data_key)
+
+    def set(self, data_location:str, data_key:str, entry:dict):
+        entry["last_access"] = time.time()
+        self._entries(data_location)[data_key] = entry
+        self._deleted_keys[data_location].discard(data_key)
+
+    def delete(self, data_location:str, data_key:str):
+        self._entries(data_location).pop(data_key, None)
+        self._deleted_keys[data_location].add(data_key)
+
+    def touch(self, data_location:str, data_key:str):
+        entry = self._entries(data_location).get(data_key)
+        # only existing last_access values are updated: adding a key could break a concurrent json.dump of the CacheWriter thread
+        # (entries loaded from old cache files, without a last_access, are evicted first)
+        if entry != None and "last_access" in entry:
+            entry["last_access"] = time.time()
+
+    def count(self, data_location:str) -> int:
+        return len(self._entries(data_location))
+
+    def keys(self, data_location:str) -> list:
+        return list(self._entries(data_location).keys())
+
+    def _load_meta(self) -> dict:
+        return JsonUtil.load_json(self.meta_filepath) if os.path.exists(self.meta_filepath) else {}
+
+    def get_meta(self, name:str):
+        with FileLock(f"{self.meta_filepath}.lock"):
+            return self._load_meta().get(name)
+
+    def set_meta(self, name:str, value:str):
+        with FileLock(f"{self.meta_filepath}.lock"):
+            meta = self._load_meta()
+            meta[name] = value
+            JsonUtil.save_json(meta, self.meta_filepath)
+
+    def get_size(self) -> int:
+        return sum(len(json.dumps(entry)) for entries in self.data.values() for entry in entries.values())
+
+    def evict(self, max_size:int) -> int:
+        entry_sizes = [] # (last_access, data_location, data_key, size)
+        size = 0
+        for data_location, entries in self.data.items():
+            for data_key, entry in entries.items():
+                entry_size = len(json.dumps(entry))
+                size += entry_size
+                entry_sizes.append((entry.get("last_access", 0), data_location, data_key, entry_size))
+        if size <= max_size:
+            return 0
+        evicted = 0
+        for last_access, data_location, data_key, entry_size in sorted(entry_sizes):
+            if size <= max_size * 0.9:
+                break
+            self.delete(data_location, data_key)
+            size -= entry_size
+            evicted += 1
+        return evicted
+
+    def purge_expired(self, data_location:str, oldest_timestamp:str, entry_type:str = None) -> int:
+        entries = self._entries(data_location)
+        expired_keys = [data_key for data_key, entry in entries.items() if entry.get("timestamp", "") < oldest_timestamp and (entry_type == None or entry.get("entry_type") == entry_type)] # "%Y-%m-%d %H:%M:%S" timestamps sort chronologically
+        for data_key in expired_keys:
+            self.delete(data_location, data_key)
+        return len(expired_keys)
+
+    def save(self, data_location:str = ""):
+        if self.read_only:
+            return
+        data_locations = [data_location] if data_location != "" else list(self.data.keys())
+        for location in data_locations:
+            if location not in self.data: # the data locations, which weren't loaded, are unchanged
+                continue
+            filepath = self.filepaths[location]
+            with FileLock(f"{filepath}.lock"):
+                # merge the entries stored by the other processes since this file was loaded
+                entries = self.data[location]
+                disk_entries = JsonUtil.load_json(filepath) if os.path.exists(filepath) else {}
+                for data_key, entry in disk_entries.items():
+                    if data_key in self._deleted_keys[location] or not isinstance(entry, dict):
+                        continue
+                    if data_key not in entries or entry.get("timestamp", "") > entries[data_key].get("timestamp", ""):
+                        entries[data_key] = entry
+                JsonUtil.save_json(entries, filepath)
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    Stores all data locations in a single SQLite database (table 'cache', primary key (location, key)) in WAL mode.
+    Each store is a single upsert, which is committed immediately, so an interrupted run keeps everything stored up to that point
+    and no whole-file rewrites are needed at exit. Entries are read lazily, one key at a time, so the database is never loaded into memory.
+
+    Each row also holds the size of the stored value and its last access time. Accesses are buffered in memory and written together with the next
+    store (or on eviction and close), so that cache hits don't cause writes. The total size is kept up to date, so the LRU eviction
+    only runs when the cache exceeds its maximum size. Freed pages are returned to the filesystem (auto_vacuum=INCREMENTAL, for newly created databases).
+
+    The values are stored as compact json. Values larger than COMPRESSION_MIN_SIZE bytes are compressed with zlib, using a preset dictionary
+    (ZLIB_DICTIONARY) of the keys and values, which repeat across the GO, UniProt and Ensembl responses, so that also the smaller entries compress well.
+    The 'encoding' column records how a value is stored ("json" or "zlib-v1"), therefore the entries of both kinds can be read regardless of the settings.
+    NOTE: ZLIB_DICTIONARY must never be changed, as the "zlib-v1" entries can only be decompressed with the same dictionary. A different dictionary requires a new encoding.
+
+    Several processes (eg. parallel workflows, or process-pool workers) can use the same database at the same time: WAL mode lets the readers
+    proceed while another process writes, writers wait up to 'timeout' seconds for the write lock, and each upsert is visible to the other processes
+    as soon as it is committed. Each process (also a forked worker) uses its own connection.
+
+    If the database is empty and the json files of JsonCacheBackend exist, they are imported once (see import_json_files).
+
+    In read-only mode, the database is opened with mode=ro: the schema isn't created, the json files aren't imported and the accesses aren't recorded.
+    With mmap_size > 0, SQLite reads the database through a memory map of up to mmap_size bytes, which is shared with the other processes reading
+    the same database (instead of copying the pages into each process's page cache).
+
+    Parameters:
+      - (str) filepath: the filepath of the SQLite database
+      - (dict) json_filepaths: data location -> json filepath of the previous (json) cache files, which are imported into an empty database
+      - (int) compression_level: the zlib compression level (1-9), 0 disables the compression of new entries
+      - (float) timeout: the amount of seconds a write waits for the write lock held by another process
+      - (bool) read_only: if True, the (existing) database is opened read-only
+      - (int) mmap_size: the maximum amount of bytes of the database, which are memory-mapped (0 disables memory mapping)
+    """
+    COMPRESSION_MIN_SIZE = 256
+    ZLIB_DICTIONARY = (
+        # the most frequent fragments are placed at the end of the dictionary
+        '"ensembl_gene_id":"ENSG","canonical_transcript":"ENST","display_name":"","object_type":"Gene","biotype":"protein_coding",'
+        '"homologies":[{"target":{"species":"homo_sapiens","protein_id":"ENSP","id":"ENSG"},"type":"ortholog_one2one"}],'
+        '"entryType":"UniProtKB reviewed (Swiss-Prot)","organism":{"scientificName":"Homo sapiens","commonName":"Human","taxonId":9606},'
+        '"proteinDescription":{"recommendedName":{"fullName":{"value":""}}},"genes":[{"geneName":{"value":""}}],"primaryAccession":"","uniProtkbId":"",'
+        '"xrefs":[{"database":"RefSeq","id":"NM_"}],"Ensembl","UniProtKB:","NCBITaxon:","evidence_type":"IEA","provided_by":"UniProt",'
+        '"relation":{"id":"RO:0002264","label":"acts upstream of or within"},"category":["gene"],"taxon":{"id":"NCBITaxon:9606","label":"Homo sapiens"},'
+        '"object":{"id":"GO:","label":"","category":["biological_process"]},"subject":{"id":"UniProtKB:","label":"","category":["gene"]},'
+        '"associations":[{"id":"","negated":false,"subject":{"id":"","label":""},"object":{"id":"GO:","label":""}}],"numFound":"results":[{"data_value":'
+    ).encode("utf-8")
+
+    def __init__(self, filepath:str = "cache/cache.sqlite3", json_filepaths:dict = {}, compression_level:int = 6, timeout:float = 60.0, read_only:bool = False, mmap_size:int = 0):
+        self.filepath = filepath
+        self.compression_level = compression_level
+        self.timeout = timeout
+        self.read_only = read_only
+        self.mmap_size = mmap_size
+        self._lock = threading.Lock() # the connection is shared between the threads (eg. the thread pools of GOApi.get_products)
+        self._pending_accesses = {} # (location, key) -> last access time, not yet written to the database
+        self._db = None
+        self._pid = None
+        self._batch_depth = 0 # while > 0, the writes are not committed until end_batch
+        self._size = 0
+        if read_only:
+            if not os.path.exists(filepath):
+                raise FileNotFoundError(f"The cache database {filepath} doesn't exist, it can't be opened read-only.")
+            return
+        if os.path.dirname(filepath) != "":
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        self._create_schema()
+        if json_filepaths != {}:
+            self._import_json_files_once(json_filepaths)
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """
+        The connection of the current process. SQLite connections must not be used across processes, therefore a process-pool worker, which
+        inherited this backend from its parent (fork), opens its own connection on first use.
+        """
+        if self._db == None or self._pid != os.getpid():
+            if self.read_only:
+                self._db = sqlite3.connect(f"{pathlib.Path(os.path.abspath(self.filepath)).as_uri()}?mode=ro", uri=True, timeout=self.timeout, check_same_thread=False)
+            else:
+                # 'timeout' is the time a writer waits for the write lock, which is held by another process (or thread), before raising "database is locked"
+                self._db = sqlite3.connect(self.filepath, timeout=self.timeout, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL") # readers and the (single) writer of different processes don't block each other
+                self._db.execute("PRAGMA synchronous=NORMAL") # in WAL mode, NORMAL is durable against application crashes
+            if self.mmap_size > 0:
+                self._db.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._pid = os.getpid()
+            self._pending_accesses = {}
+        return self._db
+
+    def _create_schema(self):
+        """
+        Creates (or migrates) the cache table. The schema changes run in a single write transaction, so that processes starting in parallel
+        don't apply the same migration twice.
+        """
+        with self._lock:
+            connection = sqlite3.connect(self.filepath, timeout=self.timeout)
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL") # only has an effect before the first table is created
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.isolation_level = None # explicit transactions
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("CREATE TABLE IF NOT EXISTS cache (location TEXT NOT NULL, key TEXT NOT NULL, data_value BLOB, timestamp TEXT, size INTEGER, last_access REAL, encoding TEXT, entry_type TEXT, PRIMARY KEY (location, key)) WITHOUT ROWID")
+                connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+                # databases created before the size, last_access, encoding and entry_type columns were added
+                columns = [row[1] for row in connection.execute("PRAGMA table_info(cache)").fetchall()]
+                if "size" not in columns:
+                    connection.execute("ALTER TABLE cache ADD COLUMN size INTEGER")
+                    connection.execute("UPDATE cache SET size = LENGTH(data_value)")
+                if "last_access" not in columns:
+                    connection.execute("ALTER TABLE cache ADD COLUMN last_access REAL")
+                    connection.execute("UPDATE cache SET last_access = 0")
+                if "encoding" not in columns:
+                    connection.execute("ALTER TABLE cache ADD COLUMN encoding TEXT")
+                    connection.execute("UPDATE cache SET encoding = 'json'")
+                if "entry_type" not in columns:
+                    connection.execute("ALTER TABLE cache ADD COLUMN entry_type TEXT")
+                connection.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            finally:
+                connection.close()
+
+    def _import_json_files_once(self, json_filepaths:dict):
+        """
+        Imports the json cache files into an empty database. The 'json_imported' flag in the meta table is checked and set in the same
+        write transaction, so that only one of the processes starting in parallel imports the files.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                already_imported = self._connection.execute("SELECT value FROM meta WHERE name = 'json_imported'").fetchone() != None
+                if not already_imported and self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 0:
+                    for data_location, filepath, rows in self._read_json_files(json_filepaths):
+                        self._connection.executemany("INSERT OR REPLACE INTO cache (location, key, data_value, timestamp, size, last_access, encoding, entry_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                        logger.info(f"Imported {len(rows)} {data_location} cache entries from {filepath} into {self.filepath}")
+                if not already_imported:
+                    self._connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('json_imported', ?)", (Timer.get_current_time(),))
+                self._connection.commit()
+            except Exception:
+                self._connection.rollback()
+                raise
+
+    def get(self, data_location:str, data_key:str):
+        with self._lock:
+            row = self._connection.execute("SELECT data_value, timestamp, encoding, entry_type FROM cache WHERE location = ? AND key = ?", (data_location, data_key)).fetchone()
+        if row == None:
+            return None
+        data_value, size = self.decode_value(row[0], row[2], return_size=True)
+        entry = {"data_value": data_value, "timestamp": row[1], "size": size}
+        if row[3] != None:
+            entry["entry_type"] = row[3]
+        return entry
+
+    def encode_value(self, data_value):
+        """
+        Returns (stored value, encoding) of 'data_value'. Small values, or all values if compression_level is 0, are stored as json text.
+        """
+        json_value = json.dumps(data_value, separators=(",", ":"))
+        if self.compression_level == 0 or len(json_value) < self.COMPRESSION_MIN_SIZE:
+            return json_value, "json"
+        compressor = zlib.compressobj(self.compression_level, zdict=self.ZLIB_DICTIONARY)
+        return compressor.compress(json_value.encode("utf-8")) + compressor.flush(), "zlib-v1"
+
+    def decode_value(self, stored_value, encoding:str, return_size:bool = False):
+        """
+        Returns the data value of a stored value. If return_size is True, returns (data value, size of the decoded json in bytes).
+        """
+        if encoding == "zlib-v1":
+            decompressor = zlib.decompressobj(zdict=self.ZLIB_DICTIONARY)
+            stored_value = decompressor.decompress(stored_value) + decompressor.flush()
+        data_value = json.loads(stored_value)
+        if return_size:
+            return data_value, len(stored_value)
+        return data_value
+
+    def set(self, data_location:str, data_key:str, entry:dict):
+        data_value, encoding = self.encode_value(entry["data_value"])
+        with self._lock:
+            previous_size = self._connection.execute("SELECT size FROM cache WHERE location = ? AND key = ?", (data_location, data_key)).fetchone()
+            self._connection.execute(
+                "INSERT INTO cache (location, key, data_value, timestamp, size, last_access, encoding, entry_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (location, key) DO UPDATE SET data_value = excluded.data_value, timestamp = excluded.timestamp, size = excluded.size, last_access = excluded.last_access, encoding = excluded.encoding, entry_type = excluded.entry_type",
+                (data_location, data_key, data_value, entry["timestamp"], len(data_value), time.time(), encoding, entry.get("entry_type"))
+            )
+            if self._batch_depth == 0:
+                self._flush_accesses()
+                self._connection.commit()
+            self._size += len(data_value) - (previous_size[0] if previous_size != None and previous_size[0] != None else 0)
+
+    def delete(self, data_location:str, data_key:str):
+        with self._lock:
+            previous_size = self._connection.execute("SELECT size FROM cache WHERE location = ? AND key = ?", (data_location, data_key)).fetchone()
+            self._connection.execute("DELETE FROM cache WHERE location = ? AND key = ?", (data_location, data_key))
+            if self._batch_depth == 0:
+                self._connection.commit()
+            if previous_size != None and previous_size[0] != None:
+                self._size -= previous_size[0]
+
+    def touch(self, data_location:str, data_key:str):
+        if self.read_only:
+            return
+        with self._lock:
+            self._pending_accesses[(data_location, data_key)] = time.time()
+
+    def begin_batch(self):
+        with self._lock:
+            self._batch_depth += 1
+
+    def end_batch(self):
+        with self._lock:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush_accesses()
+                self._connection.commit()
+
+    def _flush_accesses(self):
+        """
+        Writes the buffered accesses. Must be called with self._lock held, the caller commits.
+        """
+        if self._pending_accesses == {}:
+            return
+        self._connection.executemany("UPDATE cache SET last_access = ? WHERE location = ? AND key = ?", [(last_access, location, key) for (location, key), last_access in self._pending_accesses.items()])
+        self._pending_accesses = {}
+
+    def count(self, data_location:str = "") -> int:
+        with self._lock:
+            if data_location == "":
+                return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            return self._connection.execute("SELECT COUNT(*) FROM cache WHERE location = ?", (data_location,)).fetchone()[0]
+
+    def keys(self, data_location:str) -> list:
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT key FROM cache WHERE location = ?", (data_location,)).fetchall()]
+
+    def get_meta(self, name:str):
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row != None else None
+
+    def set_meta(self, name:str, value:str):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+            if self._batch_depth == 0:
+                self._connection.commit()
+
+    def get_size(self) -> int:
+        return self._size
+
+    def evict(self, max_size:int) -> int:
+        if self._size <= max_size:
+            return 0
+        evicted = 0
+        with self._lock:
+            self._flush_accesses()
+            self._connection.commit()
+            # the size is also changed by the other processes, which share the database
+            self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if self._size <= max_size:
+                return 0
+            rows = self._connection.execute("SELECT location, key, size FROM cache ORDER BY last_access ASC")
+            evicted_rows = []
+            for location, key, size in rows:
+                if self._size <= max_size * 0.9:
+                    break
+                evicted_rows.append((location, key))
+                self._size -= size if size != None else 0
+            rows.close()
+            self._connection.executemany("DELETE FROM cache WHERE location = ? AND key = ?", evicted_rows)
+            self._connection.commit()
+            self._connection.execute("PRAGMA incremental_vacuum")
+            evicted = len(evicted_rows)
+        return evicted
+
+    def purge_expired(self, data_location:str, oldest_timestamp:str, entry_type:str = None) -> int:
+        # "%Y-%m-%d %H:%M:%S" timestamps sort chronologically as strings
+        condition = "location = ? AND timestamp < ?"
+        parameters = (data_location, oldest_timestamp)
+        if entry_type != None:
+            condition = f"{condition} AND entry_type = ?"
+            parameters = (data_location, oldest_timestamp, entry_type)
+        with self._lock:
+            expired_size = self._connection.execute(f"SELECT COALESCE(SUM(size), 0) FROM cache WHERE {condition}", parameters).fetchone()[0]
+            cursor = self._connection.execute(f"DELETE FROM cache WHERE {condition}", parameters)
+            self._connection.commit()
+            self._size -= expired_size
+            return cursor.rowcount
+
+    def _read_json_files(self, json_filepaths:dict):
+        """
+        Yields (data location, filepath, rows) for each existing json cache file, where rows are the values of the cache table columns.
+        """
+        for data_location, filepath in json_filepaths.items():
+            if not os.path.exists(filepath):
+                continue
+            data = JsonUtil.load_json(filepath)
+            rows = []
+            for data_key, entry in data.items():
+                if not isinstance(entry, dict):
+                    continue
+                # ConnectionCacher stored the entries as {"response": ..., "timestamp": ...}
+                data_value, encoding = self.encode_value(entry["data_value"] if "data_value" in entry else entry.get("response"))
+                rows.append((data_location, data_key, data_value, entry.get("timestamp", Timer.get_current_time()), len(data_value), entry.get("last_access", 0), encoding, entry.get("entry_type")))
+            yield data_location, filepath, rows
+
+    def import_json_files(self, json_filepaths:dict):
+        """
+        Imports the entries of the json cache files (data location -> json filepath), one transaction per file.
+        """
+        for data_location, filepath, rows in self._read_json_files(json_filepaths):
+            with self._lock:
+                self._connection.executemany("INSERT OR REPLACE INTO cache (location, key, data_value, timestamp, size, last_access, encoding, entry_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._connection.commit()
+                self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            logger.info(f"Imported {len(rows)} {data_location} cache entries from {filepath} into {self.filepath}")
+
+    def save(self, data_location:str = ""):
+        with self._lock:
+            if self._db != None and self._pid == os.getpid():
+                self._flush_accesses()
+                self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db != None and self._pid == os.getpid(): # the connection of the parent process is left to the parent
+                self._flush_accesses()
+                self._db.commit()
+                self._db.close()
+            self._db = None
+
+class CacheStatistics():
+    """
+    Counts the cache lookups and stores of Cacher, per stage (see Cacher.set_stage, eg. "fetch_ortholog_products") and per data location.
+    The counters of each stage and data location are:
+      - hits, misses, negative_hits: the results of the lookups (see Cacher.lookup)
+      - stores, negative_stores: the amount of store_data and store_negative calls
+      - bytes_served: the size of the json of the hit entries (only known for the sqlite backend)
+      - lookup_time: the total amount of seconds spent in the lookups
+      - saved_request_time: (hits + negative_hits) * the average request time of the stage (see set_request_time), an estimate of the amount
+                            of seconds the cache saved in this stage. Each hit saves at least one request.
+    """
+    COUNTERS = ["hits", "misses", "negative_hits", "stores", "negative_stores", "bytes_served", "lookup_time"]
+
+    def __init__(self):
+        self.stage = "" # the current stage, "" for the lookups outside of the ReverseLookup stages
+        self.counters = {} # stage -> data location -> counter name -> value
+        self.request_times = {} # stage -> the average amount of seconds of an answered request
+        self._lock = threading.Lock() # the lookups are also performed from the thread pools
+
+    def _get_counters(self, data_location:str) -> dict:
+        stage_counters = self.counters.setdefault(self.stage, {})
+        if data_location not in stage_counters:
+            stage_counters[data_location] = {counter: 0 for counter in self.COUNTERS}
+        return stage_counters[data_location]
+
+    def record_lookup(self, data_location:str, status:str, size:int, elapsed_time:float):
+        with self._lock:
+            counters = self._get_counters(data_location)
+            match status:
+                case Cacher.HIT:
+                    counters["hits"] += 1
+                    counters["bytes_served"] += size
+                case Cacher.NEGATIVE:
+                    counters["negative_hits"] += 1
+                case Cacher.MISS:
+                    counters["misses"] += 1
+            counters["lookup_time"] += elapsed_time
+
+    def record_store(self, data_location:str, negative:bool = False):
+        with self._lock:
+            self._get_counters(data_location)["negative_stores" if negative else "stores"] += 1
+
+    def set_request_time(self, stage:str, average_request_time:float):
+        """
+        Sets the average amount of seconds of a request in 'stage' (eg. from RetryStatistics.get_average_request_time), used to estimate the saved request time.
+        """
+        if average_request_time != None:
+            self.request_times[stage] = average_request_time
+
+    def to_dict(self) -> dict:
+        """
+        Returns {stage: {data location: counters, "total": counters}}, with the saved_request_time estimate added to the counters.
+        """
+        # the stages without requests (everything was cached) use the average request time of all stages
+        known_request_times = list(self.request_times.values())
+        default_request_time = sum(known_request_times) / len(known_request_times) if known_request_times != [] else 0.0
+        result = {}
+        with self._lock:
+            for stage, stage_counters in self.counters.items():
+                request_time = self.request_times.get(stage, default_request_time)
+                result[stage if stage != "" else "other"] = stage_result = {}
+                total = {counter: 0 for counter in self.COUNTERS}
+                for data_location, counters in stage_counters.items():
+                    stage_result[data_location] = dict(counters)
+                    for counter in self.COUNTERS:
+                        total[counter] += counters[counter]
+                stage_result["total"] = total
+                for counters in stage_result.values():
+                    counters["lookup_time"] = round(counters["lookup_time"], 6)
+                    counters["saved_request_time"] = round((counters["hits"] + counters["negative_hits"]) * request_time, 3)
+        return result
+
+    def save(self, filepath:str):
+        """
+        Saves the statistics (see to_dict) as json to 'filepath'.
+        """
+        if os.path.dirname(filepath) != "":
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "w") as f:
+            json.dump({"timestamp": Timer.get_current_time(), "stages": self.to_dict()}, f, indent=4)
+
+    def log_summary(self, stage:str):
+        stage_statistics = self.to_dict().get(stage if stage != "" else "other")
+        if stage_statistics == None:
+            return
+        total = stage_statistics["total"]
+        lookups = total["hits"] + total["negative_hits"] + total["misses"]
+        hit_rate = (total["hits"] + total["negative_hits"]) / lookups if lookups > 0 else 0.0
+        logger.info(f"Cache statistics for {stage}: {lookups} lookups, {total['hits']} hits, {total['negative_hits']} negative hits, {total['misses']} misses (hit rate {hit_rate:.1%}), {total['bytes_served']} bytes served, ~{total['saved_request_time']} s of requests saved.")
+        for data_location, counters in stage_statistics.items():
+            if data_location != "total":
+                logger.debug(f"  - {data_location}: {counters}")
+
+class CacheWriter():
+    """
+    A write-behind queue for Cacher. store_data and store_negative only put the write into a bounded in-memory queue, which is drained
+    by a background thread: the writes are applied in batches (one commit per batch with the sqlite backend), so that the asyncio event loop
+    and the request threads never wait for the disk. Every 'flush_interval' seconds the writer also calls the checkpoint function
+    (eg. to save the json files of the json backend with store_data_atexit=False).
+
+    Until a write is applied, it is kept in self.pending, so that Cacher.lookup also returns the entries, which are still in the queue.
+    If the queue is full (max_pending writes), the write isn't queued (store_data never waits for the writer, as it is called from the event loop). It stays in
+    self.pending and its key is marked as overflowed, so the writer applies the last entry of each overflowed key after the queued writes; the memory
+    of the overflow is bounded by the amount of distinct keys, as repeated writes of a key are coalesced.
+
+    Parameters:
+      - (function) apply_function: apply_function(data_location, data_key, entry) applies a single write to the backend
+      - (CacheBackend) backend: the backend, whose begin_batch and end_batch surround each batch
+      - (function) checkpoint_function: called by the writer thread every flush_interval seconds (after the batch) and on flush
+      - (int) max_pending: the maximum amount of queued writes
+      - (float) flush_interval: the amount of seconds between the checkpoints
+      - (int) batch_size: the maximum amount of writes applied in a single batch
+    """
+    def __init__(self, apply_function, backend:CacheBackend, checkpoint_function = None, max_pending:int = 10000, flush_interval:float = 5.0, batch_size:int = 500):
+        self.apply_function = apply_function
+        self.backend = backend
+        self.checkpoint_function = checkpoint_function
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = {} # (data_location, data_key) -> the last queued entry of data_key
+        self._overflow = {} # (data_location, data_key) -> the last entry of data_key, which didn't fit into the queue (until it is applied)
+        self._pending_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._last_checkpoint = time.time()
+        self._thread = threading.Thread(target=self._run, name="CacheWriter", daemon=True)
+        self._thread.start()
+
+    def put(self, data_location:str, data_key:str, entry:dict):
+        with self._pending_lock:
+            self.pending[(data_location, data_key)] = entry
+            try:
+                self._queue.put_nowait((data_location, data_key, entry))
+                self._overflow.pop((data_location, data_key), None) # the queued write supersedes an older overflowed write of data_key
+            except queue.Full:
+                # bugfix: a blocking put stalled the event loop (and all in-flight requests) while the writer was catching up; the write is coalesced instead
+                if self._overflow == {}:
+                    logger.debug(f"The cache write queue is full ({self._queue.maxsize} writes), further writes are coalesced until the writer catches up.")
+                self._overflow[(data_location, data_key)] = entry
+
+    def get_pending(self, data_location:str, data_key:str):
+        return self.pending.get((data_location, data_key))
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                items = [self._queue.get(timeout=self.flush_interval if self._overflow == {} else 0.05)]
+            except queue.Empty:
+                items = []
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items: # the stop sentinel of stop(), queued after all the writes
+                stop = True
+                items.remove(None)
+                self._queue.task_done()
+            overflow_items = self._take_overflow() if len(items) < self.batch_size or stop else []
+            if items != [] or overflow_items != []:
+                self._apply_batch(items, overflow_items)
+            if stop or time.time() - self._last_checkpoint >= self.flush_interval:
+                self._checkpoint()
+
+    def _take_overflow(self) -> list:
+        """
+        Returns the last entries of the overflowed keys (see put). The keys stay marked as overflowed until their entries are applied (see _apply_batch).
+        """
+        with self._pending_lock:
+            return [(data_location, data_key, entry) for (data_location, data_key), entry in self._overflow.items()]
+
+    def _apply_batch(self, items:list, overflow_items:list = []):
+        """
+        Applies the queued writes ('items') and the overflowed writes ('overflow_items', which aren't in the queue) in a single batch.
+        """
+        try:
+            self.backend.begin_batch()
+            try:
+                for data_location, data_key, entry in items + overflow_items:
+                    try:
+                        self.apply_function(data_location, data_key, entry)
+                    except Exception as e:
+                        logger.warning(f"Cache write of {data_key} failed: {e}")
+            finally:
+                self.backend.end_batch()
+        except Exception as e:
+            logger.warning(f"Cache batch commit failed: {e}")
+        finally:
+            with self._pending_lock:
+                for data_location, data_key, entry in items + overflow_items:
+                    if self.pending.get((data_location, data_key)) is entry: # a newer write of data_key may be queued
+                        del self.pending[(data_location, data_key)]
+                for data_location, data_key, entry in overflow_items:
+                    if self._overflow.get((data_location, data_key)) is entry: # a newer write of data_key may have overflowed
+                        del self._overflow[(data_location, data_key)]
+            for item in items:
+                self._queue.task_done()
+
+    def _checkpoint(self):
+        self._last_checkpoint = time.time()
+        if self.checkpoint_function != None:
+            try:
+                self.checkpoint_function()
+            except Exception as e:
+                logger.warning(f"Cache checkpoint failed: {e}")
+
+    def flush(self):
+        """
+        Waits until all queued (and overflowed) writes are applied.
+        """
+        self._queue.join()
+        while self._overflow != {} and self._thread.is_alive():
+            time.sleep(0.01)
+            self._queue.join()
+
+    def stop(self):
+        """
+        Applies all queued writes and stops the writer thread (durable flush on shutdown).
+        """
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+
 class Cacher():
     CACHE_FILEPATH_URLS = "" # filepath to the file containing online url queries and the URL RESPONSES
     CACHE_FILEPATH_UNIPROT = "" # filepath to the file containing uniprot api queries and their final results (after processing of the url responses)
     CACHE_FILEPATH_ENSEMBL = "" # filepath to the file containing ensembl api queries and their final results (after processing of the url responses)
     CACHE_FILEPATH_GENEONTOLOGY = "" # filepath to the file containing gene ontology api queries and their final results (after processing of the url responses)
+    CACHE_FILEPATH_SQLITE = "" # filepath to the SQLite database of the "sqlite" backend
+    CACHE_FILEPATH_META = "" # filepath to the metadata (eg. the key version) of the "json" backend
+    BACKENDS = ["json", "sqlite"]
+    DATA_LOCATIONS = ["url", "uniprot", "ensembl", "go"]
     cached_urls = {}
     cached_uniprot = {}
     cached_ensembl = {}
     cached_geneontology = {}
+    backend = None # the CacheBackend instance, set in init
+    writer = None # the CacheWriter (write-behind queue), if init was called with write_behind=True
+    _dirty_locations = set() # the data locations changed since the last CacheWriter checkpoint
+    statistics = CacheStatistics() # lookup and store counters per stage and data location, kept across init calls
+    CACHE_FILEPATH_STATISTICS = "cache/cache_statistics.json" # filepath of the machine-readable statistics (see save_statistics)
+    store_data_atexit = True
+    read_only = False # if True, the cache is only read (see init)
+    ttls = {} # data location -> time-to-live of the entries in days (None: the entries don't expire)
+    max_size = None # the maximum size of the cache in bytes (None: unlimited), the least recently used entries are evicted above it
+    negative_ttl = 7 # the time-to-live of the negative ("not found") entries in days
+    # the results of lookup
+    HIT = "hit"
+    MISS = "miss"
+    NEGATIVE = "negative"
+    # the version of the data key format (see canonical_key). The stored keys are migrated once, when the version of the cache is older.
+    KEY_VERSION = 1
+    DEFAULT_PORTS = {"http": 80, "https": 443}
+    FUNCTION_KEY_PATTERN = re.compile(r"^\[(\w+)\]\[(\w+)\]((?:\[[^\[\]]*\])*)$") # [class_name][function_name][param=value]...
+    ASYNC_SUFFIX_PATTERN = re.compile(r"_async(_v\d+)?$") # eg. get_human_ortholog_async, fetch_products_async_v3
     
     @classmethod
-    def init(cls, store_data_atexit:bool = True):
+    def init(cls, store_data_atexit:bool = True, backend:str = "json", ttls:dict = None, max_size_mb:float = None, compression_level:int = 6, negative_ttl:float = 7, write_behind:bool = False, max_pending_writes:int = 10000, flush_interval:float = 5.0, lazy:bool = True, read_only:bool = False, mmap_size_mb:float = 256):
         """
         Initialises ConnectionCacher. This function must be called at the program startup in order to read
         old urls into the cls.cached_urls dictionary.
 
         Parameters:
           - (bool) store_data_atexit: if True, will only store data at program exit. If False, will store data each time store_data is called.
+                                      Only applies to the "json" backend, the "sqlite" backend always stores each entry immediately.
+          - (str) backend: "json" (the default) keeps the four json cache files in memory and rewrites them as a whole on save.
+                           "sqlite" stores the entries in cache/cache.sqlite3 (WAL mode), with per-entry upserts and lazy reads. On the first
+                           run, the existing json cache files are imported into the database.
+          - (dict) ttls: the time-to-live (in days) of the entries of each data location, eg. {"url": 30, "uniprot": 90}. Entries older than
+                         their ttl are not returned by get_data and are deleted at init. Data locations, which aren't specified, don't expire.
+          - (float) max_size_mb: the maximum size of the cache (in megabytes). Above it, the least recently used entries are evicted
+                                 (on each store with the "sqlite" backend, on save with the "json" backend).
+          - (int) compression_level: the zlib compression level (1-9) of the entries of the "sqlite" backend, 0 stores the entries uncompressed
+          - (float) negative_ttl: the time-to-live (in days) of the negative entries (see store_negative). It is usually shorter than the ttls,
+                                  as the databases may add the missing entries in the meantime.
+          - (bool) write_behind: if True, the writes are queued and applied in batches by a background thread (see CacheWriter), so that
+                                 store_data never waits for the disk. The queued writes are flushed by save_data (also at exit).
+                                 It is off by default, as each process calling init (eg. process-pool workers) would start its own writer thread;
+                                 enable it only in the main process of long runs.
+          - (int) max_pending_writes: the size of the write-behind queue
+          - (float) flush_interval: the amount of seconds between the write-behind checkpoints. With the "json" backend and store_data_atexit=False,
+                                    the json files are saved at each checkpoint (instead of on each store_data).
+          - (bool) lazy: if True, the json cache files of the "json" backend are loaded on the first access of their data location (eg. a rescoring
+                         run only loads the GO cache), the expired entries of a data location are deleted when it is loaded. If False, all json cache
+                         files are loaded in init and are accessible through cached_urls, cached_uniprot, cached_ensembl and cached_geneontology.
+                         The "sqlite" backend always reads the entries lazily.
+          - (bool) read_only: if True, the cache is only read (eg. by short rescoring jobs or process-pool workers): store_data and store_negative
+                              are ignored, nothing is saved, purged or evicted and no write-behind thread is started. The "sqlite" database is opened
+                              read-only (and must exist).
+          - (float) mmap_size_mb: the maximum amount of megabytes of the "sqlite" database, which are memory-mapped (shared between the processes
+                                  reading the database), 0 disables memory mapping. The json files can't be memory-mapped.
 
         Usage:
             model = ReverseLookup.load_model("diabetes_angio_4/model_async_test.json") # make sure that model products are already computed
@@ -38,26 +917,90 @@ class Cacher():
         NOTE: WARNING !! In order for the atexit storage to work, you mustn't run the Python program in VSCode in Debug mode. Run
         it in normal mode and finish the program execution with CTRL + C to test the functionality.
         """
+        if backend not in cls.BACKENDS:
+            raise ValueError(f"Unknown cache backend {backend}. Choose one of {cls.BACKENDS}.")
+        if cls.writer != None:
+            cls.writer.stop()
+            cls.writer = None
+        if cls.backend != None:
+            cls.backend.close()
+
         cls.store_data_atexit = store_data_atexit
+        cls.read_only = read_only
+        cls.ttls = ttls if ttls != None else {}
+        cls.max_size = int(max_size_mb * 1024 * 1024) if max_size_mb != None else None
+        cls.negative_ttl = negative_ttl
         cls.CACHE_FILEPATH_URLS = "cache/connection_cache.json"
         cls.CACHE_FILEPATH_UNIPROT = "cache/uniprot_cache.json"
         cls.CACHE_FILEPATH_ENSEMBL = "cache/ensembl_cache.json"
         cls.CACHE_FILEPATH_GENEONTOLOGY = "cache/geneontology_cache.json"
-        cls.cached_urls = JsonUtil.load_json(cls.CACHE_FILEPATH_URLS)
-        cls.cached_uniprot = JsonUtil.load_json(cls.CACHE_FILEPATH_UNIPROT)
-        cls.cached_ensembl = JsonUtil.load_json(cls.CACHE_FILEPATH_ENSEMBL)
-        cls.cached_geneontology = JsonUtil.load_json(cls.CACHE_FILEPATH_GENEONTOLOGY)
+        cls.CACHE_FILEPATH_SQLITE = "cache/cache.sqlite3"
+        cls.CACHE_FILEPATH_META = "cache/cache_meta.json"
+        json_filepaths = {
+            "url": cls.CACHE_FILEPATH_URLS,
+            "uniprot": cls.CACHE_FILEPATH_UNIPROT,
+            "ensembl": cls.CACHE_FILEPATH_ENSEMBL,
+            "go": cls.CACHE_FILEPATH_GENEONTOLOGY
+        }
+
+        cls.cached_urls = {}
+        cls.cached_uniprot = {}
+        cls.cached_ensembl = {}
+        cls.cached_geneontology = {}
+        if backend == "sqlite":
+            cls.backend = SqliteCacheBackend(cls.CACHE_FILEPATH_SQLITE, json_filepaths=json_filepaths, compression_level=compression_level, read_only=read_only, mmap_size=int(mmap_size_mb * 1024 * 1024))
+        else:
+            # the expired entries of a lazily loaded data location are deleted when it is loaded
+            cls.backend = JsonCacheBackend(json_filepaths, meta_filepath=cls.CACHE_FILEPATH_META, read_only=read_only, load_callback=cls._purge_expired if not read_only else None)
+            if not lazy:
+                # the in-memory dictionaries of the json backend remain accessible through the class variables
+                cls.cached_urls = cls.backend._entries("url")
+                cls.cached_uniprot = cls.backend._entries("uniprot")
+                cls.cached_ensembl = cls.backend._entries("ensembl")
+                cls.cached_geneontology = cls.backend._entries("go")
         
-        logger.info(f"Cacher load dictionary response counts:")
-        logger.info(f"  - urls: {len(cls.cached_urls)}")
-        logger.info(f"  - uniprot: {len(cls.cached_uniprot)}")
-        logger.info(f"  - ensembl: {len(cls.cached_ensembl)}")
-        logger.info(f"  - geneontology: {len(cls.cached_geneontology)}")
+        if backend == "json" and lazy:
+            logger.info(f"Cacher (json backend{', read-only' if read_only else ''}): the cache files are loaded on the first access of their data location.")
+        else:
+            logger.info(f"Cacher ({backend} backend{', read-only' if read_only else ''}) load dictionary response counts:")
+            logger.info(f"  - urls: {cls.backend.count('url')}")
+            logger.info(f"  - uniprot: {cls.backend.count('uniprot')}")
+            logger.info(f"  - ensembl: {cls.backend.count('ensembl')}")
+            logger.info(f"  - geneontology: {cls.backend.count('go')}")
+        if read_only:
+            return # nothing is written to a read-only cache, there is nothing to save at exit
+
+        cls._migrate_keys_once()
+        if backend == "sqlite": # the json backend purges each data location when it is loaded
+            for data_location in cls.DATA_LOCATIONS:
+                cls._purge_expired(data_location)
+        if cls.max_size != None and (backend == "sqlite" or not lazy): # a lazy json cache is evicted on save, among the loaded data locations
+            evicted_count = cls.backend.evict(cls.max_size)
+            if evicted_count > 0:
+                logger.info(f"Evicted {evicted_count} least recently used cache entries (maximum cache size: {max_size_mb} MB).")
 
-        if store_data_atexit: # register the save_data function to be called on program exit
+        if write_behind:
+            cls._dirty_locations = set()
+            cls.writer = CacheWriter(cls._apply_write, cls.backend, checkpoint_function=cls._checkpoint, max_pending=max_pending_writes, flush_interval=flush_interval)
+
+        if store_data_atexit or backend == "sqlite" or write_behind: # register the save_data function to be called on program exit
             logger.info(f"Register at exit save data for Cacher.")
             atexit.register(cls.save_data)
             
+    @classmethod
+    def _purge_expired(cls, data_location:str):
+        """
+        Deletes the entries of 'data_location' older than its ttl and the negative entries older than negative_ttl.
+        """
+        ttl = cls.ttls.get(data_location)
+        if ttl != None:
+            expired_count = cls.backend.purge_expired(data_location, Timer.get_past_time(ttl))
+            if expired_count > 0:
+                logger.info(f"Deleted {expired_count} {data_location} cache entries older than {ttl} days.")
+        expired_count = cls.backend.purge_expired(data_location, Timer.get_past_time(cls.negative_ttl), entry_type="negative")
+        if expired_count > 0:
+            logger.info(f"Deleted {expired_count} negative {data_location} cache entries older than {cls.negative_ttl} days.")
+
     @classmethod
     def store_data(cls, data_location:str, data_key:str, data_value, timestamp:str=""):
         """
@@ -74,6 +1017,7 @@ class Cacher():
           - "uniprot" -> filepath = cache/uniprot_cache.json
           - "ensembl" -> filepath = cache/ensembl_cache.json
           - "go" -> filepath = cache/geneontology_cache.json
+        With the "sqlite" backend, all data locations are stored in cache/cache.sqlite3.
         
         Params:
           - (str) data_location: either 'url', 'uniprot', 'ensembl' or 'go'
@@ -116,18 +1060,11 @@ class Cacher():
         With this code, if the algorithm encounters and already queried url, it will pull its old response,
         rather than query a new one.
         """
-        
-        cached_data = {}
-        # determine type of cached data
-        match data_location:
-            case "url":
-                cached_data = cls.cached_urls
-            case "uniprot":
-                cached_data = cls.cached_uniprot
-            case "ensembl":
-                cached_data = cls.cached_ensembl
-            case "go":
-                cached_data = cls.cached_geneontology
+        if cls.backend == None:
+            logger.warning(f"Cacher is not initialised! Did you forget to call Cacher.init()?")
+            cls.init()
+        if cls.read_only:
+            return
 
         # calculate current time
         if timestamp == "":
@@ -135,157 +1072,349 @@ class Cacher():
         
         # bugfix: some urls return the following response: {'error': 'No valid lookup found for symbol Oxct2a'}
         # if this happens, do not store data
-        if data_location == "url" and "error" in data_value:
+        if data_location == "url" and isinstance(data_value, (dict, list, str)) and "error" in data_value:
             logger.warning(f"Error in data value, aborting cache store. data_value: {data_value}")
             return
         
-        # update cached_data
-        if data_key not in cached_data:
-            cached_data[data_key] = {"data_value": data_value, "timestamp": timestamp}
+        data_key = cls.canonical_key(data_location, data_key)
+        entry = {"data_value": data_value, "timestamp": timestamp}
+        cls.statistics.record_store(data_location)
+        if cls.writer != None:
+            cls.writer.put(data_location, data_key, entry)
+            return
+        cls._apply_write(data_location, data_key, entry)
+        # save the json file of this data location (the sqlite backend has already committed the entry)
+        if not cls.store_data_atexit and isinstance(cls.backend, JsonCacheBackend):
+            cls.backend.save(data_location)
+
+    @classmethod
+    def _apply_write(cls, data_location:str, data_key:str, entry:dict):
+        """
+        Applies a write of store_data or store_negative to the backend. Called directly, or by the CacheWriter thread.
+        """
+        previous_entry = cls.backend.get(data_location, data_key)
+        if entry.get("entry_type") == "negative":
+            if previous_entry == None or previous_entry.get("entry_type") == "negative": # a negative entry never replaces an answer
+                cls.backend.set(data_location, data_key, entry)
+        elif previous_entry == None or (previous_entry.get("entry_type") == "negative" and entry["data_value"] != None): # an answer always replaces a negative entry
+            cls.backend.set(data_location, data_key, entry)
         else: # this data_key already exists in previous data
-            previous_data_timestamp = cached_data[data_key]["timestamp"]
-            if Timer.compare_time(previous_data_timestamp, timestamp) == True: # will return true, if timestamp > previous_url_timestamp (timestamp is logged later in time than previous_url_timestamp)
-                if data_value != None:
-                    cached_data[data_key] = {"data_value": data_value, "timestamp": timestamp}
+            previous_data_timestamp = previous_entry["timestamp"]
+            if Timer.compare_time(previous_data_timestamp, entry["timestamp"]) == True: # will return true, if timestamp > previous_url_timestamp (timestamp is logged later in time than previous_url_timestamp)
+                if entry["data_value"] != None:
+                    cls.backend.set(data_location, data_key, entry)
         
-        # update class values with new cached data and save
-        if not cls.store_data_atexit:
-            match data_location:
-                case "url":
-                    cls.cached_urls = cached_data
-                    JsonUtil.save_json(cls.cached_urls, cls.CACHE_FILEPATH_URLS)
-                case "uniprot":
-                    cls.cached_uniprot = cached_data
-                    JsonUtil.save_json(cls.cached_uniprot, cls.CACHE_FILEPATH_UNIPROT)
-                case "ensembl":
-                    cls.cached_ensembl = cached_data
-                    JsonUtil.save_json(cls.cached_ensembl, cls.CACHE_FILEPATH_ENSEMBL)
-                case "go":
-                    cls.cached_geneontology = cached_data
-                    JsonUtil.save_json(cls.cached_geneontology, cls.CACHE_FILEPATH_GENEONTOLOGY)
+        if cls.max_size != None and isinstance(cls.backend, SqliteCacheBackend):
+            cls.backend.evict(cls.max_size) # returns immediately if the cache is below its maximum size
+        if cls.writer != None:
+            cls._dirty_locations.add(data_location)
+
+    @classmethod
+    def _checkpoint(cls):
+        """
+        Called by the CacheWriter thread every flush_interval seconds. With the json backend and store_data_atexit=False, the json files
+        of the changed data locations are saved (the sqlite backend commits each batch).
+        """
+        if cls.store_data_atexit or not isinstance(cls.backend, JsonCacheBackend):
+            return
+        dirty_locations = cls._dirty_locations
+        cls._dirty_locations = set()
+        for data_location in dirty_locations:
+            cls.backend.save(data_location)
     
     @classmethod
-    def get_data(cls, data_location:str, data_key:str):
-        cached_data = {}
-        # determine type of cached data
-        match data_location:
-            case "url":
-                cached_data = cls.cached_urls
-            case "uniprot":
-                cached_data = cls.cached_uniprot
-            case "ensembl":
-                cached_data = cls.cached_ensembl
-            case "go":
-                cached_data = cls.cached_geneontology
+    def store_negative(cls, data_location:str, data_key:str, reason:str = "", timestamp:str = ""):
+        """
+        Stores a negative entry at data_key, which records that the query of data_key has a definitive "not found" answer (eg. Ensembl's
+        400 response {'error': 'No valid lookup found for symbol Oxct2a'}, or a UniProt search without results). Transient failures
+        (timeouts, 429, 5xx) must not be stored as negative entries.
+
+        On the next run, lookup returns Cacher.NEGATIVE for data_key (until the negative_ttl expires), so the callers can return
+        without querying the server again. An existing regular entry at data_key is not overwritten.
+
+        Params:
+          - (str) data_location: either 'url', 'uniprot', 'ensembl' or 'go'
+          - (str) data_key: the key of the query
+          - (str) reason: optional, the reason of the negative answer (eg. the error text of the server)
+          - (str) timestamp: optional, timestamps are automatically calculated inside this function if not provided
+        """
+        if cls.backend == None or cls.read_only:
+            return
+        if timestamp == "":
+            timestamp = Timer.get_current_time()
+        data_key = cls.canonical_key(data_location, data_key)
+        entry = {"data_value": {"reason": reason}, "timestamp": timestamp, "entry_type": "negative"}
+        cls.statistics.record_store(data_location, negative=True)
+        if cls.writer != None:
+            cls.writer.put(data_location, data_key, entry)
+            return
+        cls._apply_write(data_location, data_key, entry)
+        if not cls.store_data_atexit and isinstance(cls.backend, JsonCacheBackend):
+            cls.backend.save(data_location)
+
+    @classmethod
+    def lookup(cls, data_location:str, data_key:str, max_age:float = None, record:bool = True) -> tuple:
+        """
+        Looks up data_key in 'data_location' and returns a tuple (status, data_value), where status is:
+          - Cacher.HIT: the data_value is stored at data_key
+          - Cacher.NEGATIVE: data_key has a definitive "not found" answer (see store_negative), data_value is None
+          - Cacher.MISS: data_key isn't stored (or is expired), data_value is None
+
+        Params:
+          - (str) data_location: either 'url', 'uniprot', 'ensembl' or 'go'
+          - (str) data_key: the key of the data
+          - (float) max_age: optional, the maximum age of the data in days, eg. max_age=30 only accepts data stored in the last 30 days.
+                             The ttl of the data location (see init) applies, even if max_age is larger.
+          - (bool) record: if False, the lookup is a probe (eg. of the CachePrewarmer's plan), which doesn't refresh the LRU recency of the entry (backend.touch)
+                           and isn't counted in Cacher.statistics
+        
+        Usage:
+            status, previous_result = Cacher.lookup("ensembl", ensembl_data_key)
+            if status == Cacher.NEGATIVE:
+                return None # the server has no answer for this query
+            if status == Cacher.HIT:
+                return previous_result
+        """
+        if cls.backend == None:
+            return cls.MISS, None
+        start_time = time.perf_counter()
+        status, return_value, size = cls._lookup(data_location, cls.canonical_key(data_location, data_key), max_age, touch=record)
+        if record == True:
+            cls.statistics.record_lookup(data_location, status, size, time.perf_counter() - start_time)
+        return status, return_value
+
+    @classmethod
+    def _lookup(cls, data_location:str, data_key:str, max_age:float = None, touch:bool = True) -> tuple:
+        """
+        Returns (status, data_value, size in bytes) of data_key, see lookup. If touch is True, the access of an entry is recorded for the LRU eviction.
+        """
+        entry = cls.backend.get(data_location, data_key)
+        if cls.writer != None:
+            pending_entry = cls.writer.get_pending(data_location, data_key) # a write, which is still in the write-behind queue
+            if pending_entry != None and (entry == None or pending_entry.get("entry_type") != "negative"):
+                entry = pending_entry
+        if entry == None:
+            return cls.MISS, None, 0
         
-        if cached_data != {}:
-            if data_key in cached_data:
-                logger.info(f"Successfully cached old data for {data_key}.")
-                return_value = cached_data[data_key]["data_value"]
-                
-                # bugfix: some urls return the following response: {'error': 'No valid lookup found for symbol Oxct2a'}
-                # if such a stored url response is read, return None
-                if "error" in return_value:
-                    return None
-                # return_value doesn't contain error -> return it
-                return return_value
-            else:
-                return None
-        else:
-            return None
+        is_negative = entry.get("entry_type") == "negative"
+        age_limits = [age for age in [cls.ttls.get(data_location), max_age, cls.negative_ttl if is_negative else None] if age != None]
+        if age_limits != [] and entry.get("timestamp", "") < Timer.get_past_time(min(age_limits)):
+            return cls.MISS, None, 0 # expired, the entry is overwritten by the next store_data
+        if touch == True:
+            cls.backend.touch(data_location, data_key)
+        if is_negative:
+            return cls.NEGATIVE, None, 0
+        
+        logger.debug(f"Successfully cached old data for {data_key}.")
+        return_value = entry["data_value"] if "data_value" in entry else entry.get("response") # ConnectionCacher stored the urls as {"response": ..., "timestamp": ...}
+        
+        # bugfix: some urls return the following response: {'error': 'No valid lookup found for symbol Oxct2a'}
+        # if such a stored url response is read, return None
+        if isinstance(return_value, (dict, list, str)) and "error" in return_value:
+            return cls.MISS, None, 0
+        # return_value doesn't contain error -> return it
+        return cls.HIT, return_value, entry.get("size", 0)
+
+    @classmethod
+    def get_data(cls, data_location:str, data_key:str, max_age:float = None):
+        """
+        Returns the data value stored at data_key in 'data_location' (see store_data), or None if it doesn't exist, is expired or is negative
+        (use lookup to distinguish between these cases).
+
+        Params:
+          - (str) data_location: either 'url', 'uniprot', 'ensembl' or 'go'
+          - (str) data_key: the key of the data
+          - (float) max_age: optional, the maximum age of the data in days, eg. max_age=30 only accepts data stored in the last 30 days.
+                             The ttl of the data location (see init) applies, even if max_age is larger.
+        """
+        status, return_value = cls.lookup(data_location, data_key, max_age=max_age)
+        return return_value
     
+    @classmethod
+    def canonical_url(cls, url:str) -> str:
+        """
+        Returns the canonical form of 'url', which is used as its data key in the "url" data location, so that the same query
+        is stored once, regardless of how the url was written:
+          - the scheme and the host are lowercased, the default port (eg. :443 for https) and a trailing dot of the host are removed
+          - the percent-encoding of the path and the query parameters is normalized (eg. "MGI%3A95537" == "MGI:95537", "+" == "%20")
+          - the query parameters are sorted, ';' separated parameters (used by Ensembl) are treated like '&' separated ones
+          - an empty query ("...?") and the fragment are removed
+
+        The canonical url is only used as a cache key, the requests are still sent to the original url.
+        """
+        scheme, netloc, path, query, fragment = urllib.parse.urlsplit(url.strip())
+        scheme = scheme.lower()
+        host, _, port = netloc.lower().rpartition(":") if ":" in netloc else (netloc.lower(), "", "")
+        host = host.rstrip(".")
+        if port != "" and not (port.isdigit() and int(port) == cls.DEFAULT_PORTS.get(scheme)):
+            host = f"{host}:{port}"
+        path = urllib.parse.quote(urllib.parse.unquote(path), safe="/:@!$&'()*+,;=~")
+        query_params = []
+        for query_param in re.split("[&;]", query):
+            if query_param == "":
+                continue
+            name, _, value = query_param.partition("=")
+            query_params.append((urllib.parse.unquote_plus(name), urllib.parse.unquote_plus(value)))
+        query = "&".join(f"{urllib.parse.quote(name, safe=':,')}={urllib.parse.quote(value, safe=':,')}" for name, value in sorted(query_params))
+        return urllib.parse.urlunsplit((scheme, host, path, query, ""))
+
+    @classmethod
+    def function_key(cls, class_name:str, operation:str, **params) -> str:
+        """
+        Returns the data key of a function result in the format [class_name][operation][param=value]..., with the params sorted by name.
+        'operation' is the logical name of the query, which is shared by the sync and the async implementation (eg. "get_human_ortholog" for
+        get_human_ortholog and get_human_ortholog_async), so that both read and write the same entry.
+
+        Usage:
+            ensembl_data_key = Cacher.function_key(self.__class__.__name__, "get_human_ortholog", id=id)
+        """
+        operation = cls.ASYNC_SUFFIX_PATTERN.sub("", operation)
+        return f"[{class_name}][{operation}]" + "".join(f"[{name}={params[name]}]" for name in sorted(params))
+
+    @classmethod
+    def canonical_key(cls, data_location:str, data_key:str) -> str:
+        """
+        Returns the canonical form of data_key. The urls of the "url" data location are canonicalized with canonical_url, the function keys
+        ([class_name][function_name][param=value]...) of the other data locations use the logical operation name and sorted params (see function_key).
+        Other keys are returned unchanged.
+        """
+        if not isinstance(data_key, str):
+            return data_key
+        if data_location == "url":
+            return cls.canonical_url(data_key)
+        match = cls.FUNCTION_KEY_PATTERN.match(data_key)
+        if match == None:
+            return data_key
+        class_name, operation, params = match.groups()
+        if params.count("[") > 1:
+            params = "".join(sorted(re.findall(r"\[[^\[\]]*\]", params)))
+        return f"[{class_name}][{cls.ASYNC_SUFFIX_PATTERN.sub('', operation)}]{params}"
+
+    @classmethod
+    def _migrate_keys_once(cls):
+        """
+        Rewrites the data keys stored in an older key format (see KEY_VERSION) to their canonical form (see canonical_key). When the same
+        canonical key was stored under several keys (eg. by get_human_ortholog and get_human_ortholog_async), the newest entry is kept,
+        and an answer is preferred over a negative entry.
+        """
+        key_version = cls.backend.get_meta("key_version")
+        if key_version != None and int(key_version) >= cls.KEY_VERSION:
+            return
+        migrated_count = 0
+        merged_count = 0
+        cls.backend.begin_batch()
+        try:
+            for data_location in cls.DATA_LOCATIONS:
+                for data_key in cls.backend.keys(data_location):
+                    canonical_key = cls.canonical_key(data_location, data_key)
+                    if canonical_key == data_key:
+                        continue
+                    entry = cls.backend.get(data_location, data_key)
+                    existing_entry = cls.backend.get(data_location, canonical_key)
+                    cls.backend.delete(data_location, data_key)
+                    if entry == None or not isinstance(entry, dict):
+                        continue
+                    entry.pop("size", None)
+                    if "data_value" not in entry: # ConnectionCacher stored the urls as {"response": ..., "timestamp": ...}
+                        entry = {"data_value": entry.get("response"), "timestamp": entry.get("timestamp", Timer.get_current_time())}
+                    if existing_entry == None:
+                        cls.backend.set(data_location, canonical_key, entry)
+                    else:
+                        merged_count += 1
+                        is_newer = entry.get("timestamp", "") > existing_entry.get("timestamp", "")
+                        entry_is_negative = entry.get("entry_type") == "negative"
+                        existing_is_negative = existing_entry.get("entry_type") == "negative"
+                        if (existing_is_negative and not entry_is_negative) or (is_newer and entry_is_negative == existing_is_negative):
+                            cls.backend.set(data_location, canonical_key, entry)
+                    migrated_count += 1
+        finally:
+            cls.backend.end_batch()
+        cls.backend.save()
+        cls.backend.set_meta("key_version", str(cls.KEY_VERSION))
+        if migrated_count > 0:
+            logger.info(f"Migrated {migrated_count} cache entries to canonical keys ({merged_count} duplicates merged).")
+
+    @classmethod
+    def set_stage(cls, stage:str):
+        """
+        Sets the stage (eg. "fetch_ortholog_products"), under which the following lookups and stores are counted in Cacher.statistics.
+        An empty stage counts them under "other".
+        """
+        cls.statistics.stage = stage
+
+    @classmethod
+    def save_statistics(cls, filepath:str = ""):
+        """
+        Saves Cacher.statistics to 'filepath' (CACHE_FILEPATH_STATISTICS by default) as json.
+        """
+        if filepath == "":
+            filepath = cls.CACHE_FILEPATH_STATISTICS
+        cls.statistics.save(filepath)
+
     @classmethod
     def save_data(cls):
         """
         Saves 'cached_urls', 'cached_uniprot' and 'cached_ensembl' to their respective
-        cache filepaths (CACHE_FILEPATH_URLS, CACHE_FILEPATH_UNIPROT, CACHE_FILEPATH_ENSEMBL)
+        cache filepaths (CACHE_FILEPATH_URLS, CACHE_FILEPATH_UNIPROT, CACHE_FILEPATH_ENSEMBL).
+        With the "sqlite" backend, the entries are already committed, the database is only closed.
         """
+        if cls.backend == None:
+            return
         logger.info(f"Cacher is saving data. Please, be patient.")
-        JsonUtil.save_json(cls.cached_urls, cls.CACHE_FILEPATH_URLS)
-        JsonUtil.save_json(cls.cached_uniprot, cls.CACHE_FILEPATH_UNIPROT)
-        JsonUtil.save_json(cls.cached_ensembl, cls.CACHE_FILEPATH_ENSEMBL)
-        JsonUtil.save_json(cls.cached_geneontology, cls.CACHE_FILEPATH_GENEONTOLOGY)
+        if cls.writer != None:
+            cls.writer.stop() # applies the queued writes
+            cls.writer = None
+        if cls.max_size != None and not cls.read_only:
+            cls.backend.evict(cls.max_size)
+        cls.backend.save()
+        if isinstance(cls.backend, SqliteCacheBackend):
+            cls.backend.close()
+            cls.backend = None
         logger.info(f"Successfully saved url, uniprot, ensembl and geneontology cache.")
 
 
 class ConnectionCacher(Cacher):
     """
-    ConnectionCacher accesses root/cache/connection_cache.json in order to store and retrieve old
-    url connections and their belonging data (url response, time of request)
+    ConnectionCacher stores and retrieves old url connections and their belonging data (url response, time of request).
 
     A newer implementation, which combines connection caching, as well as caching of processed uniprot or
-    ensembl function results, is the Cacher class. It is advisable to use the Cacher class with the
-    parameter "url" as data_location in place of ConnectionCacher.
+    ensembl function results, is the Cacher class. ConnectionCacher is kept for backwards compatibility and
+    stores the urls in the "url" data location of Cacher (and its backend).
 
     NOTE: We could make three implementations of Cacher -> ConnectionCacher, UniprotCacher, EnsemblCacher,
     but that would add too complex functionality, which can be reasonably implemented in a single class.
     """
     CACHE_FILEPATH = "cache/connection_cache.json"
-    cached_urls = {}
 
     @classmethod
     def init(cls):
         """
-        Initialises ConnectionCacher. This function must be called at the program startup in order to read
-        old urls into the cls.cached_urls dictionary.
+        Initialises ConnectionCacher. If Cacher is not yet initialised, it is initialised with the default settings.
         """
-        cls.CACHE_FILEPATH = "cache/connection_cache.json"
-        cls.cached_urls = JsonUtil.load_json(cls.CACHE_FILEPATH)
+        if Cacher.backend == None:
+            Cacher.init()
 
     @classmethod
     def store_url(cls, url:str, response, timestamp:str=""):
         """
         Stores the 'url' as the key, it's value is a dictionary comprised of 'response' and 'timestamp'.
-        The key-value pair is stored in root/cache/connection_cache.json. If timestamp is not provided, then
-        a timestamp will be calculated inside this function.
+        If timestamp is not provided, then a timestamp will be calculated inside this function.
 
-        Json outline:
-        {url1 -> {"response": response1, "timestamp": timestamp1}},
-        {url2 -> {"response": response2, "timestamp": timestamp2}},
-        ...
+        bugfix: previously, the whole connection_cache.json was rewritten on each call. Now, the url is stored with Cacher.store_data,
+        which follows the backend and the store_data_atexit setting of Cacher.init.
         """
-        # data = JsonUtil.load_json(cls.CACHE_FILEPATH)
-        
-        data = cls.cached_urls
-        if timestamp == "":
-            timestamp = Timer.get_current_time()
-
-        if "url" not in data: # url doesn't exist in previous data -> add it
-            data[url] = {"response": response, "timestamp": timestamp} # add new element
-            cls.cached_urls = data # update cached urls
-            JsonUtil.save_json(cls.cached_urls, cls.CACHE_FILEPATH) # save cached urls
-        else: # this url already exists in previous data
-            # previous_url_response = data[url]["response"]
-            previous_url_timestamp = data[url]["timestamp"]
-            if Timer.compare_time(previous_url_timestamp, timestamp) == True: # will return true, if timestamp > previous_url_timestamp (timestamp is logged later in time than previous_url_timestamp)
-                if response != None:
-                    data[url] = {"response": response, "timestamp": timestamp} # add new element
-                    cls.cached_urls = data # update cached urls
-                    JsonUtil.save_json(cls.cached_urls, cls.CACHE_FILEPATH) # save cached urls
+        cls.init()
+        Cacher.store_data("url", url, response, timestamp=timestamp)
 
     @classmethod
-    def get_url_response(cls, url:str):
+    def get_url_response(cls, url:str, max_age:float = None):
         """
         Obtains the response of the 'url' from previously cached urls, if the same url already exists.
-        Previously cached urls and their responses are stored in root/cache/connection_cache.json.
+        If max_age (in days) is specified, older responses are ignored.
 
         Returns None either if url doesn't exist or if the response of the url is stored as None.
         """
-        if cls.cached_urls == {}:
-            logger.warning(f"Cached_urls variable is empty! Did you forget to call ConnectionCacher.init()?")
+        if Cacher.backend == None:
+            logger.warning(f"Cacher is not initialised! Did you forget to call ConnectionCacher.init()?")
             cls.init()
-        
-        if cls.cached_urls != {}:
-            if url in cls.cached_urls:
-                # TODO: implement url age option, eg. if the user selects "previous month", if the url is older than that, return None
-                logger.info(f"Cached response for {url}: {cls.cached_urls[url]['response']}")
-                return cls.cached_urls[url]["response"]
-            else: # url wasn't found
-                return None
-        else:
-            return None
-            
-
-
-
-    
+        return Cacher.get_data("url", url, max_age=max_age)
@@ -2,6 +2,8 @@ import logging
 from typing import TYPE_CHECKING, Set, List, Dict, Optional
 from .AnnotationProcessor import GOApi, GOAnnotiationsFile
 from .CacheUtils import Cacher
+from .HttpUtils import AsyncRetryPolicy
+from .HttpTransport import HttpTransport
 import aiohttp, asyncio
 
 logger = logging.getLogger(__name__)
@@ -117,18 +119,52 @@ class GOTerm:
         }
         """
         logger.info("Fetching GO Term names (labels) and descriptions (definitions).")
+        if self.load_name_description_from_cache() == True:
+            return
         data = api.get_data(self.id)
         if data:
             if "label" in data:
                 self.name = data['label']
             if "definition" in data:
                 self.description = data['definition']
+            self.store_name_description_to_cache()
             logger.info(f"Fetched name and description for GO term {self.id}")
 
-    async def fetch_name_description_async(self, api: GOApi, req_delay=0.1):
-        async with aiohttp.ClientSession() as session:
-            url = api.get_data(self.id, get_url_only=True)
-            response = await session.get(url)
+    def _get_name_description_data_key(self) -> str:
+        # the sync and the async variant of fetch_name_description share the same data key
+        return Cacher.function_key(self.__class__.__name__, "fetch_name_description", go_id=self.id)
+
+    def load_name_description_from_cache(self) -> bool:
+        """
+        Sets the name and description of this GO Term from the Cacher ("go" data location), if they were previously fetched.
+        Returns True if the cached name and description were found.
+        """
+        previous_data = Cacher.get_data("go", self._get_name_description_data_key())
+        if previous_data == None:
+            return False
+        self.name = previous_data.get("name", self.name)
+        self.description = previous_data.get("description", self.description)
+        return True
+    
+    def store_name_description_to_cache(self):
+        """
+        Stores the name and description of this GO Term to the Cacher ("go" data location).
+        """
+        Cacher.store_data("go", self._get_name_description_data_key(), {"name": self.name, "description": self.description})
+
+    async def fetch_name_description_async(self, api: GOApi, req_delay=0.1, session:aiohttp.ClientSession = None):
+        """
+        Async variant of fetch_name_description. If 'session' is supplied (eg. the shared session of ReverseLookup's AsyncRuntime), it is reused,
+        otherwise a new ClientSession is created for this GO Term.
+        """
+        if self.load_name_description_from_cache() == True:
+            return
+        if session == None:
+            async with aiohttp.ClientSession() as session:
+                return await self.fetch_name_description_async(api, req_delay=req_delay, session=session)
+        
+        url = api.get_data(self.id, get_url_only=True)
+        async with session.get(HttpTransport.resolve_url(url)) as response:
             if response.status == 200:
                 data = await response.json()
                 await asyncio.sleep(req_delay)
@@ -136,6 +172,7 @@ class GOTerm:
                     self.name = data['label']
                 if "definition" in data:
                     self.description = data['definition']
+                self.store_name_description_to_cache()
                 # logger.info(f"Fetched name and description for GO term {self.id}")
                 # print out only 15 desc chars not to clutter console
                 logger.info(f"GOid {self.id}: name = {self.name}, description = {self.description[:15]}...")
@@ -186,9 +223,13 @@ class GOTerm:
                 error_report = products
                 self.http_error_codes["products"] = error_report
     
-    async def fetch_products_async_v3(self, session:aiohttp.ClientSession, request_params = {"rows":20000}, req_delay=0.5, max_retries = 3):
+    async def fetch_products_async_v3(self, session:aiohttp.ClientSession, request_params = {"rows":20000}, req_delay=0.5, max_retries = 3, retry_policy:AsyncRetryPolicy = None, page_size:int = 5000, max_concurrent_pages:int = 4):
         """
-        A better variant of get_products_async. Doesn't include timeout in the url request, no retries.
+        A better variant of get_products_async. Doesn't include timeout in the url request.
+        The products are fetched in start/rows windows of 'page_size' rows (at most request_params['rows'] in total), at most 'max_concurrent_pages' windows are fetched at once.
+        The windows are streamed and filtered against GOApi.APPROVED_DATABASES as they are parsed (see GOApi.get_products_paginated_async).
+        Transient errors (429, 5xx, timeouts) are retried according to 'retry_policy' (if None, an AsyncRetryPolicy with 'max_retries' is used).
+        If the request fails after all retries, the error is stored in self.http_error_codes['products'] and None is returned, so that the caller can re-queue this GO Term.
         Doesn't create own ClientSession, but relies on external ClientSession, hence doesn't overload the server as does the get_products_async_notimeout function.
         
         # Previous algorithm created one aiohttp.ClientSession FOR EACH GOTERM. Therefore, each ClientSession only had one connection,
@@ -204,55 +245,37 @@ class GOTerm:
         #            response = await session.get(url)
         #            # Process the response
         """
-        # data key is in the format [class_name][function_name][function_params]
-        data_key = f"[{self.__class__.__name__}][{self.fetch_products_async_v3.__name__}][go_id={self.id}]"
+        # data key is in the format [class_name][operation][function_params], see Cacher.function_key
+        data_key = Cacher.function_key(self.__class__.__name__, "fetch_products", go_id=self.id)
         previous_data = Cacher.get_data("go", data_key)
         if previous_data != None:
             logger.debug(f"Cached previous product fetch data for {self.id}")
             self.products = previous_data
             return previous_data
 
-        APPROVED_DATABASES = [["UniProtKB", ["NCBITaxon:9606"]],
-                      ["ZFIN", ["NCBITaxon:7955"]],
-                      #["RNAcentral", ["NCBITaxon:9606"]],
-                      ["Xenbase", ["NCBITaxon:8364"]],
-                      ["MGI", ["NCBITaxon:10090"]],
-                      ["RGD", ["NCBITaxon:10116"]]]
         url = f"http://api.geneontology.org/api/bioentity/function/{self.id}/genes"
         params = request_params # 10k rows resulted in 56 mismatches for querying products for 200 goterms (compared to reference model, loaded from synchronous query data)
         
-        retries = 0
-        data = None
-        for _ in range(max_retries):
-            possible_http_error_text = ""
-            if retries == (max_retries-1):
-                logger.warning(f"Exceeded max retries when parsing {self.id}")
-                raise Exception(f"Exceeded max retries when parsing {self.id}. HTTP error text = {possible_http_error_text}")
-            retries +=1
-
-            previous_response = Cacher.get_data("url", url)
-            if previous_response != None:
-                data = previous_response
-                break # previous response json was cached, break the loop
-            else:
-                await asyncio.sleep(req_delay)
-                response = await session.get(url, params=params)
-                if response.status != 200: # return HTTP Error if status is not 200 (not ok), parse it into goterm.http_errors -> TODO: recalculate products for goterms with http errors
-                    possible_http_error_text = f"HTTP Error when parsing {self.id}. Response status = {response.status}"
-                    logger.warning(possible_http_error_text)
-                    # return f"HTTP Error: status = {response.status}, reason = {response.reason}"
-                    continue
-                data = await response.json()
-                if data != None:
-                    Cacher.store_data("url", url, data)
-                    logger.debug(f"Cached async product fetch data for {self.id}")
-                    break # reponse json was obtained, break the loop
-            
-        products_set = set()
-        for assoc in data['associations']:
-            if assoc['object']['id'] == self.id and any((database[0] in assoc['subject']['id'] and any(taxon in assoc['subject']['taxon']['id'] for taxon in database[1])) for database in APPROVED_DATABASES):
-                product_id = assoc['subject']['id']
-                products_set.add(product_id)
+        previous_response = Cacher.get_data("url", url) # whole responses were cached by the previous versions of this function
+        if previous_response != None and 'associations' in previous_response:
+            products_set = set()
+            for assoc in previous_response['associations']:
+                if GOApi.is_approved_association(assoc, self.id):
+                    products_set.add(assoc['subject']['id'])
+        else:
+            if retry_policy == None:
+                retry_policy = AsyncRetryPolicy(max_retries=max_retries)
+            await asyncio.sleep(req_delay)
+            # the response isn't cached as a whole anymore (it can be huge), only the filtered products are cached under data_key
+            fetched_products = await GOApi.get_products_paginated_async(self.id, session, retry_policy, request_params=params, page_size=page_size, max_concurrent_pages=max_concurrent_pages)
+            if fetched_products == None:
+                # parse the http error into goterm.http_error_codes, the goterm is re-queued by ReverseLookup
+                possible_http_error_text = f"HTTP Error when parsing {self.id}: {retry_policy.statistics.failed_items.get(self.id, 'error response')}"
+                logger.warning(possible_http_error_text)
+                self.http_error_codes["products"] = possible_http_error_text
+                return None
+            products_set = set(fetched_products)
+        self.http_error_codes.pop("products", None)
         
         products = list(products_set)
         if products == []:
@@ -265,6 +288,10 @@ class GOTerm:
         Cacher.store_data("go", data_key, products)
         return products
     
+    async def fetch_products_async_v3_semaphore(self, session:aiohttp.ClientSession, semaphore:asyncio.Semaphore, request_params = {"rows":20000}, req_delay=0.5, max_retries = 3, retry_policy:AsyncRetryPolicy = None, page_size:int = 5000, max_concurrent_pages:int = 4):
+        async with semaphore:
+            return await self.fetch_products_async_v3(session, request_params=request_params, req_delay=req_delay, max_retries=max_retries, retry_policy=retry_policy, page_size=page_size, max_concurrent_pages=max_concurrent_pages)
+    
     """
     async def fetch_products_async(self, source):
         #Warning: this function doesn't work if source is GO Annotations File
@@ -0,0 +1,271 @@
+import asyncio
+import aiohttp
+from aiohttp import web
+import atexit
+import gzip
+import json
+import os
+import random
+import socket
+import threading
+import logging
+from urllib.parse import urlsplit, parse_qsl, urlencode, quote
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+class HttpTransport:
+    """
+    A pluggable transport layer under GOApi, UniProtAPI and EnsemblAPI (both the synchronous requests sessions and the async aiohttp requests).
+    It has three modes:
+      - live: the requests are sent directly to the servers (default behaviour)
+      - record: the requests are sent through a local stand-in server, which forwards them to the real servers and records the responses into a compact
+                archive (gzipped json lines)
+      - replay: the requests are sent to the local stand-in server, which serves the recorded responses from the archive, with a configurable latency,
+                error rate and 429 (Too Many Requests) injection. This allows running the workflows without network and benchmarking the async stages
+                (concurrency settings, retry policies) deterministically. A request without an archived response is answered with a (retryable) 503
+                and the X-Replay-Missing header, so that it fails instead of being cached as a definitive answer.
+
+    In record and replay mode, the request urls are rewritten from eg. https://rest.uniprot.org/uniprotkb/search?query=...
+    to http://127.0.0.1:{port}/https/rest.uniprot.org/uniprotkb/search?query=... (see resolve_url). Cache keys (Cacher) still use the original urls.
+
+    Usage (before the model is created, similar to Cacher.init):
+        HttpTransport.init(mode="record", archive_filepath="cache/http_archive.jsonl.gz")
+        # or
+        HttpTransport.init(mode="replay", archive_filepath="cache/http_archive.jsonl.gz", latency=0.05, error_rate=0.01, rate_limit_rate=0.02, seed=42)
+        ...
+        HttpTransport.close() # also registered at exit; in record mode, this saves the archive
+    """
+    MODES = ["live", "record", "replay"]
+    MISSING_HEADER = "X-Replay-Missing" # the header of the replayed responses, for which there is no archived response
+    ARCHIVE_FILEPATH = "cache/http_archive.jsonl.gz"
+
+    mode = "live"
+    archive_filepath = ARCHIVE_FILEPATH
+    archive = {} # canonical url -> {"status": (int), "content_type": (str), "body": (str)}
+    latency = 0.0 # base latency (in seconds) of each replayed response
+    latency_jitter = 0.0 # random additional latency (in seconds) of each replayed response
+    error_rate = 0.0 # the probability of a replayed response being a 503 error
+    rate_limit_rate = 0.0 # the probability of a replayed response being a 429 error
+    retry_after = 1 # the Retry-After header value of injected 429 responses
+    statistics = {} # served, missing, recorded, injected_errors, injected_rate_limits
+
+    _random = random.Random()
+    _base_url = ""
+    _loop = None
+    _thread = None
+    _runner = None
+    _record_session = None
+    _atexit_registered = False
+
+    @classmethod
+    def init(cls, mode:str = "live", archive_filepath:str = ARCHIVE_FILEPATH, latency:float = 0.0, latency_jitter:float = 0.0, error_rate:float = 0.0, rate_limit_rate:float = 0.0, retry_after:int = 1, seed:int = None, port:int = 0):
+        """
+        Initialises the transport. In record and replay mode, the archive is loaded and the local stand-in server is started in a background thread.
+
+        Parameters:
+          - (str) mode: "live", "record" or "replay"
+          - (str) archive_filepath: the filepath of the response archive
+          - (float) latency, (float) latency_jitter: the latency of each replayed response is latency + uniform(0, latency_jitter) seconds
+          - (float) error_rate: the probability (0 to 1) of a replayed response being replaced with a 503 (Service Unavailable) error
+          - (float) rate_limit_rate: the probability (0 to 1) of a replayed response being replaced with a 429 (Too Many Requests) error
+          - (int) retry_after: the Retry-After header of the injected 429 responses
+          - (int) seed: the seed of the error injection, for reproducible runs
+          - (int) port: the port of the stand-in server (0 chooses a free port)
+        """
+        if mode not in cls.MODES:
+            raise ValueError(f"Unknown transport mode {mode}. Choose one of {cls.MODES}.")
+        cls.close()
+
+        cls.mode = mode
+        cls.archive_filepath = archive_filepath
+        cls.latency = latency
+        cls.latency_jitter = latency_jitter
+        cls.error_rate = error_rate
+        cls.rate_limit_rate = rate_limit_rate
+        cls.retry_after = retry_after
+        cls._random = random.Random(seed)
+        cls.statistics = {"served": 0, "missing": 0, "recorded": 0, "injected_errors": 0, "injected_rate_limits": 0}
+
+        if mode == "live":
+            return
+        cls.archive = cls.load_archive(archive_filepath)
+        cls._start_server(port)
+        if not cls._atexit_registered:
+            atexit.register(cls.close)
+            cls._atexit_registered = True
+        logger.info(f"Started the {mode} http transport at {cls._base_url} with {len(cls.archive)} archived responses.")
+
+    @classmethod
+    def resolve_url(cls, url:str) -> str:
+        """
+        Returns the url, to which a request for 'url' should be sent. In live mode, this is 'url', in record and replay mode the url
+        of the local stand-in server.
+        """
+        if cls.mode == "live" or cls._base_url == "" or url.startswith(cls._base_url):
+            return url
+        split_url = urlsplit(url)
+        resolved_url = f"{cls._base_url}/{split_url.scheme}/{split_url.netloc}{split_url.path}"
+        if split_url.query != "":
+            resolved_url = f"{resolved_url}?{split_url.query}"
+        return resolved_url
+
+    @classmethod
+    def get_adapter(cls, max_retries = None) -> HTTPAdapter:
+        """
+        Returns a requests adapter, which sends the requests of a (synchronous) requests.Session through the transport. It replaces
+        HTTPAdapter(max_retries=...) when mounting the retrying sessions of GOApi, UniProtAPI and EnsemblAPI.
+        """
+        return TransportAdapter(max_retries=max_retries)
+
+    @classmethod
+    def get_archive_key(cls, url:str) -> str:
+        """
+        Returns the canonical archive key of 'url': the query parameters are sorted and consistently encoded, so that the same request
+        sent by requests and aiohttp maps to the same archived response.
+        """
+        split_url = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(split_url.query, keep_blank_values=True)), quote_via=quote)
+        key = f"{split_url.scheme}://{split_url.netloc.lower()}{split_url.path}"
+        if query != "":
+            key = f"{key}?{query}"
+        return key
+
+    @classmethod
+    def load_archive(cls, filepath:str) -> dict:
+        archive = {}
+        if not os.path.exists(filepath):
+            return archive
+        with gzip.open(filepath, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip() == "":
+                    continue
+                entry = json.loads(line)
+                archive[entry["key"]] = {"status": entry["status"], "content_type": entry["content_type"], "body": entry["body"]}
+        return archive
+
+    @classmethod
+    def save_archive(cls, filepath:str = ""):
+        if filepath == "":
+            filepath = cls.archive_filepath
+        if os.path.dirname(filepath) != "":
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with gzip.open(filepath, "wt", encoding="utf-8") as f:
+            for key, entry in cls.archive.items():
+                f.write(json.dumps({"key": key, **entry}, separators=(",", ":")) + "\n")
+        logger.info(f"Saved {len(cls.archive)} archived responses to {filepath}")
+
+    @classmethod
+    def close(cls):
+        """
+        Stops the stand-in server. In record mode, the archive is saved.
+        """
+        if cls._loop == None:
+            return
+        future = asyncio.run_coroutine_threadsafe(cls._stop_server(), cls._loop)
+        future.result()
+        cls._loop.call_soon_threadsafe(cls._loop.stop)
+        cls._thread.join()
+        cls._loop.close()
+        cls._loop = None
+        cls._thread = None
+        cls._base_url = ""
+        if cls.mode == "record":
+            cls.save_archive()
+        logger.info(f"Stopped the {cls.mode} http transport. Statistics: {cls.statistics}")
+
+    @classmethod
+    def _start_server(cls, port:int):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", port))
+        cls._base_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+        cls._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        async def start():
+            app = web.Application()
+            app.router.add_route("GET", "/{scheme}/{host}/{path:.*}", cls._handle_request)
+            cls._runner = web.AppRunner(app, access_log=None)
+            await cls._runner.setup()
+            await web.SockSite(cls._runner, sock).start()
+            if cls.mode == "record":
+                cls._record_session = aiohttp.ClientSession()
+
+        def run_loop():
+            asyncio.set_event_loop(cls._loop)
+            cls._loop.run_until_complete(start())
+            started.set()
+            cls._loop.run_forever()
+
+        cls._thread = threading.Thread(target=run_loop, name="HttpTransportServer", daemon=True)
+        cls._thread.start()
+        started.wait()
+
+    @classmethod
+    async def _stop_server(cls):
+        if cls._record_session != None:
+            await cls._record_session.close()
+            cls._record_session = None
+        await cls._runner.cleanup()
+
+    @classmethod
+    async def _handle_request(cls, request:web.Request) -> web.Response:
+        scheme = request.match_info["scheme"]
+        host = request.match_info["host"]
+        path = request.match_info["path"]
+        url = f"{scheme}://{host}/{path}"
+        if request.query_string != "":
+            url = f"{url}?{request.query_string}"
+        key = cls.get_archive_key(url)
+
+        if cls.mode == "record":
+            return await cls._record_response(request, url, key)
+
+        # replay mode
+        await asyncio.sleep(cls.latency + cls._random.uniform(0, cls.latency_jitter))
+        if cls._random.random() < cls.rate_limit_rate:
+            cls.statistics["injected_rate_limits"] += 1
+            return web.json_response({"error": "Too Many Requests (injected)"}, status=429, headers={"Retry-After": str(cls.retry_after)})
+        if cls._random.random() < cls.error_rate:
+            cls.statistics["injected_errors"] += 1
+            return web.json_response({"error": "Service Unavailable (injected)"}, status=503)
+        if key not in cls.archive:
+            cls.statistics["missing"] += 1
+            logger.warning(f"No archived response for {url}")
+            # bugfix: a 404 is a definitive answer for the retry policies, which would cache it (as a url entry or a negative entry) in the real cache.
+            # A 503 is retried and then fails, so a missing response is never cached.
+            return web.json_response({"error": f"No archived response for {url}"}, status=503, headers={cls.MISSING_HEADER: "1"})
+        entry = cls.archive[key]
+        cls.statistics["served"] += 1
+        return web.Response(body=entry["body"].encode("utf-8"), status=entry["status"], headers={"Content-Type": entry["content_type"]})
+
+    @classmethod
+    async def _record_response(cls, request:web.Request, url:str, key:str) -> web.Response:
+        headers = {header: request.headers[header] for header in ["Content-Type", "Accept"] if header in request.headers}
+        try:
+            async with cls._record_session.get(url, headers=headers) as response:
+                body = await response.read()
+                content_type = response.headers.get("Content-Type", "application/json")
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return web.json_response({"error": f"{type(e).__name__}: {str(e)}"}, status=502)
+
+        if status not in [429, 500, 502, 503, 504]: # transient errors are not recorded, so they are not replayed as definitive answers
+            cls.archive[key] = {"status": status, "content_type": content_type, "body": body.decode("utf-8", errors="replace")}
+            cls.statistics["recorded"] += 1
+        response_headers = {"Content-Type": content_type}
+        if retry_after != None:
+            response_headers["Retry-After"] = retry_after
+        return web.Response(body=body, status=status, headers=response_headers)
+
+class TransportAdapter(HTTPAdapter):
+    """
+    A requests adapter, which rewrites the request urls according to HttpTransport.resolve_url before sending them.
+    In live mode, it behaves exactly as HTTPAdapter.
+    """
+    def send(self, request, **kwargs):
+        request.url = HttpTransport.resolve_url(request.url)
+        return super().send(request, **kwargs)
@@ -0,0 +1,319 @@
+import asyncio
+import aiohttp
+import random
+import time
+import logging
+from urllib.parse import urlsplit
+from .HttpTransport import HttpTransport
+
+logger = logging.getLogger(__name__)
+
+class RetryStatistics:
+    """
+    Holds the per-run request statistics of an AsyncRetryPolicy: the amount of performed requests, retries, successes and failures,
+    the counts of received http statuses and raised exceptions, and the items (eg. product ids) whose requests failed after all retries.
+    """
+    def __init__(self):
+        self.requests = 0 # all performed requests (including retries)
+        self.retries = 0 # requests, which were repeated because of a retryable status or exception
+        self.successes = 0 # requests, which returned a 2xx status
+        self.definitive_errors = 0 # requests, which returned a non-retryable error status (eg. 400: No valid lookup found for symbol ...)
+        self.failures = 0 # requests, which failed after all retries
+        self.short_circuits = 0 # requests, which weren't sent because the circuit breaker of the host was open
+        self.request_time = 0.0 # the total amount of seconds of the answered requests (2xx or definitive errors), including the response body
+        self.status_counts = {} # http status -> count
+        self.exception_counts = {} # exception name -> count
+        self.failed_items = {} # item id -> last error text, for items whose requests failed after all retries
+
+    def record_status(self, status:int):
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def record_exception(self, exception:Exception):
+        exception_name = type(exception).__name__
+        self.exception_counts[exception_name] = self.exception_counts.get(exception_name, 0) + 1
+
+    def record_failure(self, item_id:str, error_text:str):
+        self.failures += 1
+        self.failed_items[item_id] = error_text
+
+    def get_average_request_time(self) -> float:
+        """
+        Returns the average amount of seconds of an answered request, or None if no request was answered.
+        """
+        answered_requests = self.successes + self.definitive_errors
+        if answered_requests == 0:
+            return None
+        return self.request_time / answered_requests
+
+    def has_failed(self, item_ids) -> bool:
+        """
+        Returns True if any of the 'item_ids' (a single id or a list of ids) failed after all retries.
+        """
+        if isinstance(item_ids, str):
+            item_ids = [item_ids]
+        return any(item_id in self.failed_items for item_id in item_ids if item_id != None)
+
+    def clear_failed_items(self):
+        """
+        Clears the failed items. This is called before the failed items are re-queued.
+        """
+        self.failed_items = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "successes": self.successes,
+            "definitive_errors": self.definitive_errors,
+            "failures": self.failures,
+            "short_circuits": self.short_circuits,
+            "request_time": round(self.request_time, 3),
+            "status_counts": dict(self.status_counts),
+            "exception_counts": dict(self.exception_counts),
+            "failed_items": list(self.failed_items.keys())
+        }
+
+    def log_summary(self, stage_name:str = ""):
+        logger.info(f"Request statistics {f'for {stage_name}' if stage_name != '' else ''}: {self.requests} requests, {self.retries} retries, {self.successes} successes, {self.definitive_errors} definitive errors, {self.failures} failures, {self.short_circuits} short-circuited requests.")
+        if self.status_counts != {}:
+            logger.info(f"  - status counts: {self.status_counts}")
+        if self.exception_counts != {}:
+            logger.info(f"  - exception counts: {self.exception_counts}")
+        if self.failed_items != {}:
+            logger.warning(f"  - {len(self.failed_items)} items failed after all retries: {list(self.failed_items.keys())}")
+
+class CircuitBreaker:
+    """
+    A circuit breaker for a single host. After 'failure_threshold' consecutive failed requests (transient errors), the breaker opens
+    and the requests to the host are short-circuited (not sent at all). After 'reset_timeout' seconds, the breaker becomes half-open
+    and lets a single probe request through: if the probe succeeds, the breaker closes, otherwise it opens again for another 'reset_timeout' seconds.
+
+    This prevents the async stages from spending hours timing out on a host that is down; while the breaker is open, the callers
+    fall back to offline sources (see UniProtAPI.is_available, EnsemblAPI.is_available).
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, host:str, failure_threshold:int = 5, reset_timeout:float = 30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+
+    def allow_request(self) -> bool:
+        """
+        Returns True if a request to the host can be sent.
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = True
+                self._probe_started_at = time.monotonic()
+                logger.info(f"Circuit breaker for {self.host} is half-open, sending a probe request.")
+                return True
+            return False
+        # half-open: only a single probe request is allowed. A probe, which didn't report back within reset_timeout seconds, is considered lost,
+        # so that a lost probe can't short-circuit the host for the rest of the process
+        if self._probe_in_flight == False or time.monotonic() - self._probe_started_at >= self.reset_timeout:
+            self._probe_in_flight = True
+            self._probe_started_at = time.monotonic()
+            return True
+        return False
+
+    def release_probe(self):
+        """
+        Releases the probe of a half-open breaker without a result (eg. when the probe request was cancelled), so that the next request can probe the host.
+        """
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit breaker for {self.host} is closed again.")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+            if self.state == self.CLOSED:
+                logger.warning(f"Circuit breaker for {self.host} opened after {self.consecutive_failures} consecutive failures. Requests to {self.host} are short-circuited for {self.reset_timeout} seconds.")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        """
+        Returns True if the breaker is not closed (open or half-open), ie. the host is considered unavailable.
+        """
+        return self.state != self.CLOSED
+
+class AsyncRetryPolicy:
+    """
+    A retry policy for async (aiohttp) requests. It is the async counterpart of the urllib3.Retry strategy, which is mounted on the synchronous
+    requests sessions of GOApi, UniProtAPI and EnsemblAPI.
+
+    Parameters:
+      - (int) max_retries: the maximum amount of retries for a single request (the request is performed at most max_retries + 1 times)
+      - (float) backoff_factor: the base of the exponential backoff; the n-th retry waits backoff_factor * 2**n seconds
+      - (float) max_backoff: the upper limit (in seconds) of a single backoff wait
+      - (float) jitter: the relative random spread of a backoff wait, eg. 0.5 randomizes each wait in the [0.5 * wait, 1.5 * wait] interval.
+                        Jitter prevents many concurrent coroutines from retrying at the same moment.
+      - (list) retry_statuses: the http statuses, which are considered transient and are retried. Other error statuses (eg. 400, 404) are
+                               definitive answers and are not retried.
+      - (int) requeue_rounds: how many times the async stages of ReverseLookup re-queue the items, which failed after all retries, at the end of the stage
+      - (int) failure_threshold, (float) reset_timeout: the settings of the per-host CircuitBreaker(s)
+
+    Usage:
+        retry_policy = AsyncRetryPolicy(max_retries=3)
+        async with aiohttp.ClientSession() as session:
+            response_json = await retry_policy.get_json(session, url, item_id="UniProtKB:Q9NY91")
+            if response_json == None:
+                # the request failed after all retries, the item is recorded in retry_policy.statistics.failed_items
+        retry_policy.statistics.log_summary()
+    """
+    RETRYABLE_EXCEPTIONS = (aiohttp.ClientError, asyncio.TimeoutError, ValueError) # ValueError also covers JSONDecodeError of truncated responses
+
+    def __init__(self, max_retries:int = 3, backoff_factor:float = 0.3, max_backoff:float = 10.0, jitter:float = 0.5, retry_statuses:list = [429, 500, 502, 503, 504], requeue_rounds:int = 1, failure_threshold:int = 5, reset_timeout:float = 30.0):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+        self.requeue_rounds = requeue_rounds
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.circuit_breakers = {} # host -> CircuitBreaker
+        self.statistics = RetryStatistics()
+
+    def reset_statistics(self):
+        """
+        Resets the request statistics. The async stages of ReverseLookup call this function at the start of the stage.
+        """
+        self.statistics = RetryStatistics()
+
+    def get_circuit_breaker(self, host:str) -> CircuitBreaker:
+        if host not in self.circuit_breakers:
+            self.circuit_breakers[host] = CircuitBreaker(host, failure_threshold=self.failure_threshold, reset_timeout=self.reset_timeout)
+        return self.circuit_breakers[host]
+
+    def is_circuit_open(self, host:str) -> bool:
+        """
+        Returns True if the circuit breaker of 'host' is open (or half-open), ie. the host is currently considered unavailable.
+        """
+        return host in self.circuit_breakers and self.circuit_breakers[host].is_open()
+
+    def is_retryable_status(self, status:int) -> bool:
+        return status in self.retry_statuses
+
+    def get_backoff_time(self, retry_number:int, retry_after:str = None) -> float:
+        """
+        Computes the wait time (in seconds) before the retry with the index 'retry_number' (starting at 0). The wait is capped exponential backoff
+        with jitter. If the server sent a Retry-After header (eg. along with a 429 status), the wait is at least as long as Retry-After, but still capped at max_backoff.
+        """
+        backoff_time = min(self.max_backoff, self.backoff_factor * (2 ** retry_number))
+        backoff_time = backoff_time * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if retry_after != None:
+            try:
+                backoff_time = max(backoff_time, float(retry_after))
+            except ValueError:
+                pass # Retry-After can also be a http date, which is ignored
+        return min(backoff_time, self.max_backoff)
+
+    async def get_json(self, session:aiohttp.ClientSession, url:str, params:dict = None, headers:dict = None, timeout = 5, item_id:str = "", record_failure:bool = True):
+        """
+        Performs a GET request to 'url' and returns the json of the response. Transient errors (statuses from self.retry_statuses, connection errors,
+        timeouts and json decode errors) are retried with capped exponential backoff and jitter.
+
+        Parameters:
+          - (aiohttp.ClientSession) session: the session used for the request
+          - (str) url, (dict) params, (dict) headers: the request parameters
+          - (float or aiohttp.ClientTimeout) timeout: the total timeout of the request in seconds, or an aiohttp.ClientTimeout (eg. with sock_read for streamed responses)
+          - (str) item_id: the identifier of the queried item (eg. a product id). If the request fails after all retries, the item_id is recorded in
+                           self.statistics.failed_items, so that the caller can re-queue it. If not supplied, the url is recorded.
+          - (bool) record_failure: if False, a failed request isn't recorded in self.statistics.failed_items. This is used for requests with a fallback (eg. EnsemblAPI.get_info_async),
+                                   which record the failure themselves only if the fallback also fails.
+
+        Returns:
+          - the response json, if the response status is 2xx
+          - the response json of a non-retryable error status, if the response has a json body (eg. Ensembl's {'error': 'No valid lookup found for symbol Oxct2a'}),
+            otherwise None
+          - None, if the request failed after all retries
+        """
+        async def read_json(response:aiohttp.ClientResponse):
+            return await response.json(content_type=None)
+        return await self.request(session, url, read_json, params=params, headers=headers, timeout=timeout, item_id=item_id, record_failure=record_failure)
+
+    async def request(self, session:aiohttp.ClientSession, url:str, consume, params:dict = None, headers:dict = None, timeout = 5, item_id:str = "", record_failure:bool = True):
+        """
+        Performs a GET request to 'url' and returns the result of 'consume', an async function which receives the (2xx) aiohttp.ClientResponse.
+        This allows the caller to process the response body incrementally (eg. to stream a large json). Exceptions raised inside 'consume'
+        (eg. aiohttp.ClientPayloadError when the connection drops mid-body, or ValueError for an invalid body) are retried, so 'consume' must not keep state between calls.
+
+        See get_json for the parameters and the return values.
+        """
+        last_error = ""
+        circuit_breaker = self.get_circuit_breaker(urlsplit(url).netloc)
+        for retry_number in range(self.max_retries + 1):
+            if not circuit_breaker.allow_request():
+                # the host is down, don't wait for the timeouts
+                self.statistics.short_circuits += 1
+                if record_failure == True:
+                    self.statistics.record_failure(item_id if item_id != "" else url, f"Circuit breaker for {circuit_breaker.host} is open")
+                return None
+            is_probe = circuit_breaker.state == CircuitBreaker.HALF_OPEN
+            retry_after = None
+            self.statistics.requests += 1
+            request_start_time = time.monotonic()
+            try:
+                async with session.get(HttpTransport.resolve_url(url), params=params, headers=headers, timeout=timeout) as response:
+                    self.statistics.record_status(response.status)
+                    if 200 <= response.status < 300:
+                        result = await consume(response)
+                        self.statistics.successes += 1
+                        self.statistics.request_time += time.monotonic() - request_start_time
+                        circuit_breaker.record_success()
+                        return result
+                    if not self.is_retryable_status(response.status):
+                        # definitive answer from the server, retrying won't change it
+                        self.statistics.definitive_errors += 1
+                        circuit_breaker.record_success()
+                        try:
+                            return await response.json(content_type=None)
+                        except ValueError:
+                            return None
+                        finally:
+                            self.statistics.request_time += time.monotonic() - request_start_time
+                    last_error = f"HTTP Error: status = {response.status}, reason = {response.reason}"
+                    retry_after = response.headers.get("Retry-After")
+                    if response.status == 429: # rate limiting means the host is up
+                        circuit_breaker.record_success()
+                    else:
+                        circuit_breaker.record_failure()
+            except self.RETRYABLE_EXCEPTIONS as e:
+                last_error = f"{type(e).__name__}: {str(e)}"
+                self.statistics.record_exception(e)
+                circuit_breaker.record_failure()
+            except BaseException:
+                # bugfix: a probe, which ends without a result (asyncio.CancelledError, or a non-retryable exception raised in 'consume'), would otherwise
+                # leave the breaker half-open with a probe in flight, short-circuiting all further requests to the host
+                if is_probe:
+                    circuit_breaker.release_probe()
+                raise
+
+            if retry_number < self.max_retries:
+                self.statistics.retries += 1
+                await asyncio.sleep(self.get_backoff_time(retry_number, retry_after))
+
+        logger.warning(f"Request for {item_id if item_id != '' else url} failed after {self.max_retries + 1} attempts. Last error: {last_error}")
+        if record_failure == True:
+            self.statistics.record_failure(item_id if item_id != "" else url, last_error)
+        return None
@@ -1,5 +1,7 @@
 import json
 import os
+import re
+import codecs
 from types import SimpleNamespace
 import sys
 import traceback
@@ -64,6 +66,108 @@ class JsonUtil():
             logger.info(f"ERROR creating filepath {filepath} at {os.getcwd()}")
 
 
+class JsonStreamArrayParser():
+    """
+    Incrementally parses the elements of a json array, which is stored under 'array_key' in a (large) json document, eg. the 'associations'
+    of a Gene Ontology product query response. The document is fed in chunks (as they arrive from the server) and the completed array
+    elements are returned as soon as they are parsed, so the whole document never has to be held in memory.
+
+    Only the first occurrence of "array_key" is parsed. The elements of the array must be json objects or arrays (not scalars).
+    The text outside of the array (up to MAX_OUTER_TEXT characters) is kept, so that scalar fields (eg. 'numFound') can be read with get_int_field.
+
+    Usage:
+        parser = JsonStreamArrayParser("associations")
+        for chunk in response.iter_content(chunk_size=65536):
+            for association in parser.feed(chunk):
+                # process association
+        parser.close()
+        num_found = parser.get_int_field("numFound")
+    """
+    MAX_OUTER_TEXT = 65536
+
+    def __init__(self, array_key:str):
+        self.array_key_token = f'"{array_key}"'
+        self.element_count = 0 # the amount of parsed array elements
+        self.outer_text = "" # the text outside of the array
+        self._decoder = json.JSONDecoder()
+        self._utf8_decoder = codecs.getincrementaldecoder("utf-8")() # multi-byte characters can be split between chunks
+        self._buffer = ""
+        self._state = "search" # search -> array -> done
+
+    def _add_outer_text(self, text:str):
+        if len(self.outer_text) < self.MAX_OUTER_TEXT:
+            self.outer_text += text[:self.MAX_OUTER_TEXT - len(self.outer_text)]
+
+    def feed(self, chunk) -> list:
+        """
+        Feeds a chunk (bytes or str) of the json document. Returns a list of the array elements, which were completed by this chunk.
+        """
+        if isinstance(chunk, bytes):
+            chunk = self._utf8_decoder.decode(chunk)
+        self._buffer += chunk
+        elements = []
+
+        if self._state == "search":
+            key_index = self._buffer.find(self.array_key_token)
+            if key_index == -1:
+                # keep the end of the buffer, the key could be split between two chunks
+                keep_length = len(self.array_key_token)
+                self._add_outer_text(self._buffer[:-keep_length])
+                self._buffer = self._buffer[-keep_length:]
+                return elements
+            array_start_index = self._buffer.find("[", key_index + len(self.array_key_token))
+            if array_start_index == -1:
+                return elements # wait for the next chunk
+            self._add_outer_text(self._buffer[:key_index])
+            self._buffer = self._buffer[array_start_index+1:]
+            self._state = "array"
+
+        if self._state == "array":
+            position = 0
+            buffer_length = len(self._buffer)
+            while True:
+                while position < buffer_length and self._buffer[position] in " \t\r\n,":
+                    position += 1
+                if position == buffer_length:
+                    break
+                if self._buffer[position] == "]":
+                    self._state = "done"
+                    position += 1
+                    break
+                try:
+                    element, position = self._decoder.raw_decode(self._buffer, position)
+                except json.JSONDecodeError:
+                    break # the element is incomplete, wait for the next chunk
+                elements.append(element)
+                self.element_count += 1
+            self._buffer = self._buffer[position:]
+
+        if self._state == "done":
+            self._add_outer_text(self._buffer)
+            self._buffer = ""
+
+        return elements
+
+    def close(self):
+        """
+        Checks that the whole array was parsed. Raises a ValueError if the document ended before the end of the array (eg. a truncated response).
+        If the document doesn't contain 'array_key' at all, nothing is raised (element_count is 0).
+        """
+        if self._state == "array":
+            raise ValueError(f"The json document ended before the end of the {self.array_key_token} array.")
+        if self._state == "search":
+            self._add_outer_text(self._buffer)
+            self._buffer = ""
+
+    def get_int_field(self, field_name:str):
+        """
+        Returns the value of the integer field 'field_name' from the text outside of the parsed array, or None if the field wasn't found.
+        """
+        match = re.search(rf'"{field_name}"\s*:\s*(-?\d+)', self.outer_text)
+        if match == None:
+            return None
+        return int(match.group(1))
+
 class JsonToClass():
     object_representation = ""
     source_json = ""
@@ -5,11 +5,14 @@ if TYPE_CHECKING:
     from .AnnotationProcessor import GOAnnotiationsFile
 from typing import List
 from .Errors import StatisticsError
+from .StatisticsUtils import StatisticsUtil
 import math
 
 from scipy.stats import binomtest, combine_pvalues, fisher_exact
+import numpy as np
 import statistics
 import logging
+from tqdm import tqdm
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +31,34 @@ class Metrics:
         """
         raise NotImplementedError("Subclasses must implement metric()")
 
+    def metric_all(self, products: List[Product]) -> List:
+        """
+        Scores all 'products' at once and returns the list of their scores (in the order of 'products'). This function is called by (ReverseLookup).score_products.
+
+        The default implementation calls 'metric' for each product. Subclasses can override it to score all products with the sparse
+        product x GO Term incidence matrix of the model (see (ReverseLookup).get_product_goterm_matrix).
+        """
+        return [self.metric(product) for product in tqdm(products, desc=f"Scoring products ({self.name})")]
+
+    def _process_direction_counts(self, products: List[Product]):
+        """
+        Computes the GO Term counts used by the binomial and the Fisher tests for all 'products' at once.
+
+        Returns:
+          - (csr_matrix) incidence_matrix: the product x GO Term incidence matrix (GO Terms are also matched by the products' genenames)
+          - (np.ndarray) goterm_process_matrix: (dense, bool) element [j, k] is True if the model's j-th GO Term is associated with the process of the k-th (process, direction) column and has a process with its direction
+          - (List[Dict[str, int]]) products_process_counts: for each product, a mapping between f"{process}{direction}" and the count of the product's GO Terms associated with the process (and the direction)
+          - (Dict[str, int]) all_process_counts: a mapping between f"{process}{direction}" and the count of all GO Terms of the model associated with the process (and the direction)
+        """
+        columns = [f"{process}{direction}" for process, direction in self.reverse_lookup.get_process_direction_columns()]
+        incidence_matrix = self.reverse_lookup.get_product_goterm_matrix(products, include_genename=True)
+        goterm_process_matrix = self.reverse_lookup.get_process_direction_matrix(strict=False)
+        counts = (incidence_matrix @ goterm_process_matrix).toarray()
+        all_counts = np.asarray(goterm_process_matrix.sum(axis=0)).ravel()
+        products_process_counts = [dict(zip(columns, (int(count) for count in counts[i]))) for i in range(len(products))]
+        all_process_counts = dict(zip(columns, (int(count) for count in all_counts)))
+        return incidence_matrix, goterm_process_matrix.toarray().astype(bool), products_process_counts, all_process_counts
+
 
 class adv_product_score(Metrics):
     """
@@ -248,6 +279,59 @@ class adv_product_score(Metrics):
 
         return score
 
+    def metric_all(self, products: List[Product]) -> List[float]:
+        """
+        A vectorised implementation of 'metric' for all input products at once. The same score is computed with sparse matrix products
+        of the product x GO Term incidence matrix (see (ReverseLookup).get_product_goterm_matrix) and per-GO Term vectors.
+
+        Parameters:
+          - (List[Product]) products: a list of Product instances
+
+        Returns:
+          - (List[float]) scores: the scores of the products (in the order of 'products')
+        """
+        def _opposite_direction(direction: str) -> str:
+            if direction == "0":
+                return "0"
+            elif direction == "+":
+                return "-"
+            elif direction == "-":
+                return "+"
+
+        goterms = self.reverse_lookup.goterms
+        target_processes = self.reverse_lookup.target_processes
+        incidence_matrix = self.reverse_lookup.get_product_goterm_matrix(products)
+        columns = {column: k for k, column in enumerate(self.reverse_lookup.get_process_direction_columns())}
+        counts = (incidence_matrix @ self.reverse_lookup.get_process_direction_matrix(strict=True)).toarray() # products x (process, direction) GO Term counts
+
+        # (a): all target processes are regulated in the same (opposite) direction by some GO Term of the product
+        same_counts = counts[:, [columns[(process['process'], process['direction'])] for process in target_processes]]
+        opposite_counts = counts[:, [columns[(process['process'], _opposite_direction(process['direction']))] for process in target_processes]]
+        all_same = np.all(same_counts > 0, axis=1)
+        any_same = np.any(same_counts > 0, axis=1)
+        all_opposite = np.all(opposite_counts > 0, axis=1)
+        any_opposite = np.any(opposite_counts > 0, axis=1)
+        scores = np.zeros(len(products))
+        scores += self.a * (all_same & ~any_opposite)
+        scores -= self.a * (all_opposite & ~any_same)
+
+        # (b1, b2, c1, c2): the per-GO Term contributions of 'metric', which are summed over the GO Terms of each product
+        same_weights = np.zeros(len(goterms))
+        opposite_weights = np.zeros(len(goterms))
+        general_weights = np.zeros(len(goterms))
+        for j, goterm in enumerate(goterms):
+            for goterm_process in goterm.processes:
+                num_same = sum(1 for process in target_processes if goterm_process['direction'] == process['direction'] and goterm_process['process'] == process['process'])
+                num_opposite = sum(1 for process in target_processes if goterm_process['direction'] == _opposite_direction(process['direction']) and goterm_process['process'] == process['process'])
+                same_weights[j] += self.b1 * (goterm.weight * num_same) ** self.b2
+                opposite_weights[j] += self.b1 * (goterm.weight * num_opposite) ** self.b2
+                if goterm_process['direction'] == '0':
+                    general_weights[j] += goterm.weight
+        scores += incidence_matrix @ same_weights
+        scores -= incidence_matrix @ opposite_weights
+        scores *= self.c1 + self.c2 * (incidence_matrix @ general_weights)
+        return [float(score) for score in scores]
+
 class nterms(Metrics):
     """
     An implementation of the Metrics interface, it scores the products by positive, negative or general regulation of a speciffic process.
@@ -312,6 +396,25 @@ class nterms(Metrics):
         # Return the dictionary containing the count of GOTerms for each process and direction
         return nterms_dict
 
+    def metric_all(self, products: List[Product]) -> List[dict]:
+        """
+        A vectorised implementation of 'metric' for all input products at once. The counts are computed as the product of the product x GO Term
+        incidence matrix and the GO Term x (process, direction) indicator matrix of the model (see (ReverseLookup).get_process_direction_counts).
+
+        Returns:
+          - (List[dict]) nterms_dicts: the nterms_dict (see 'metric') of each product (in the order of 'products')
+        """
+        columns = {column: k for k, column in enumerate(self.reverse_lookup.get_process_direction_columns())}
+        counts = self.reverse_lookup.get_process_direction_counts(products)
+        nterms_dicts = []
+        for i in range(len(products)):
+            nterms_dict = {}
+            for process in self.reverse_lookup.target_processes:
+                for direction in ['+', '-', '0']:
+                    nterms_dict[f"{process['process']}{direction}"] = int(counts[i, columns[(process['process'], direction)]])
+            nterms_dicts.append(nterms_dict)
+        return nterms_dicts
+
 class binomial_test(Metrics):
     def __init__(self, model: ReverseLookup, goaf: GOAnnotiationsFile):
         super().__init__(model) 
@@ -320,50 +423,68 @@ class binomial_test(Metrics):
         self._num_all_goterms = 0
     
     def metric(self, product: Product) -> Dict:
+        return self.metric_all([product])[0]
+
+    def metric_all(self, products: List[Product]) -> List[Dict]:
+        """
+        Computes the binomial test results of all input products. The GO Term counts of the products are computed at once with sparse matrix products (see Metrics._process_direction_counts),
+        then the binomial tests of all products, processes and directions are assembled into arrays and tested at once (see StatisticsUtil.binomtest_all).
+
+        Returns:
+          - (List[Dict]) results: the results_dict of each product (in the order of 'products'), a mapping between f"{process}{direction}" and the test results
+        """
         # get the count of all GO terms from the GOAF
         if self._num_all_goterms == 0:
             self._num_all_goterms = len(self.goaf.get_all_terms())
-        
-        results_dict = {}
-        
-        for process in self.reverse_lookup.target_processes:
-            process_goterms_list = self.reverse_lookup.get_all_goterms_for_process(process["process"]) # get all (positive, negative, neutral) GO terms for this process from the input file
-            num_goterms_product_general = len(self.goaf.get_all_terms_for_product(product.genename)) # get all GO terms associated with this product from the GOAF
-            num_goterms_all_general = self._num_all_goterms
-            for direction in ['+', '-']:
-                # num goterms associated with input Product p AND the current process (including process direction)
-                num_goterms_product_process = sum(1 for goterm in process_goterms_list if (any(i['direction'] == direction for i in goterm.processes) and (any(product_id in goterm.products for product_id in product.id_synonyms) or product.genename in goterm.products)))
-                # num goterms associated with this process (incl. direction)
-                num_goterms_all_process = sum(1 for goterm in process_goterms_list if any(i['direction'] == direction for i in goterm.processes))
-                
-                #time for Binomial test and "risk ratio"
-                #binom = binomtest(num_goterms_product_process, num_goterms_all_process, 
-                #                  (num_goterms_product_general/num_goterms_all_general), alternative='greater')
-                
-                binom = binomtest(num_goterms_product_process, num_goterms_all_process, 
-                                  (num_goterms_product_general/num_goterms_all_general if num_goterms_all_general != 0 else 0), alternative='greater') # bugfix: ZeroDivisionError
-                binom_pvalue = binom.pvalue
-                
-                if num_goterms_product_general != 0 and num_goterms_all_general != 0: # bugfix: ZeroDivisionError
-                    risk_ratio = (num_goterms_product_process/num_goterms_all_process if num_goterms_all_process != 0 else 0) / (num_goterms_product_general/num_goterms_all_general)
-                else:
-                    risk_ratio = 0
+        num_goterms_all_general = self._num_all_goterms
+
+        _, _, products_process_counts, all_process_counts = self._process_direction_counts(products)
+
+        # assemble the binomial tests of all products, processes and directions
+        cells = [] # (product position, process, direction, num_goterms_product_process, num_goterms_all_process, num_goterms_product_general)
+        for i, product in enumerate(tqdm(products, desc=f"Scoring products ({self.name})")):
+            num_goterms_product_general = len(self.goaf.get_all_terms_for_product(product.genename)) # get all GO terms associated with this product from the GOAF (once per product, not once per process)
+            for process in self.reverse_lookup.target_processes:
+                for direction in ['+', '-']:
+                    # num goterms associated with input Product p AND the current process (including process direction)
+                    num_goterms_product_process = products_process_counts[i][f"{process['process']}{direction}"]
+                    # num goterms associated with this process (incl. direction)
+                    num_goterms_all_process = all_process_counts[f"{process['process']}{direction}"]
+                    cells.append((i, process['process'], direction, num_goterms_product_process, num_goterms_all_process, num_goterms_product_general))
+
+        #time for Binomial test and "risk ratio"
+        #binom = binomtest(num_goterms_product_process, num_goterms_all_process, 
+        #                  (num_goterms_product_general/num_goterms_all_general), alternative='greater')
+        # computed for all cells at once from the binomial survival function; memoised, as many products share the same test (see StatisticsCache)
+        binom_pvalues = StatisticsUtil.binomtest_all(
+            [cell[3] for cell in cells],
+            [cell[4] for cell in cells],
+            [(cell[5]/num_goterms_all_general if num_goterms_all_general != 0 else 0) for cell in cells], # bugfix: ZeroDivisionError
+            alternative='greater'
+        )
 
-                fold_enrichment_score = 0
-                if num_goterms_all_process != 0 and num_goterms_product_general != 0 and num_goterms_all_general != 0:
-                    fold_enrichment_score = num_goterms_product_process / (num_goterms_all_process * (num_goterms_product_general / num_goterms_all_general))
-                    
-                results_dict[f"{process['process']}{direction}"] = {
-                    #"n_prod_process" : num_goterms_product_process,
-                    #"n_all_process" : num_goterms_all_process,
-                    #"n_prod_general" : num_goterms_product_general,
-                    #"n_all_general" : num_goterms_all_general,
-                    "num" : num_goterms_product_process,
-                    "expected" : num_goterms_all_process * (num_goterms_product_general / num_goterms_all_general if num_goterms_all_general != 0 else 0),
-                    "fold_enrichment" : fold_enrichment_score, # bugfix: ZeroDivisionError
-                    "pvalue" : binom_pvalue,
-                    "risk_ratio" : risk_ratio,
-                }
+        results = [{} for _ in products]
+        for cell_position, (i, process, direction, num_goterms_product_process, num_goterms_all_process, num_goterms_product_general) in enumerate(cells):
+            if num_goterms_product_general != 0 and num_goterms_all_general != 0: # bugfix: ZeroDivisionError
+                risk_ratio = (num_goterms_product_process/num_goterms_all_process if num_goterms_all_process != 0 else 0) / (num_goterms_product_general/num_goterms_all_general)
+            else:
+                risk_ratio = 0
+
+            fold_enrichment_score = 0
+            if num_goterms_all_process != 0 and num_goterms_product_general != 0 and num_goterms_all_general != 0:
+                fold_enrichment_score = num_goterms_product_process / (num_goterms_all_process * (num_goterms_product_general / num_goterms_all_general))
+                
+            results[i][f"{process}{direction}"] = {
+                #"n_prod_process" : num_goterms_product_process,
+                #"n_all_process" : num_goterms_all_process,
+                #"n_prod_general" : num_goterms_product_general,
+                #"n_all_general" : num_goterms_all_general,
+                "num" : num_goterms_product_process,
+                "expected" : num_goterms_all_process * (num_goterms_product_general / num_goterms_all_general if num_goterms_all_general != 0 else 0),
+                "fold_enrichment" : fold_enrichment_score, # bugfix: ZeroDivisionError
+                "pvalue" : float(binom_pvalues[cell_position]),
+                "risk_ratio" : risk_ratio,
+            }
         
         #all_target_pvalues = [results_dict[f"{process['process']}{process['direction']}"]['pvalue'] for process in self.reverse_lookup.target_processes]
         #combined_p = combine_pvalues(all_target_pvalues)
@@ -371,7 +492,7 @@ class binomial_test(Metrics):
         #combined_rr = statistics.mean([results_dict[f"{process['process']}{process['direction']}"]['risk_ratio'] for process in self.reverse_lookup.target_processes])
         #results_dict["comb_risk_ratio"] = combined_rr
         
-        return results_dict
+        return results
             
 class fisher_exact_test(Metrics):
     """
@@ -456,10 +577,11 @@ class fisher_exact_test(Metrics):
     meta-p vrednost, ki bi bla recmo povprecje al pa neki tazga (to morm se preucit), in nato 
     bi za razvrstitev kandidatnih genov zracunala se -log(p-value) in risk ratio.
     """
-    def __init__(self, model: ReverseLookup, goaf: GOAnnotiationsFile):
+    def __init__(self, model: ReverseLookup, goaf: GOAnnotiationsFile, calculate_required_n_prod_process: bool = True):
         super().__init__(model) 
         self.goaf = goaf
         self.name = "fisher_test"
+        self.calculate_required_n_prod_process = calculate_required_n_prod_process # calculates num_goterms_product_process which would be sufficient for the product's statistical importance (p < 0.05); if False, 'required_n_prod_process_for_statistical_relevance' is -1
         self._num_all_goterms = 0
         if self.reverse_lookup.model_settings.fisher_test_use_online_query == True:
             self.online_query_api = self.reverse_lookup.go_api
@@ -471,142 +593,108 @@ class fisher_exact_test(Metrics):
             self.goaf = GOAnnotiationsFile(go_categories=self.reverse_lookup.go_categories)
     
     def metric(self, product: Product) -> Dict:
-        D_DEBUG_CALCULATE_DESIRED_N_PROD_PROCESS = True # TODO: delete this # calculates num_goterms_product_process which would be sufficient for the product's statistical importance (p < 0.05)
+        return self.metric_all([product])[0]
 
+    def metric_all(self, products: List[Product]) -> List[Dict]:
+        """
+        Computes the Fisher exact test results of all input products. The GO Term counts of the products are computed at once with sparse matrix products (see Metrics._process_direction_counts),
+        then the contingency tables of all products, processes and directions are assembled into arrays and tested at once (see StatisticsUtil.fisher_exact).
+
+        Returns:
+          - (List[Dict]) results: the results_dict of each product (in the order of 'products'), a mapping between f"{process}{direction}" and the test results
+        """
         if self._num_all_goterms == 0:
             self._num_all_goterms = len(self.goaf.get_all_terms())
-
-        results_dict = {}
+        num_goterms_all_general = self._num_all_goterms # number of all GO Terms from the GO Annotations File (currently 18880)
+
+        incidence_matrix, goterm_process_matrix, products_process_counts, all_process_counts = self._process_direction_counts(products)
+        columns = {f"{process}{direction}": k for k, (process, direction) in enumerate(self.reverse_lookup.get_process_direction_columns())}
+
+        # assemble the contingency tables of all products, processes and directions
+        cells = [] # (product position, process, direction, num_goterms_product_process, num_goterms_all_process, num_goterms_product_general)
+        for i, product in enumerate(tqdm(products, desc=f"Scoring products ({self.name})")):
+            num_goterms_product_general = self._get_num_goterms_product_general(product)
+            if num_goterms_product_general == None:
+                # skip product, there was an error with querying goterms associated with a product
+                continue
+            for process in self.reverse_lookup.target_processes: # example self.reverse_lookup.target_processes: [0]: {'process': 'chronic_inflammation', 'direction': '+'}, [1]: {{'process': 'cancer', 'direction': '+'}}
+                for direction in ['+', '-']:
+                    # num_goterms_product_process = sum(1 for goterm in process_goterms_list if (any(goterm_process['direction'] == direction for goterm_process in goterm.processes) and (any(product_id in goterm.products for product_id in product.id_synonyms) or product.genename in goterm.products)))
+                    # the above line is computed for all products at once, as the product of the incidence matrix and the (process, direction) indicator matrix
+                    num_goterms_product_process = products_process_counts[i][f"{process['process']}{direction}"] # all GO Terms which are associated with the current 'process' and the current 'direction' of regulation and are also associated with the current gene (product)
+                    num_goterms_all_process = all_process_counts[f"{process['process']}{direction}"] # all of the GO Terms from input.txt file associated with the current process (and the process' regulation direction)
+                    cells.append((i, process['process'], direction, num_goterms_product_process, num_goterms_all_process, num_goterms_product_general))
         
-        for process in self.reverse_lookup.target_processes: # example self.reverse_lookup.target_processes: [0]: {'process': 'chronic_inflammation', 'direction': '+'}, [1]: {{'process': 'cancer', 'direction': '+'}}
-            process_goterms_list = self.reverse_lookup.get_all_goterms_for_process(process["process"]) # all GO Term ids associated with a specific process (eg. angio, diabetes, obesity) for the current MODEL
-            num_goterms_all_general = self._num_all_goterms # number of all GO Terms from the GO Annotations File (currently 18880)
-
-            # num_goterms_product_general ... # all GO Terms associated with the current input Product instance (genename) from the GO Annotation File
-            #   - can be queried either via online or offline pathway (determined by model_settings.fisher_test_use_online_query)
-            #   - can have all parent terms (indirectly associated terms) added to the count (besides only directly associated GO terms) - determined by model_settings.include_all_goterm_parents
-            if self.reverse_lookup.model_settings.fisher_test_use_online_query == True: # online pathway: get goterms associated with this product via a web query
-                goterms_product_general = self.online_query_api.get_goterms(product.uniprot_id, go_categories=self.reverse_lookup.go_categories)
-                if goterms_product_general != None:
-                    num_goterms_product_general = len(goterms_product_general)
-                else:
-                    # skip iteration, there was an error with querying goterms associated with a product
-                    continue
-                # num_goterms_product_general = len(self.online_query_api.get_goterms(product.uniprot_id, go_categories=self.reverse_lookup.go_categories))
-                logger.debug(f"Fisher test online num_goterms_product_general query: {num_goterms_product_general}")
-            else: # offline pathway: get goterms from GOAF      
-                goterms_product_general = self.goaf.get_all_terms_for_product(product.genename)
-                num_goterms_product_general = len(goterms_product_general) # all GO Terms associated with the current input Product instance (genename) from the GO Annotation File
-            
-            # determine number of parents:
-            if self.reverse_lookup.model_settings.include_all_goterm_parents == True:
-                # include all parent goterms in the scoring
-                directly_associated_goterms = list(goterms_product_general) # to create two different entities !
-                for directly_associated_goterm in directly_associated_goterms: # WARNING: don't iterate over goterms_product_general, since this list is being updated in the for loop !!
-                    parent_goterms = self.reverse_lookup.obo_parser.get_parent_terms(directly_associated_goterm) # indirectly associated goterms
-                    goterms_product_general+=parent_goterms # expand goterms_product_general by the parent goterms
-                num_goterms_product_general = len(goterms_product_general) # calculate new num_goterms_product_general
-
-            for direction in ['+', '-']:
-                # num_goterms_product_process = sum(1 for goterm in process_goterms_list if (any(goterm_process['direction'] == direction for goterm_process in goterm.processes) and (any(product_id in goterm.products for product_id in product.id_synonyms) or product.genename in goterm.products)))
-                # the above line is a single-line implementation of the below nested for loops
-                num_goterms_product_process = 0 # all GO Terms which are associated with the current 'process' and the current 'direction' of regulation and are also associated with the current gene (product)
-                goterms_product_process = []
-                for goterm in process_goterms_list: # iterate through each GO Term associated with the current pathophysiological process
-                    for goterm_process in goterm.processes: # goterm.processes holds which pathophysiological processes (eg. {'process': "cancer", 'direction': "-"}) the GO Term is associated with (this is determined by the user in the input.txt file)
-                        if goterm_process['direction'] == direction:
-                            if product.genename in goterm.products: # attemp genename search first
-                                num_goterms_product_process += 1
-                                goterms_product_process.append(f"{goterm.id}: {goterm.name}")
-                                break
-                            for product_id in product.id_synonyms: # if genename is not found, also look into product.id_synonyms
-                                if product_id in goterm.products:
-                                    num_goterms_product_process += 1
-                                    goterms_product_process.append(f"{goterm.id}: {goterm.name}")
-                                    break
-                        
-                num_goterms_all_process = sum(1 for goterm in process_goterms_list if any(goterm_process['direction'] == direction for goterm_process in goterm.processes)) # all of the GO Terms from input.txt file associated with the current process (and the process' regulation direction)
-                
-                #time for Binomial test and "risk ratio"
-                cont_table = [[num_goterms_product_process, num_goterms_all_process-num_goterms_product_process],
-                              [num_goterms_product_general-num_goterms_product_process, num_goterms_all_general-(num_goterms_all_process-num_goterms_product_process)]]
-                
-                # check that any contingency table element is non-negative
-                should_continue_current_loop = False
-                for x in cont_table:
-                    for y in x:
-                        if y < 0:
-                            stat_error = StatisticsError(f"Element of contingency table in class fisher_exact_test is negative. All elements must be non-negative. Contingency table: {cont_table}. This might be because a gene_name, which belongs to a certain GO Term (obtained via web-download), isn't found in the GO Annotations File.", error_code_specific=1)
-                            results_dict[f"{process['process']}{direction}"] = {
-                            #"n_prod_process" : num_goterms_product_process,
-                            #"n_all_process" : num_goterms_all_process,
-                            #"n_prod_general" : num_goterms_product_general,
-                            #"n_all_general" : num_goterms_all_general,
-                            "error": f"{stat_error.error_name}: {stat_error.error_text}",
-                            "num_terms_product_process" : num_goterms_product_process,
-                            "num_terms_all_process": num_goterms_all_process,
-                            "num_terms_product_process": num_goterms_product_process,
-                            "num_terms_product_general": num_goterms_product_general,
-                            "fold_enrichment" : None,
-                            "pvalue" : None,
-                            "odds_ratio" : None,                      
-                            }
-                            should_continue_current_loop = True
-                if should_continue_current_loop: # TODO: check the logic of should_continue_current_loop
-                    continue
-
-                fisher = fisher_exact(cont_table)
-                fisher_pvalue = fisher.pvalue
-                odds_ratio = fisher.statistic
-
-                # calculate what amount of num_goterms_product_process would make this product statistically significant
-                required_n_prod_process_for_stat_relevance = -1
-                if D_DEBUG_CALCULATE_DESIRED_N_PROD_PROCESS and fisher_pvalue > 0.05:
-                    previous_pvalue = fisher_pvalue
-                    new_num_goterms_product_process = num_goterms_product_process
-                    success = True # if a pvalue less than 0.05 was found
-                    while previous_pvalue > 0.05:
-                        new_num_goterms_product_process += 1
-                        new_cont_table = [[new_num_goterms_product_process, num_goterms_all_process-new_num_goterms_product_process],
-                              [num_goterms_product_general-new_num_goterms_product_process, num_goterms_all_general-(num_goterms_all_process-new_num_goterms_product_process)]]
-                        all_non_negative = all(value >= 0 for row in new_cont_table for value in row)
-                        if all_non_negative == False:
-                            # logger.warning("Values in cont. table are negative.")
-                            success = False
-                            break
-                        new_fisher = fisher_exact(new_cont_table)
-                        new_pvalue = new_fisher.pvalue
-                        if new_pvalue > previous_pvalue:
-                            logger.warning(f"Newly calculated pvalue is greater! prev_pvalue = {previous_pvalue}, new_pvalue = {new_pvalue}")
-                            success = False
-                            break
-                        else:
-                            previous_pvalue = new_pvalue
-                    if success:
-                        required_n_prod_process_for_stat_relevance = new_num_goterms_product_process
-
-                # TODO: NaN is necessary for further calculations! Do a json postproccess. START FROM HERE.
-                # if math.isnan(odds_ratio) or math.isnan(fisher_pvalue):
-                #    fisher_pvalue = None
-                #    odds_ratio = None
-
-                fold_enrichment_score = 0
-                if num_goterms_all_process != 0 and num_goterms_product_general != 0 and num_goterms_all_general != 0:
-                    fold_enrichment_score = num_goterms_product_process / (num_goterms_all_process * (num_goterms_product_general / num_goterms_all_general))
-
-                results_dict[f"{process['process']}{direction}"] = {
-                    "n_prod_process" : num_goterms_product_process,
-                    "n_all_process" : num_goterms_all_process,
-                    "n_prod_general" : num_goterms_product_general,
-                    "n_all_general" : num_goterms_all_general,
-                    "num" : num_goterms_product_process,
-                    "required_n_prod_process_for_statistical_relevance": required_n_prod_process_for_stat_relevance,
-                    "expected" : num_goterms_all_process * (num_goterms_product_general / num_goterms_all_general if num_goterms_all_general != 0 else 0),
-                    "fold_enrichment" : fold_enrichment_score, # BUGFIX: ZeroDivisionError
-                    "pvalue" : fisher_pvalue,
-                    "odds_ratio" : odds_ratio,
-                    "goterms_prod_process": goterms_product_process
+        #time for Binomial test and "risk ratio"
+        # cont_table = [[num_goterms_product_process, num_goterms_all_process-num_goterms_product_process],
+        #               [num_goterms_product_general-num_goterms_product_process, num_goterms_all_general-(num_goterms_all_process-num_goterms_product_process)]]
+        table_a = np.array([cell[3] for cell in cells], dtype=np.int64)
+        table_b = np.array([cell[4] - cell[3] for cell in cells], dtype=np.int64)
+        table_c = np.array([cell[5] - cell[3] for cell in cells], dtype=np.int64)
+        table_d = np.array([num_goterms_all_general - (cell[4] - cell[3]) for cell in cells], dtype=np.int64)
+        # check that all contingency table elements are non-negative
+        valid = (table_a >= 0) & (table_b >= 0) & (table_c >= 0) & (table_d >= 0)
+        odds_ratios = np.full(len(cells), np.nan)
+        pvalues = np.full(len(cells), np.nan)
+        if np.any(valid):
+            odds_ratios[valid], pvalues[valid] = StatisticsUtil.fisher_exact(table_a[valid], table_b[valid], table_c[valid], table_d[valid])
+        
+        # calculate what amount of num_goterms_product_process would make each product statistically significant (for all contingency tables at once)
+        required_n_prod_process = np.full(len(cells), -1, dtype=np.int64)
+        if self.calculate_required_n_prod_process == True and np.any(valid):
+            required_n_prod_process[valid] = StatisticsUtil.fisher_required_a(table_a[valid], table_b[valid], table_c[valid], table_d[valid], pvalues[valid], significance=0.05)
+
+        results = [{} for _ in products]
+        for cell_position, (i, process, direction, num_goterms_product_process, num_goterms_all_process, num_goterms_product_general) in enumerate(cells):
+            cont_table = [[int(table_a[cell_position]), int(table_b[cell_position])], [int(table_c[cell_position]), int(table_d[cell_position])]]
+            if valid[cell_position] == False:
+                stat_error = StatisticsError(f"Element of contingency table in class fisher_exact_test is negative. All elements must be non-negative. Contingency table: {cont_table}. This might be because a gene_name, which belongs to a certain GO Term (obtained via web-download), isn't found in the GO Annotations File.", error_code_specific=1)
+                results[i][f"{process}{direction}"] = {
+                    #"n_prod_process" : num_goterms_product_process,
+                    #"n_all_process" : num_goterms_all_process,
+                    #"n_prod_general" : num_goterms_product_general,
+                    #"n_all_general" : num_goterms_all_general,
+                    "error": f"{stat_error.error_name}: {stat_error.error_text}",
+                    "num_terms_product_process" : num_goterms_product_process,
+                    "num_terms_all_process": num_goterms_all_process,
+                    "num_terms_product_general": num_goterms_product_general,
+                    "fold_enrichment" : None,
+                    "pvalue" : None,
+                    "odds_ratio" : None,                      
                 }
+                continue
+
+            fisher_pvalue = float(pvalues[cell_position])
+            odds_ratio = float(odds_ratios[cell_position])
+
+            required_n_prod_process_for_stat_relevance = int(required_n_prod_process[cell_position]) if fisher_pvalue > 0.05 else -1
+
+            # TODO: NaN is necessary for further calculations! Do a json postproccess. START FROM HERE.
+            # if math.isnan(odds_ratio) or math.isnan(fisher_pvalue):
+            #    fisher_pvalue = None
+            #    odds_ratio = None
+
+            fold_enrichment_score = 0
+            if num_goterms_all_process != 0 and num_goterms_product_general != 0 and num_goterms_all_general != 0:
+                fold_enrichment_score = num_goterms_product_process / (num_goterms_all_process * (num_goterms_product_general / num_goterms_all_general))
+
+            # the GO Terms of the product, which are associated with the process and the direction
+            goterm_positions = incidence_matrix.indices[incidence_matrix.indptr[i]:incidence_matrix.indptr[i+1]] # positions of the product's GO Terms in the model's goterms
+            goterms_product_process = [f"{self.reverse_lookup.goterms[j].id}: {self.reverse_lookup.goterms[j].name}" for j in sorted(goterm_positions) if goterm_process_matrix[j, columns[f"{process}{direction}"]]]
+
+            results[i][f"{process}{direction}"] = {
+                "n_prod_process" : num_goterms_product_process,
+                "n_all_process" : num_goterms_all_process,
+                "n_prod_general" : num_goterms_product_general,
+                "n_all_general" : num_goterms_all_general,
+                "num" : num_goterms_product_process,
+                "required_n_prod_process_for_statistical_relevance": required_n_prod_process_for_stat_relevance,
+                "expected" : num_goterms_all_process * (num_goterms_product_general / num_goterms_all_general if num_goterms_all_general != 0 else 0),
+                "fold_enrichment" : fold_enrichment_score, # BUGFIX: ZeroDivisionError
+                "pvalue" : fisher_pvalue,
+                "odds_ratio" : odds_ratio,
+                "goterms_prod_process": goterms_product_process
+            }
         
         #all_target_pvalues = [results_dict[f"{process['process']}{process['direction']}"]['pvalue'] for process in self.reverse_lookup.target_processes]
         #combined_p = combine_pvalues(all_target_pvalues)
@@ -614,7 +702,32 @@ class fisher_exact_test(Metrics):
         #combined_rr = statistics.mean([results_dict[f"{process['process']}{process['direction']}"]['odds_ratio'] for process in self.reverse_lookup.target_processes])
         #results_dict["comb_odds_ratio"] = combined_rr
         
-        return results_dict
+        return results
+
+    def _get_num_goterms_product_general(self, product: Product) -> int:
+        """
+        Returns num_goterms_product_general - the number of all GO Terms associated with the product (genename) from the GO Annotations File, or None
+        if the GO Terms couldn't be queried.
+          - can be queried either via online or offline pathway (determined by model_settings.fisher_test_use_online_query)
+          - can have all parent terms (indirectly associated terms) added to the count (besides only directly associated GO terms) - determined by model_settings.include_all_goterm_parents
+        """
+        if self.reverse_lookup.model_settings.fisher_test_use_online_query == True: # online pathway: get goterms associated with this product via a web query
+            goterms_product_general = self.online_query_api.get_goterms(product.uniprot_id, go_categories=self.reverse_lookup.go_categories)
+            if goterms_product_general == None:
+                return None
+            logger.debug(f"Fisher test online num_goterms_product_general query: {len(goterms_product_general)}")
+        else: # offline pathway: get goterms from GOAF
+            goterms_product_general = self.goaf.get_all_terms_for_product(product.genename)
+        
+        # determine number of parents:
+        if self.reverse_lookup.model_settings.include_all_goterm_parents == True:
+            # include all parent goterms in the scoring
+            directly_associated_goterms = goterms_product_general
+            goterms_product_general = list(directly_associated_goterms) # bugfix: don't extend the list returned by the GOAF, which is the GOAF's own (cached) list of the product's terms
+            for directly_associated_goterm in directly_associated_goterms:
+                parent_goterms = self.reverse_lookup.obo_parser.get_parent_terms(directly_associated_goterm) # indirectly associated goterms
+                goterms_product_general += parent_goterms # expand goterms_product_general by the parent goterms
+        return len(goterms_product_general)
 
 class inhibited_products_id(Metrics):
     """
@@ -671,7 +784,7 @@ class basic_mirna_score(Metrics):
         """
         score = 0.0
         for product_id, overlap in mirna.mRNA_overlaps.items():
-            product = next((x for x in self.reverse_lookup.products if x.uniprot_id == product_id), None) #  this line of code is looking through a sequence of products and finding the first product whose uniprot_id matches the value of product_id. If such a product is found, it is assigned to the variable product; otherwise, product is set to None
+            product = self.reverse_lookup.get_product_by("uniprot_id", product_id) # the first product whose uniprot_id matches product_id (hash index lookup), or None if there is no such product
             if product is not None: # each miRNA can have many products in it's 'mRNA_overlaps' field, this is a check that we are only analysing the products, which are also present in (ReverseLookup).products
                 if overlap >= self.treshold: # inhibited
                     a = -1 # deduct the score, since high score indicates the products is favourable for our target processes
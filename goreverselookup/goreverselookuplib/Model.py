@@ -19,9 +19,13 @@ import aiohttp
 from .JsonUtil import JsonToClass, SimpleNamespaceUtil
 from types import SimpleNamespace
 from .GOTerm import GOTerm # to avoid circular imports, as AnnotationProcessor now uses GOTerm.
-from .CacheUtils import ConnectionCacher
+from .CacheUtils import ConnectionCacher, Cacher
 from contextlib import asynccontextmanager
 from .OboParser import OboParser
+from .HttpUtils import AsyncRetryPolicy
+from .AsyncRuntime import AsyncRuntime
+import numpy as np
+from scipy.sparse import csr_matrix
 
 logger = logging.getLogger(__name__)
 
@@ -237,7 +241,10 @@ class Product:
                     info_dict = await uniprot_api.get_uniprot_info_async(self.uniprot_id, session)
                 else:
                     info_dict = {"genename": goaf.get_uniprotkb_genename(self.uniprot_id)}
-            if info_dict != None:
+            if info_dict == None and not uniprot_api.is_available():
+                # UniProt is down (circuit breaker is open), fall back to the gene name from the GO Annotations File
+                info_dict = {"genename": goaf.get_uniprotkb_genename(self.uniprot_id if self.uniprot_id else self.id_synonyms[0])}
+            if info_dict != None and info_dict != {}: # {}: UniProt has no entry for this id, keep the current genename
                 self.genename = info_dict.get("genename")
         elif len(self.id_synonyms) == 1:
             human_ortholog_gene_id = await human_ortholog_finder.find_human_ortholog_async(self.id_synonyms[0])
@@ -337,10 +344,12 @@ class Product:
         
         #TODO: logger output which values are still missing
 
-    async def fetch_info_async(self, client_session: aiohttp.ClientSession, uniprot_api: Optional[UniProtAPI] = None, ensembl_api: Optional[EnsemblAPI] = None, required_keys = ["genename", "description", "ensg_id", "enst_id", "refseq_nt_id"]) -> None:
+    async def fetch_info_async(self, client_session: aiohttp.ClientSession, uniprot_api: Optional[UniProtAPI] = None, ensembl_api: Optional[EnsemblAPI] = None, required_keys = ["genename", "description", "ensg_id", "enst_id", "refseq_nt_id"], goaf: Optional[GOAnnotiationsFile] = None) -> None:
         """
         required_keys correspond to the Product's attributes (class variables) that are checked. If any are None, then API requests
         are made so as to populate these variables with correct data.
+
+        If 'goaf' is supplied and UniProt is down (see UniProtAPI.is_available), the genename is taken from the GO Annotations File.
         """
         self.had_fetch_info_computed = True
         if not (self.uniprot_id or self.genename or self.ensg_id):
@@ -353,6 +362,9 @@ class Product:
 
         if (any(getattr(self, key) is None for key in required_keys) or any(getattr(self, key) == "" for key in required_keys)) and self.uniprot_id:
             info_dict = await uniprot_api.get_uniprot_info_async(self.uniprot_id, session=client_session)
+            if info_dict == None and goaf != None and not uniprot_api.is_available() and (self.genename == None or self.genename == "") and "UniProtKB" in self.uniprot_id:
+                # UniProt is down (circuit breaker is open), fall back to the gene name from the GO Annotations File
+                info_dict = {"genename": goaf.get_uniprotkb_genename(self.uniprot_id)}
             if info_dict != None:
                 for key, value in info_dict.items():
                     if value is not None and value != "" and value != []:
@@ -384,9 +396,9 @@ class Product:
                         if current_attr_value == None or current_attr_value == "" or current_attr_value == []:
                             setattr(self, key, value)
     
-    async def fetch_info_async_semaphore(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, uniprot_api: Optional[UniProtAPI] = None, ensembl_api: Optional[EnsemblAPI] = None, required_keys = ["genename", "description", "ensg_id", "enst_id", "refseq_nt_id"]):
+    async def fetch_info_async_semaphore(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, uniprot_api: Optional[UniProtAPI] = None, ensembl_api: Optional[EnsemblAPI] = None, required_keys = ["genename", "description", "ensg_id", "enst_id", "refseq_nt_id"], goaf: Optional[GOAnnotiationsFile] = None):
         async with semaphore:
-            await self.fetch_info_async(session, uniprot_api, ensembl_api, required_keys)
+            await self.fetch_info_async(session, uniprot_api, ensembl_api, required_keys, goaf=goaf)
         
     
     def fetch_mRNA_sequence(self, ensembl_api: EnsemblAPI) -> None:
@@ -472,6 +484,9 @@ class TargetProcess:
 from .miRNAprediction import miRDB60predictor
 
 class ReverseLookup:
+    # identifier fields of Product, over which the product hash indexes are maintained (see get_product_by)
+    PRODUCT_INDEX_FIELDS = ["id_synonyms", "genename", "uniprot_id", "ensg_id", "enst_id", "refseq_nt_id"]
+
     def __init__(self, goterms: List[GOTerm], target_processes: List[Dict[str, str]], products: List[Product] = [], miRNAs: List[miRNA] = [], miRNA_overlap_treshold: float = 0.6, execution_times: dict = {}, statistically_relevant_products = {}, go_categories:List[str] = ["biological_process", "molecular_activity", "cellular_component"], model_settings:ModelSettings = None, obo_parser:OboParser = None):
         """
         A class representing a reverse lookup for gene products and their associated Gene Ontology terms.
@@ -493,6 +508,19 @@ class ReverseLookup:
         self.goterms = goterms
         self.products = products
         self.target_processes = target_processes
+
+        # hash indexes over self.products by identifier field (see PRODUCT_INDEX_FIELDS), built lazily by _get_product_index
+        self._product_index = None
+        self._product_index_size = 0
+        self._product_positions = {} # id(product) -> the position of the product in self.products, to return the first matching product in get_product
+
+        # inverted index: product id (as stored in GOTerm.products) -> set of positions of the GO Terms in self.goterms, built lazily by _get_product_goterm_index
+        self._product_goterm_index = None
+        self._product_goterm_index_source = None
+        self._product_goterm_index_size = 0
+
+        # sparse product x GO Term incidence matrices of self.products and GO Term x (process, direction) indicator matrices, built lazily (see get_product_goterm_matrix, get_process_direction_matrix)
+        self._incidence_matrices = {}
         self.miRNAs = miRNAs
         self.miRNA_overlap_treshold = miRNA_overlap_treshold
 
@@ -510,6 +538,14 @@ class ReverseLookup:
         self.go_api = GOApi() # this enables us to use go_api inside Metrics.py, as importing GOApi inside Metrics.py creates circular imports.
         self.obo_parser = obo_parser if obo_parser != None else OboParser(obo_filepath="src_data_files/go.obo")
 
+        # retry policy, shared by all async requests of the model. Items which fail after all retries are re-queued at the end of each async stage.
+        self.retry_policy = AsyncRetryPolicy()
+        self.request_statistics = {} # stage name -> request statistics of the async stage (see RetryStatistics.to_dict)
+        self.cache_statistics = {} # the cache statistics of the stages (see CacheStatistics.to_dict)
+
+        # the event loop, the pooled client session and the api instances, shared by all async stages of the model
+        self.async_runtime = AsyncRuntime(retry_policy=self.retry_policy)
+
     def set_model_settings(self, model_settings: ModelSettings):
         """
         Sets self.model_settings to the model settings supplied in the parameter.
@@ -528,38 +564,58 @@ class ReverseLookup:
 
     def fetch_all_go_term_names_descriptions(self, run_async = True, req_delay=0.1):
         """
-        Iterates over all GOTerm objects in the go_term set and calls the fetch_name_description method for each object.
+        Sets the names and descriptions of all GOTerm objects in the go_term set, which don't have them yet. The names and descriptions are resolved in bulk:
+          1. from the local OBO file (self.obo_parser.all_goterms), which contains the name and the description of every (non-deprecated) GO Term
+          2. from the Cacher ("go" data location), for the GO Terms which aren't in the OBO file (eg. when using an older OBO snapshot)
+          3. from the network (http://api.geneontology.org/api/ontology/term/{term_id}), only for the remaining GO Terms, using the fetch_name_description method
         """
         self.timer.set_start_time()
+        Cacher.set_stage("fetch_all_go_term_names_descriptions")
         api = GOApi()
 
-        if run_async == True:
-            asyncio.run(self._fetch_all_go_term_names_descriptions_async(api, req_delay=req_delay))
+        goterms_to_fetch = [goterm for goterm in self.goterms if goterm.name == None or goterm.description == None] # if goterm.name or description don't exist, then attempt fetch
+        goterms_from_obo = 0
+        for goterm in goterms_to_fetch:
+            if goterm.id in self.obo_parser.all_goterms:
+                obo_goterm = self.obo_parser.all_goterms[goterm.id]
+                goterm.name = obo_goterm.name if goterm.name == None else goterm.name
+                goterm.description = obo_goterm.description if goterm.description == None else goterm.description
+                goterms_from_obo += 1
+        goterms_to_fetch = [goterm for goterm in goterms_to_fetch if goterm.name == None or goterm.description == None]
+        goterms_to_fetch = [goterm for goterm in goterms_to_fetch if goterm.load_name_description_from_cache() == False]
+        logger.info(f"Resolved {goterms_from_obo} GO term names and descriptions from the OBO file, {len(goterms_to_fetch)} remain to be fetched from the web.")
+
+        if goterms_to_fetch == []:
+            pass
+        elif run_async == True:
+            self.async_runtime.run(self._fetch_all_go_term_names_descriptions_async(api, req_delay=req_delay, goterms=goterms_to_fetch))
         else:
             logger.info(f"Fetching GO term names and their descriptions.")
             # TODO: tqdm prevents any logger.info to be printed to console
             # tqdm.write(f"Fetching GO term names and their descriptions.")
             with logging_redirect_tqdm():
-                for goterm in tqdm(self.goterms, desc="Fetch term names and descs"):
-                    if goterm.name == None or goterm.description == None: # if goterm.name or description don't exist, then attempt fetch
-                        goterm.fetch_name_description(api)
+                for goterm in tqdm(goterms_to_fetch, desc="Fetch term names and descs"):
+                    goterm.fetch_name_description(api)
         
+        self._record_cache_statistics("fetch_all_go_term_names_descriptions")
         if "fetch_all_go_term_names_descriptions" not in self.execution_times: # to prevent overwriting on additional runs of the same model name
             self.execution_times["fetch_all_go_term_names_descriptions"] = self.timer.get_elapsed_time()
         self.timer.print_elapsed_time()
 
-    async def _fetch_all_go_term_names_descriptions_async(self, api:GOApi, req_delay = 0.1):
+    async def _fetch_all_go_term_names_descriptions_async(self, api:GOApi, req_delay = 0.1, goterms:List[GOTerm] = None):
         """
         Call fetch_all_go_term_names_descriptions with run_async == True to run this code.
+        If 'goterms' isn't supplied, all GO Terms of the model are used.
         """
+        session = await self.async_runtime.get_session()
         tasks = []
-        for goterm in self.goterms:
+        for goterm in (goterms if goterms != None else self.goterms):
             if goterm.name == None or goterm.description == None: 
-                task = asyncio.create_task(goterm.fetch_name_description_async(api, req_delay=req_delay))
+                task = asyncio.create_task(goterm.fetch_name_description_async(api, req_delay=req_delay, session=session))
                 tasks.append(task)
         await asyncio.gather(*tasks)
     
-    def fetch_all_go_term_products(self, web_download: bool = False, run_async = True, recalculate: bool = False, delay:float = 0.0, run_async_options:str="v3", request_params={"rows":20000}, max_connections = 100):
+    def fetch_all_go_term_products(self, web_download: bool = False, run_async = True, recalculate: bool = False, delay:float = 0.0, run_async_options:str="v3", request_params={"rows":20000}, max_connections = 100, page_size:int = 5000):
         """
         Iterates over all GOTerm objects in the go_term set and calls the fetch_products method for each object.
         
@@ -577,6 +633,8 @@ class ReverseLookup:
                   which allows us to control the amount of requests sent to the server. The result is that the server doesn't detect us as bots and doesn't block our requests.
                   v2 should be used. 
                 - v3 is the best working function and should be always used.
+          - (dict) request_params: the request parameters of the product queries; request_params['rows'] is the maximum amount of associations fetched per GO Term
+          - (int) page_size: (v3 only) the products of a GO Term are fetched in concurrent start/rows windows of 'page_size' rows, which are streamed and filtered as they arrive
         
         Developer explanation for v1, v2 and v3 versions of async:
           - *** async version 1 ***
@@ -647,6 +705,7 @@ class ReverseLookup:
         """
         logger.info(f"Started fetching all GO Term products.")
         self.timer.set_start_time()
+        Cacher.set_stage("fetch_all_go_term_products")
 
         if web_download == True:
             source = GOApi()
@@ -655,11 +714,11 @@ class ReverseLookup:
 
         if run_async == True:
             if run_async_options == "v1":
-                asyncio.run(self._fetch_all_go_term_products_async_v1(recalculate=False, delay=delay))
+                self.async_runtime.run(self._fetch_all_go_term_products_async_v1(recalculate=False, delay=delay))
             elif run_async_options == "v2":
-                asyncio.run(self._fetch_all_goterm_products_async_v2(max_connections=max_connections, request_params=request_params, req_delay=delay))
+                self.async_runtime.run(self._fetch_all_goterm_products_async_v2(max_connections=max_connections, request_params=request_params, req_delay=delay))
             elif run_async_options == "v3":
-                asyncio.run(self._fetch_all_goterm_products_async_v3(max_connections=max_connections, request_params=request_params, req_delay=delay))
+                self.async_runtime.run(self._fetch_all_goterm_products_async_v3(max_connections=max_connections, request_params=request_params, req_delay=delay, page_size=page_size))
         else:
             with logging_redirect_tqdm():
                 for goterm in tqdm(self.goterms, desc="Fetch term products"):
@@ -671,6 +730,8 @@ class ReverseLookup:
         #     for goterm in tqdm(self.goterms):
         #         goterm.fetch_products(api)
 
+        self.invalidate_product_goterm_index() # the products of the GO Terms have changed
+        self._record_cache_statistics("fetch_all_go_term_products")
         if "fetch_all_go_term_products" not in self.execution_times:
             self.execution_times["fetch_all_go_term_products"] = self.timer.get_elapsed_time()
         self.timer.print_elapsed_time()
@@ -731,20 +792,34 @@ class ReverseLookup:
     
     # IMPROVE SPEED UP USING ASYNCIO.GATHER: Instead of awaiting each request individually in a loop, you can use asyncio.gather() 
     # to concurrently execute multiple requests. This allows the requests to be made in parallel, which can significantly improve performance.
-    async def _fetch_all_goterm_products_async_v3(self, max_connections = 100, request_params = {"rows":20000}, req_delay = 0.5, recalculate:bool = False):
+    async def _fetch_all_goterm_products_async_v3(self, max_connections = 100, request_params = {"rows":20000}, req_delay = 0.5, recalculate:bool = False, page_size:int = 5000):
         """
         In comparison to (GOApi)._fetch_all_go_term_products_async, this function doesn't overload the server and cause the server to block our requests.
         In comparison to the v2 version of this function (inside GOApi), v3 uses asyncio.gather, which speeds up the async requests.
-        """
-        connector = aiohttp.TCPConnector(limit=max_connections,limit_per_host=max_connections) # default is 100
-        async with aiohttp.ClientSession(connector=connector) as session:
+        The GO Terms whose product queries fail after all retries of self.retry_policy are re-queued at the end of the stage (at most self.retry_policy.requeue_rounds times).
+        The requests are sent through the shared session of self.async_runtime, 'max_connections' limits the amount of GO Terms queried at once.
+        The products of each GO Term are fetched in start/rows windows of 'page_size' rows (request_params['rows'] is the maximum amount of rows per GO Term).
+        """
+        self.retry_policy.reset_statistics()
+        session = await self.async_runtime.get_session()
+        semaphore = asyncio.Semaphore(max_connections)
+        goterms_to_fetch = [goterm for goterm in self.goterms if goterm.products == [] or recalculate == True]
+        for requeue_round in range(self.retry_policy.requeue_rounds + 1):
+            if requeue_round > 0:
+                logger.info(f"Re-queueing {len(goterms_to_fetch)} GO Terms with failed product queries (round {requeue_round}).")
+                self.retry_policy.statistics.clear_failed_items()
             tasks = []
-            for goterm in self.goterms:
-                if goterm.products == [] or recalculate == True:
-                    task = goterm.fetch_products_async_v3(session, request_params=request_params, req_delay=req_delay)
-                    tasks.append(task)
+            for goterm in goterms_to_fetch:
+                task = goterm.fetch_products_async_v3_semaphore(session, semaphore, request_params=request_params, req_delay=req_delay, retry_policy=self.retry_policy, page_size=page_size)
+                tasks.append(task)
             # perform multiple tasks at once asynchronously
             await asyncio.gather(*tasks)
+            goterms_to_fetch = [goterm for goterm in goterms_to_fetch if "products" in goterm.http_error_codes]
+            if goterms_to_fetch == []:
+                break
+        
+        self.retry_policy.statistics.log_summary("fetch_all_go_term_products")
+        self.request_statistics["fetch_all_go_term_products"] = self.retry_policy.statistics.to_dict()
 
     def create_products_from_goterms(self) -> None:
         """
@@ -776,55 +851,27 @@ class ReverseLookup:
         for term in self.goterms:
             products_set.update(term.products)
 
-        # Iterate over each product in the products_set and create a new Product object from the product ID using the
-        # Product.from_dict() classmethod. Add the resulting Product objects to the ReverseLookup object's products list.
-        for product in products_set:
-            if ':' in product:
-                self.products.append(Product.from_dict({'id_synonyms': [product]}))
-            else:
-                self.products.append(Product.from_dict({'id_synonyms': [product], 'genename': product}))
-        logger.info(f"Created Product objects from GOTerm object definitions")
-
-        if "create_products_from_goterms" not in self.execution_times:
-            self.execution_times["create_products_from_goterms"] = self.timer.get_elapsed_time()
-        self.timer.print_elapsed_time()
-
-        def check_exists(product_id: str) -> bool:
-            """
-            Checks if the product_id already exists among self.products. When loading using ReverseLookup.load_model(data.json),
-            check_exists has to be used in order to prevent product duplications.
-
-            Returns: True, if product_id already exists in self.products
-            """
-            for existing_product in self.products:
-                if product_id in existing_product.id_synonyms:
-                    return True
-            return False
-
-        logger.info(f"Creating products from GO Terms")
-        self.timer.set_start_time()
-
-        # Create an empty set to store unique products
-        products_set = set()
-
-        # Iterate over each GOTerm object in the go_term set and retrieve the set of products associated with that GOTerm
-        # object. Add these products to the products_set.
-        for term in self.goterms:
-            products_set.update(term.products)
+        # All id synonyms of the existing products. When loading using ReverseLookup.load_model(data.json), the products
+        # which already exist in self.products have to be skipped in order to prevent product duplications.
+        existing_product_ids = set()
+        for existing_product in self.products:
+            existing_product_ids.update(existing_product.id_synonyms)
 
         # Iterate over each product in the products_set and create a new Product object from the product ID using the
         # Product.from_dict() classmethod. Add the resulting Product objects to the ReverseLookup object's products list.
         i = 0
         for product in products_set: # here, each product is a product id, eg. 'MGI:1343124'
-            if check_exists(product) == True:
+            if product in existing_product_ids:
                 continue
             if ':' in product:
                 self.products.append(Product.from_dict({'id_synonyms': [product]}))
             else:
                 self.products.append(Product.from_dict({'id_synonyms': [product], 'genename': product}))
             i+=1
+        self.invalidate_product_index()
         
         logger.info(f"Created {i} Product objects from GOTerm object definitions")
+        self.rebuild_product_goterm_index()
 
         if "create_products_from_goterms" not in self.execution_times:
             self.execution_times["create_products_from_goterms"] = self.timer.get_elapsed_time()
@@ -837,7 +884,7 @@ class ReverseLookup:
         Args:
           - (bool) refetch: if True, will fetch the ortholog products for all Product instances again, even if some Product instances already have their orthologs fetched.
           - (bool) run_async: if True, will send requests asynchronously
-          - (int) max_connections: the maximum amount of connections the asynchronous client session will send to the server
+          - (int) max_connections: the maximum amount of connections the asynchronous client session will send to the server (unused in async mode: the pooled session of self.async_runtime is shared, concurrency is limited with semaphore_connections)
           - (float) req_delay: the delay between connections in secondsž
         
         This function relies on request caching. It will cache the http requests to the server. When using async requests with ortholog fetch, the first full run of all products is successful, but if
@@ -873,6 +920,7 @@ class ReverseLookup:
         """
         logger.info(f"Started fetching ortholog products.")
         self.timer.set_start_time()
+        Cacher.set_stage("fetch_ortholog_products")
 
         try:
             if use_goaf == True:
@@ -884,7 +932,7 @@ class ReverseLookup:
                 # TODO: remove this and use_goaf
 
             elif run_async == True:
-                asyncio.run(self._fetch_ortholog_products_async(refetch=refetch, max_connections=max_connections, req_delay=req_delay, semaphore_connections=semaphore_connections))
+                self.async_runtime.run(self._fetch_ortholog_products_async(refetch=refetch, max_connections=max_connections, req_delay=req_delay, semaphore_connections=semaphore_connections))
             else:
                 human_ortholog_finder = HumanOrthologFinder()
                 uniprot_api = UniProtAPI()
@@ -900,11 +948,14 @@ class ReverseLookup:
                             product.fetch_ortholog(human_ortholog_finder, uniprot_api, ensembl_api, goaf=goaf)
                             product.had_orthologs_computed = True
         except Exception as e:
+            self.invalidate_product_index() # the orthologs of the products fetched before the exception are kept
             # If there was an exception while fetching UniProt data, save all the Product objects to a JSON file.
             self.save_model('crash_products.json')
             # Re-raise the exception so that the caller of the method can handle it.
             raise e
         
+        self.invalidate_product_index() # orthologs change the genenames, uniprot ids and ensg ids of the products
+        self._record_cache_statistics("fetch_ortholog_products")
         if "fetch_ortholog_products" not in self.execution_times:
             self.execution_times["fetch_ortholog_products"] = self.timer.get_elapsed_time()
         self.timer.print_elapsed_time()
@@ -936,27 +987,39 @@ class ReverseLookup:
             finally:
                 await session.close()
 
-        human_ortholog_finder = HumanOrthologFinder()
-        uniprot_api = UniProtAPI()
-        ensembl_api = EnsemblAPI()
+        # the api instances, the ortholog finder and the goaf are shared between the async stages (see AsyncRuntime)
+        human_ortholog_finder = self.async_runtime.human_ortholog_finder
+        uniprot_api = self.async_runtime.uniprot_api
+        ensembl_api = self.async_runtime.ensembl_api
         ensembl_api.async_request_sleep_delay = req_delay
         uniprot_api.async_request_sleep_delay = req_delay
-        goaf = GOAnnotiationsFile()
+        self.retry_policy.reset_statistics()
+        goaf = self.async_runtime.goaf
 
-        connector = aiohttp.TCPConnector(limit=max_connections,limit_per_host=max_connections)
+        session = await self.async_runtime.get_session()
         semaphore = asyncio.Semaphore(semaphore_connections)
-        async with aiohttp.ClientSession(connector=connector) as session:
-        # async with create_session() as session:
+        products_to_fetch = [product for product in self.products if product.had_orthologs_computed == False or refetch == True]
+        for requeue_round in range(self.retry_policy.requeue_rounds + 1):
+            if requeue_round > 0:
+                logger.info(f"Re-queueing {len(products_to_fetch)} products with failed ortholog queries (round {requeue_round}).")
+                self.retry_policy.statistics.clear_failed_items()
             tasks = []
-            for product in self.products:
-                if product.had_orthologs_computed == False or refetch == True:
-                    # task = product.fetch_ortholog_async(session, human_ortholog_finder, uniprot_api, ensembl_api)
-                    task = product.fetch_ortholog_async_semaphore(session, semaphore, goaf, human_ortholog_finder, uniprot_api, ensembl_api)
-                    tasks.append(task)
-                    product.had_orthologs_computed = True
+            for product in products_to_fetch:
+                # task = product.fetch_ortholog_async(session, human_ortholog_finder, uniprot_api, ensembl_api)
+                task = product.fetch_ortholog_async_semaphore(session, semaphore, goaf, human_ortholog_finder, uniprot_api, ensembl_api)
+                tasks.append(task)
+                product.had_orthologs_computed = True
             await asyncio.gather(*tasks)
+            products_to_fetch = [product for product in products_to_fetch if self._product_request_failed(product)]
+            if products_to_fetch == []:
+                break
+        # products which failed in all rounds are fetched again on the next (non-refetch) call
+        for product in products_to_fetch:
+            product.had_orthologs_computed = False
         
         logger.info(f"During ortholog query, there were {len(ensembl_api.ortholog_query_exceptions)} ensembl api exceptions and {len(uniprot_api.uniprot_query_exceptions)} uniprot api exceptions.")
+        self.retry_policy.statistics.log_summary("fetch_ortholog_products")
+        self.request_statistics["fetch_ortholog_products"] = self.retry_policy.statistics.to_dict()
         
         #logger.debug(f"Printing exceptions:")
         #i = 0
@@ -966,26 +1029,95 @@ class ReverseLookup:
         #    logger.debug(f"[{i}] :: {product_id} : {exception}")
         #    i += 1
 
-    def prune_products(self) -> None:
+    def prune_products(self, identifier_fields: List[str] = ["id_synonyms", "genename", "uniprot_id", "ensg_id", "enst_id"]) -> None:
+        """
+        Merges duplicated products in self.products. Two products are duplicates if they share a value of any of the 'identifier_fields'
+        (eg. the same genename or the same UniProt accession under different id synonyms). Duplication is transitive: the products are
+        grouped into connected components with a union-find over the identifier values, which runs in near-linear time.
+
+        Each component of more than one product is replaced with a single merged product at the position of the component's first product:
+          - id_synonyms: the union of all id synonyms, in the order of self.products
+          - genename, uniprot_id, description, ensg_id, enst_id, refseq_nt_id, mRNA: the first non-None value in the order of self.products
+          - scores: the union of all scores, the first product (in the order of self.products) wins for duplicated score keys
+          - had_orthologs_computed, had_fetch_info_computed: taken from the first product of the component
+
+        Parameters:
+          - (List[str]) identifier_fields: the Product fields, which identify a product. Use ["genename"] to merge only products with the same genename.
+        """
         logger.info(f"Started pruning products.")
         self.timer.set_start_time()
 
-        # Create a dictionary that maps genename to a list of products
-        reverse_genename_products = {}
-        for product in self.products:
-            if product.genename is not None:
-                reverse_genename_products.setdefault(product.genename, []).append(product)
-
-        # For each ENSG that has more than one product associated with it, create a new product with all the synonyms
-        # and remove the individual products from the list
-        for genename, product_list in reverse_genename_products.items():
-            if len(product_list) > 1:
-                id_synonyms = []
-                for product in product_list:
-                    self.products.remove(product)
-                    id_synonyms.extend(product.id_synonyms)
-                # Create a new product with the collected information and add it to the product list
-                self.products.append(Product(id_synonyms, product_list[0].genename, product_list[0].uniprot_id, product_list[0].description, product_list[0].ensg_id, product_list[0].enst_id, product_list[0].refseq_nt_id, product_list[0].mRNA, {}, product_list[0].had_orthologs_computed, product_list[0].had_fetch_info_computed))
+        # union-find over the positions of the products in self.products; the root of each component is its first product
+        parents = list(range(len(self.products)))
+
+        def find(i: int) -> int:
+            while parents[i] != i:
+                parents[i] = parents[parents[i]] # path halving
+                i = parents[i]
+            return i
+        
+        def union(i: int, j: int) -> None:
+            root_i = find(i)
+            root_j = find(j)
+            if root_i < root_j:
+                parents[root_j] = root_i
+            elif root_j < root_i:
+                parents[root_i] = root_j
+
+        # identifier value -> position of the first product with this value
+        identifier_owners = {}
+        for i, product in enumerate(self.products):
+            for field in identifier_fields:
+                if field == "id_synonyms":
+                    values = product.id_synonyms if product.id_synonyms != None else []
+                else:
+                    values = [getattr(product, field)]
+                for value in values:
+                    if value == None or value == "":
+                        continue
+                    owner = identifier_owners.setdefault(value, i)
+                    if owner != i:
+                        union(owner, i)
+
+        components = {} # root position -> list of products in the component
+        for i, product in enumerate(self.products):
+            components.setdefault(find(i), []).append(product)
+
+        pruned_products = []
+        num_merged = 0 # products, which were merged
+        num_merged_components = 0 # merged products, which replaced them
+        for i, product in enumerate(self.products):
+            if find(i) != i:
+                continue # merged into the product at the root position
+            product_list = components[i]
+            if len(product_list) == 1:
+                pruned_products.append(product)
+                continue
+
+            id_synonyms = []
+            seen_id_synonyms = set()
+            scores = {}
+            for merged_product in product_list:
+                for id_synonym in merged_product.id_synonyms:
+                    if id_synonym not in seen_id_synonyms:
+                        seen_id_synonyms.add(id_synonym)
+                        id_synonyms.append(id_synonym)
+                for score_key, score in merged_product.scores.items():
+                    scores.setdefault(score_key, score)
+            
+            def first_value(field: str):
+                return next((getattr(p, field) for p in product_list if getattr(p, field) != None), None)
+
+            new_product = Product(id_synonyms, first_value("genename"), first_value("uniprot_id"), first_value("description"), first_value("ensg_id"), first_value("enst_id"), first_value("refseq_nt_id"), first_value("mRNA"), scores, product_list[0].had_orthologs_computed, product_list[0].had_fetch_info_computed)
+            if first_value("uniprot_id") != None:
+                new_product.uniprot_id = first_value("uniprot_id") # bugfix: Product.__init__ overwrites uniprot_id with the last UniProt id synonym
+            pruned_products.append(new_product)
+            num_merged += len(product_list)
+            num_merged_components += 1
+
+        logger.info(f"Merged {num_merged} duplicated products into {num_merged_components} products. Num products: {len(self.products)} -> {len(pruned_products)}")
+        self.products[:] = pruned_products
+        self.invalidate_product_index()
 
         if "prune_products" not in self.execution_times:
             self.execution_times["prune_products"] = self.timer.get_elapsed_time()
@@ -996,10 +1128,11 @@ class ReverseLookup:
 
         logger.info(f"Started fetching product infos.")
         self.timer.set_start_time()
+        Cacher.set_stage("fetch_product_infos")
 
         if run_async: 
             # async mode
-            asyncio.run(self._fetch_product_infos_async(required_keys=required_keys, refetch=refetch, max_connections=max_connections, req_delay=req_delay, semaphore_connections=semaphore_connections))
+            self.async_runtime.run(self._fetch_product_infos_async(required_keys=required_keys, refetch=refetch, max_connections=max_connections, req_delay=req_delay, semaphore_connections=semaphore_connections))
         else: 
             # sync mode
             uniprot_api = UniProtAPI()
@@ -1017,31 +1150,68 @@ class ReverseLookup:
                             if product.had_fetch_info_computed == False:
                                 logger.warning(f"had_fetch_info_computed IS FALSE despite being called for {product.id_synonyms}, genename = {product.genename}")
             except Exception as e:
+                self.invalidate_product_index() # the infos of the products fetched before the exception are kept
                 raise e
         
+        self.invalidate_product_index() # product infos change the identifier fields of the products
+        self._record_cache_statistics("fetch_product_infos")
         if "fetch_product_infos" not in self.execution_times:
             self.execution_times["fetch_product_infos"] = self.timer.get_elapsed_time()
         self.timer.print_elapsed_time()
 
     async def _fetch_product_infos_async(self, required_keys = ["genename", "description", "ensg_id", "enst_id", "refseq_nt_id"], refetch:bool = False, max_connections = 50, req_delay = 0.1, semaphore_connections = 5):
-        uniprot_api = UniProtAPI()
-        ensembl_api = EnsemblAPI()
+        uniprot_api = self.async_runtime.uniprot_api
+        ensembl_api = self.async_runtime.ensembl_api
         uniprot_api.async_request_sleep_delay = req_delay
         ensembl_api.async_request_sleep_delay = req_delay
+        self.retry_policy.reset_statistics()
+        goaf = self.async_runtime.goaf # offline gene name source, used when UniProt is down
 
-        connector = aiohttp.TCPConnector(limit=max_connections,limit_per_host=max_connections)
+        session = await self.async_runtime.get_session()
         semaphore = asyncio.Semaphore(semaphore_connections)
-
-        async with aiohttp.ClientSession(connector=connector) as session:
-        # async with create_session() as session:
+        products_to_fetch = [product for product in self.products if product.had_fetch_info_computed == False or refetch == True]
+        for requeue_round in range(self.retry_policy.requeue_rounds + 1):
+            if requeue_round > 0:
+                logger.info(f"Re-queueing {len(products_to_fetch)} products with failed info queries (round {requeue_round}).")
+                self.retry_policy.statistics.clear_failed_items()
             tasks = []
-            for product in self.products:
-                if product.had_fetch_info_computed == False or refetch == True:
-                    # task = product.fetch_ortholog_async(session, human_ortholog_finder, uniprot_api, ensembl_api)
-                    task = product.fetch_info_async_semaphore(session, semaphore, uniprot_api, ensembl_api, required_keys)
-                    tasks.append(task)
-                    product.had_fetch_info_computed = True
+            for product in products_to_fetch:
+                # task = product.fetch_ortholog_async(session, human_ortholog_finder, uniprot_api, ensembl_api)
+                task = product.fetch_info_async_semaphore(session, semaphore, uniprot_api, ensembl_api, required_keys, goaf=goaf)
+                tasks.append(task)
+                product.had_fetch_info_computed = True
             await asyncio.gather(*tasks)
+            products_to_fetch = [product for product in products_to_fetch if self._product_request_failed(product)]
+            if products_to_fetch == []:
+                break
+        # products which failed in all rounds are fetched again on the next (non-refetch) call
+        for product in products_to_fetch:
+            product.had_fetch_info_computed = False
+        
+        self.retry_policy.statistics.log_summary("fetch_product_infos")
+        self.request_statistics["fetch_product_infos"] = self.retry_policy.statistics.to_dict()
+
+    def _record_cache_statistics(self, stage:str):
+        """
+        Records the cache statistics of 'stage' (see CacheStatistics) into self.cache_statistics and Cacher.CACHE_FILEPATH_STATISTICS,
+        and resets the Cacher stage. The saved request time of the async stages is estimated from the average request time of the stage's retry policy statistics.
+        """
+        if stage in self.request_statistics:
+            Cacher.statistics.set_request_time(stage, self.retry_policy.statistics.get_average_request_time())
+        Cacher.statistics.log_summary(stage)
+        self.cache_statistics = Cacher.statistics.to_dict() # bugfix: kept out of self.execution_times, which only holds the stage timings (and is saved with the model)
+        try:
+            Cacher.save_statistics()
+        except OSError as e:
+            logger.warning(f"Couldn't save the cache statistics: {e}")
+        Cacher.set_stage("")
+
+    def _product_request_failed(self, product: Product) -> bool:
+        """
+        Returns True if any of the product's identifiers (id synonyms, uniprot id, ensg id, genename) was recorded as failed (after all retries)
+        in the statistics of self.retry_policy during the current async stage.
+        """
+        return self.retry_policy.statistics.has_failed(product.id_synonyms + [product.uniprot_id, product.ensg_id, product.genename])
     
     def score_products(self, score_classes: List[Metrics], recalculate:bool=True) -> None:
         """
@@ -1078,23 +1248,26 @@ class ReverseLookup:
 
         # perform scoring of each product (gene)
         with logging_redirect_tqdm():
-            # iterate over each Product object in self.products and score them using the Scoring object
-            for product in tqdm(self.products, "Scoring products"): # each Product has a field scores - a dictionary between a name of the scoring algorithm and it's corresponding score
-                for _score_class in score_classes:
-                    # NOTE: Current miRNA scoring (self.score_miRNAs) performs miRNA scoring holistically - in one call for all miRNAs in self.miRNAs. It is pointless to call this function here, as it needs to
-                    # be called only once. Here, a function for miRNA scoring has to be called, which displays the top N miRNAs, which bind to the specific product.
-                    # 
-                    # if isinstance(_score_class, basic_mirna_score):
-                    #    self.score_miRNAs(_score_class, recalculate=recalculate)
-                    #    continue
-                    if isinstance(_score_class, basic_mirna_score):
-                        # just continue, see explanation above
-                        continue
-
-                    if _score_class.name in product.scores and recalculate == True: # if score already exists and recalculate is set to True
-                        product.scores[_score_class.name] = _score_class.metric(product) # create a dictionary between the scoring algorithm name and it's score for current product
-                    elif _score_class.name not in product.scores: # if score doesn't exist yet
-                        product.scores[_score_class.name] = _score_class.metric(product)
+            # score all Product objects in self.products at once with each Scoring object (see Metrics.metric_all)
+            for _score_class in score_classes:
+                # NOTE: Current miRNA scoring (self.score_miRNAs) performs miRNA scoring holistically - in one call for all miRNAs in self.miRNAs. It is pointless to call this function here, as it needs to
+                # be called only once. Here, a function for miRNA scoring has to be called, which displays the top N miRNAs, which bind to the specific product.
+                # 
+                # if isinstance(_score_class, basic_mirna_score):
+                #    self.score_miRNAs(_score_class, recalculate=recalculate)
+                #    continue
+                if isinstance(_score_class, basic_mirna_score):
+                    # just continue, see explanation above
+                    continue
+                
+                # if recalculate is False, only the products without an existing score are scored
+                if recalculate == True:
+                    products_to_score = self.products # the incidence matrix of self.products is cached by the model
+                else:
+                    products_to_score = [product for product in self.products if _score_class.name not in product.scores]
+                scores = _score_class.metric_all(products_to_score)
+                for product, score in zip(products_to_score, scores): # each Product has a field scores - a dictionary between a name of the scoring algorithm and it's corresponding score
+                    product.scores[_score_class.name] = score
 
         # calculate Benjamini-Hochberg FDR correction
         for _score_class in score_classes:
@@ -1131,6 +1304,7 @@ class ReverseLookup:
     def fetch_mRNA_sequences(self, refetch = False) -> None:
         logger.info(f"Started fetching mRNA sequences.")
         self.timer.set_start_time()
+        Cacher.set_stage("fetch_mRNA_sequences")
 
         try:
             ensembl_api = EnsemblAPI()
@@ -1146,6 +1320,7 @@ class ReverseLookup:
         except Exception as e:
             raise e
 
+        self._record_cache_statistics("fetch_mRNA_sequences")
         if "fetch_mRNA_sequences" not in self.execution_times:
             self.execution_times["fetch_mRNA_sequences"] = self.timer.get_elapsed_time()
         self.timer.print_elapsed_time()
@@ -1262,13 +1437,16 @@ class ReverseLookup:
 
 # housekeeping functions
 
-    def get_all_goterms_for_product(self, product: Product | str) -> List[GOTerm]:
+    def get_all_goterms_for_product(self, product: Product | str, include_genename: bool = False) -> List[GOTerm]:
         """
-        func desc
+        Returns all GO Terms from self.goterms, which are associated with the product. The GO Terms are looked up in the
+        inverted product -> GO Term index (see _get_product_goterm_index) and are returned in the order of self.goterms.
 
         Args:
           - (Product) | (str): either a Product object, or a string denoting either a product's UniProtKB id (eg. 'Q8TED9') or a product's
                                gene name (eg. 'AFAP1L1'). A UniProtKB can be input either in the 'UniProtKB:Q8TED9' or the 'Q8TED9' notation.
+          - (bool) include_genename: if True, a GO Term is also associated with the product if the product's genename is among GOTerm.products
+                                     (by default, only product.id_synonyms are matched)
         
         Returns:
           - List[GOTerm]: a list of GO Term objects, which are associated with the input Product or product string (UniProtKB id or gene name)
@@ -1276,19 +1454,155 @@ class ReverseLookup:
         if isinstance(product, str):
             if ":" in product:
                 product = product.split(":")[1] # if in UniProtKB:xxxx notation, obtain only the last part of the id, eg. 'Q8TED9'
-            for prod in self.products:
-                if prod.uniprot_id == product:
-                    product = prod
-                    break
-                if prod.genename == product:
-                    product = prod
-                    break
+            prod = self.get_product_by("uniprot_id", product)
+            if prod == None:
+                prod = self.get_product_by("genename", product)
+            product = prod
 
-        goterms_list = []
-        for goterm in self.goterms: # loop over all GO Terms
-            if any(product_id in goterm.products for product_id in product.id_synonyms): # a GOTerm has GOTerm.products stored in the full-identifier notation (eg. 'MGI:1201409', 'UniProtKB:Q02763', ...), therefore you need to use product.id_synonyms, which also contains the full-identifier notation
-                goterms_list.append(goterm)
-        return goterms_list
+        return [self.goterms[i] for i in self._get_goterm_positions(product, include_genename=include_genename)]
+
+    def _get_goterm_positions(self, product: Product, include_genename: bool = False) -> List[int]:
+        """
+        Returns the sorted positions (in self.goterms) of the GO Terms associated with the product (see get_all_goterms_for_product).
+        """
+        # a GOTerm has GOTerm.products stored in the full-identifier notation (eg. 'MGI:1201409', 'UniProtKB:Q02763', ...), therefore you need to use product.id_synonyms, which also contains the full-identifier notation
+        product_ids = list(product.id_synonyms)
+        if include_genename == True and product.genename != None:
+            product_ids.append(product.genename)
+        
+        product_goterm_index = self._get_product_goterm_index()
+        goterm_positions = set()
+        for product_id in product_ids:
+            goterm_positions.update(product_goterm_index.get(product_id, ()))
+        return sorted(goterm_positions)
+
+    def invalidate_product_goterm_index(self) -> None:
+        """
+        Marks the inverted product -> GO Term index as stale. It is rebuilt on the next call of get_all_goterms_for_product. Call this after
+        changing GOTerm.products of any GO Term in self.goterms. Replacing or resizing self.goterms is detected automatically.
+        """
+        self._product_goterm_index = None
+        self._incidence_matrices = {}
+
+    def rebuild_product_goterm_index(self) -> None:
+        """
+        Rebuilds the inverted product -> GO Term index from self.goterms. Each product id in GOTerm.products is mapped to the set of positions
+        of the GO Terms (in self.goterms), which contain it.
+        """
+        self._product_goterm_index = {}
+        self._incidence_matrices = {}
+        for i, goterm in enumerate(self.goterms):
+            if goterm.products == None:
+                continue
+            for product_id in goterm.products:
+                self._product_goterm_index.setdefault(product_id, set()).add(i)
+        self._product_goterm_index_source = self.goterms
+        self._product_goterm_index_size = len(self.goterms)
+
+    def _get_product_goterm_index(self) -> dict:
+        """
+        Returns the inverted product -> GO Term index, (re)building it if it is stale or if self.goterms was replaced or resized.
+        """
+        if self._product_goterm_index == None or self._product_goterm_index_source is not self.goterms or self._product_goterm_index_size != len(self.goterms):
+            self.rebuild_product_goterm_index()
+        return self._product_goterm_index
+
+    def get_product_goterm_matrix(self, products: List[Product] = None, include_genename: bool = False) -> csr_matrix:
+        """
+        Returns the sparse incidence matrix of the products and the GO Terms of the model, with the shape (len(products), len(self.goterms)).
+        Element [i, j] is 1 if products[i] is associated with self.goterms[j] (see get_all_goterms_for_product), otherwise 0.
+        
+        The matrix of self.products is built once and cached until the products or the GO Terms change (see invalidate_product_index, invalidate_product_goterm_index).
+
+        Parameters:
+          - (List[Product]) products: the products (rows) of the matrix. If None, self.products are used.
+          - (bool) include_genename: if True, the products are also matched to GOTerm.products by their genename
+        """
+        if products == None:
+            products = self.products
+        self._get_product_goterm_index() # rebuilds the inverted index (and drops the cached matrices) if the GO Terms changed
+        cache_key = ("product_goterm", include_genename)
+        use_cache = products is self.products
+        if use_cache and cache_key in self._incidence_matrices:
+            matrix = self._incidence_matrices[cache_key]
+            if matrix.shape == (len(self.products), len(self.goterms)):
+                return matrix
+        
+        rows = []
+        columns = []
+        for i, product in enumerate(products):
+            goterm_positions = self._get_goterm_positions(product, include_genename=include_genename)
+            rows.extend([i] * len(goterm_positions))
+            columns.extend(goterm_positions)
+        matrix = csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, columns)), shape=(len(products), len(self.goterms)), dtype=np.int64)
+        if use_cache:
+            self._incidence_matrices[cache_key] = matrix
+        return matrix
+
+    def get_process_direction_columns(self) -> List[tuple]:
+        """
+        Returns the (process, direction) columns of the process/direction indicator matrices (see get_process_direction_matrix): for each distinct
+        process in self.target_processes (in order), the directions '+', '-' and '0'. Eg. [('angio', '+'), ('angio', '-'), ('angio', '0'), ('diabetes', '+'), ...]
+        """
+        processes = []
+        for process in self.target_processes:
+            if process['process'] not in processes:
+                processes.append(process['process'])
+        return [(process, direction) for process in processes for direction in ['+', '-', '0']]
+
+    def get_process_direction_matrix(self, strict: bool = True) -> csr_matrix:
+        """
+        Returns the sparse indicator matrix of the GO Terms of the model and the (process, direction) columns (see get_process_direction_columns),
+        with the shape (len(self.goterms), len(columns)). The matrix is derived from goterm.processes, built once and cached until the GO Terms change.
+
+        Parameters:
+          - (bool) strict: if True, element [j, k] is 1 if self.goterms[j] has a process entry with both the process and the direction of column k (eg. {'process': 'angio', 'direction': '+'}).
+                           If False, element [j, k] is 1 if self.goterms[j] is associated with the process of column k and has any process entry with the direction of column k
+                           (this is how the binomial and the Fisher tests count the GO Terms of a process, see get_all_goterms_for_process).
+        
+        Multiplying the incidence matrix (see get_product_goterm_matrix) with this matrix gives the per-product counts of GO Terms for each process and direction.
+        """
+        self._get_product_goterm_index() # drops the cached matrices if the GO Terms changed
+        columns = self.get_process_direction_columns()
+        cache_key = ("process_direction", strict)
+        if cache_key in self._incidence_matrices:
+            matrix, matrix_columns = self._incidence_matrices[cache_key]
+            if matrix_columns == columns and matrix.shape[0] == len(self.goterms):
+                return matrix
+        
+        column_positions = {column: k for k, column in enumerate(columns)}
+        rows = []
+        matrix_columns = []
+        for j, goterm in enumerate(self.goterms):
+            goterm_columns = set()
+            if strict == True:
+                for goterm_process in goterm.processes:
+                    if (goterm_process['process'], goterm_process['direction']) in column_positions:
+                        goterm_columns.add(column_positions[(goterm_process['process'], goterm_process['direction'])])
+            else:
+                goterm_processes = set(goterm_process['process'] for goterm_process in goterm.processes)
+                goterm_directions = set(goterm_process['direction'] for goterm_process in goterm.processes)
+                for (process, direction), k in column_positions.items():
+                    if process in goterm_processes and direction in goterm_directions:
+                        goterm_columns.add(k)
+            rows.extend([j] * len(goterm_columns))
+            matrix_columns.extend(sorted(goterm_columns))
+        matrix = csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, matrix_columns)), shape=(len(self.goterms), len(columns)), dtype=np.int64)
+        self._incidence_matrices[cache_key] = (matrix, columns)
+        return matrix
+
+    def get_process_direction_counts(self, products: List[Product] = None, include_genename: bool = False, strict: bool = True) -> np.ndarray:
+        """
+        Returns the (dense) counts of the GO Terms of each product for each (process, direction) column (see get_process_direction_columns),
+        computed as the product of the incidence matrix and the process/direction indicator matrix. The shape is (len(products), len(columns)).
+
+        Parameters:
+          - (List[Product]) products: the products (rows). If None, self.products are used.
+          - (bool) include_genename: see get_product_goterm_matrix
+          - (bool) strict: see get_process_direction_matrix
+        """
+        incidence_matrix = self.get_product_goterm_matrix(products, include_genename=include_genename)
+        return (incidence_matrix @ self.get_process_direction_matrix(strict=strict)).toarray()
     
     def get_all_goterms_for_process(self, process: str) -> List[GOTerm]:
         """
@@ -1323,11 +1637,106 @@ class ReverseLookup:
     
     def get_product(self, identifier) -> Product:
         """
-        Return GOTerm based on any id
+        Return Product based on any id. The identifier fields (PRODUCT_INDEX_FIELDS) are looked up in the product hash indexes and
+        the first matching product in self.products is returned (as with the former linear scan). If no product is found in the indexes,
+        self.products is scanned (all identifier fields, description and mRNA), see get_product_by.
+
+        Raises StopIteration if no product matches the identifier.
+        """
+        products = [self._get_indexed_product(field, identifier) for field in self.PRODUCT_INDEX_FIELDS]
+        products = [product for product in products if product != None]
+        if products != []:
+            return min(products, key=lambda product: self._product_positions[id(product)])
+        product = next(obj for obj in self.products if any(getattr(obj, attr) == identifier for attr in ["genename", "description", "uniprot_id", "ensg_id", "enst_id", "refseq_nt_id", "mRNA"]) or (obj.id_synonyms != None and identifier in obj.id_synonyms))
+        if any(self._product_matches(product, field, identifier) for field in self.PRODUCT_INDEX_FIELDS):
+            self.invalidate_product_index() # the identifier was set outside of the invalidation points
+        return product
+
+    def get_product_by(self, field: str, identifier) -> Product:
+        """
+        Returns the (first) Product in self.products, the 'field' of which equals 'identifier', or None if there is no such product.
+        For 'id_synonyms', the product is returned if 'identifier' is any of the product's id synonyms.
+
+        The product is looked up in the product hash indexes. A hit is verified against the product, a miss is verified with a scan of self.products
+        (the same as the lookups before the indexes), so that identifiers changed outside of the invalidation points (eg. product.genename = ... in user code)
+        are found: in both cases, the indexes are rebuilt if they are stale.
+
+        Parameters:
+          - (str) field: one of PRODUCT_INDEX_FIELDS
+          - identifier: the value of the field, eg. 'Q8TED9' for field 'uniprot_id'
+        """
+        if identifier == None:
+            return None
+        product = self._get_indexed_product(field, identifier)
+        if product == None and any(self._product_matches(obj, field, identifier) for obj in self.products):
+            # bugfix: an identifier was set after the index was built -> rebuild the index
+            self.rebuild_product_index()
+            product = self._product_index[field].get(identifier)
+        return product
+
+    def _get_indexed_product(self, field: str, identifier) -> Product:
+        """
+        Returns the product of 'identifier' in the 'field' index (None on a miss). A stale hit (the product's identifier was changed after the index was built)
+        rebuilds the index.
         """
-        product = next(obj for obj in self.products if any(getattr(obj, attr) == identifier for attr in ["genename", "description", "uniprot_id", "ensg_id", "enst_id", "refseq_nt_id", "mRNA"]) or any(id == identifier for id in obj.id_synonyms))
+        if identifier == None:
+            return None
+        product = self._get_product_index()[field].get(identifier)
+        if product != None and not self._product_matches(product, field, identifier):
+            # bugfix: a product's identifier was changed after the index was built -> rebuild the index
+            self.rebuild_product_index()
+            product = self._product_index[field].get(identifier)
         return product
 
+    def invalidate_product_index(self) -> None:
+        """
+        Marks the product hash indexes as stale. They are rebuilt on the next product lookup. Call this after changing
+        the identifier fields (PRODUCT_INDEX_FIELDS) of the products or after removing products from self.products.
+        """
+        self._product_index = None
+        self._incidence_matrices = {}
+
+    def rebuild_product_index(self) -> None:
+        """
+        Rebuilds the product hash indexes (field -> identifier -> Product) from self.products.
+        """
+        self._incidence_matrices = {}
+        self._product_index = {field: {} for field in self.PRODUCT_INDEX_FIELDS}
+        self._product_index_size = 0
+        self._product_positions = {}
+        for product in self.products:
+            self._index_product(product)
+
+    def _index_product(self, product: Product) -> None:
+        """
+        Adds 'product' to the product hash indexes. Existing entries are kept, so that lookups return the first matching product in self.products.
+        """
+        if self._product_index == None:
+            return # the index is built lazily from self.products, which already contains the product
+        for field in self.PRODUCT_INDEX_FIELDS:
+            if field == "id_synonyms":
+                values = product.id_synonyms if product.id_synonyms != None else []
+            else:
+                values = [getattr(product, field)]
+            for value in values:
+                if value != None:
+                    self._product_index[field].setdefault(value, product)
+        self._product_positions[id(product)] = self._product_index_size
+        self._product_index_size += 1
+
+    def _get_product_index(self) -> dict:
+        """
+        Returns the product hash indexes, (re)building them if they are stale or if products were appended to self.products outside of ReverseLookup.
+        """
+        if self._product_index == None or self._product_index_size != len(self.products):
+            self.rebuild_product_index()
+        return self._product_index
+
+    def _product_matches(self, product: Product, field: str, identifier) -> bool:
+        if field == "id_synonyms":
+            return product.id_synonyms != None and identifier in product.id_synonyms
+        return getattr(product, field) == identifier
+
     def save_model(self, filepath: str) -> None:
         data = {}
         data['target_processes'] = self.target_processes
@@ -1571,8 +1980,7 @@ class ReverseLookup:
           or 'binomial_test' (the results of the binom test are used).
           - (str) filepath: The path to the output file
         
-        Warning: Binomial test scoring is not yet implemented. 
-        Warning: Products in this model must be scored with the aforementioned statistical tests prior to calling this function.
+        Warning: Products in this model must be scored with the aforementioned statistical test prior to calling this function.
 
         Usage example:
             model = ReverseLookup.load_model("diabetes_angio_2/data.json")
@@ -1580,7 +1988,7 @@ class ReverseLookup:
             binom_score = binomial_test(model, goaf)
             fisher_score = fisher_exact_test(model, goaf)
             model.score_products([binom_score, fisher_score])
-            model.perform_statistical_analysis("fisher")
+            model.perform_statistical_analysis("fisher_test")
         
         Returns a JSON with the following structure (example is also provided to the right):
             {                           {
@@ -1596,16 +2004,16 @@ class ReverseLookup:
         The genes (products) for each process pair are sorted according to the sum of the p-values, with products with the lowest pvalues (highest
         statistical probabilities) appearing first in the sorted dictionary.
 
-        TODO: implement binomial score, maybe even adv_score and nterms for backwards compatibility
+        TODO: maybe even adv_score and nterms for backwards compatibility
         """
         def sorting_key(product):
             """
             Sorting key used for the sorting of JSON data based on ascending pvalues.
-            Fisher test MUST be calculated for this to work.
+            The statistical test 'test_name' MUST be calculated for this to work.
             """
             pvalue_sum = 0
             for process in self.target_processes:
-                pvalue_process = product["scores"]["fisher_test"][f"{process['process']}{process['direction']}"]['pvalue_corr']
+                pvalue_process = product["scores"][test_name][f"{process['process']}{process['direction']}"]['pvalue_corr']
                 pvalue_sum += pvalue_process
             return pvalue_sum
 
@@ -1684,6 +2092,8 @@ class ReverseLookup:
         for product in self.products:
             if hasattr(product, member_field_name):
                 setattr(product, member_field_name, value)
+        if member_field_name in self.PRODUCT_INDEX_FIELDS:
+            self.invalidate_product_index()
 
     @classmethod
     def load_model(cls, filepath: str) -> 'ReverseLookup':
@@ -1699,6 +2109,7 @@ class ReverseLookup:
         execution_times = {}
         if "execution_times" in data:
             execution_times = data['execution_times']
+            execution_times.pop("cache_statistics", None) # saved in execution_times by older versions, see _record_cache_statistics
         
         if "statistically_relevant_products" in data:
             statistically_relevant_products = data['statistically_relevant_products']
@@ -1,4 +1,5 @@
 import logging
+import re
 import networkx as nx
 from .GOTerm import GOTerm
 
@@ -71,7 +72,13 @@ class OboParser:
                         case 'name':
                             term_data['name'] = line_value
                         case 'def':
-                            line_value = line_value.strip("\"") # definition line value contains double quotes in obo, strip them
+                            # definition line value contains double quotes and references in obo, eg. "Any process that ..." [GOC:go_curators]
+                            # bugfix: strip("\"") only stripped the leading quote, the references were kept in the description
+                            def_match = re.match(r'^"(.*)"\s*(\[.*\])?\s*$', line_value)
+                            if def_match != None:
+                                line_value = def_match.group(1).replace('\\"', '"')
+                            else:
+                                line_value = line_value.strip("\"")
                             term_data['description'] = line_value
                         case 'namespace':
                             term_data['category'] = line_value
@@ -0,0 +1,447 @@
+import numpy as np
+from scipy.stats import hypergeom, binom, binomtest
+from scipy.special import gammaln
+from collections import OrderedDict
+import threading
+import atexit
+import json
+import os
+import logging
+from .Timer import Timer
+
+logger = logging.getLogger(__name__)
+
+class StatisticsCache():
+    """
+    A bounded memo of statistical test results, keyed by the exact input of the test (eg. the complete contingency table of a Fisher exact test,
+    including the GOAF totals). Many products share identical tables (especially the products with 0 or 1 process GO Terms), so most of the
+    tests are repeats. The memo is shared by all models and Metrics instances of the process; when it is full, the least recently used results are dropped.
+
+    The results can be persisted across runs with init(filepath=...). As the keys contain the complete test input, a persisted cache is valid for
+    any model (results of models with different GOAF totals simply have different keys).
+
+    Usage:
+        StatisticsCache.init() # loads cache/statistics_cache.json and saves it at exit
+        model.score_products([fisher_exact_test(model, goaf)])
+    """
+    CACHE_FILEPATH = "cache/statistics_cache.json"
+    max_entries = 1000000
+    filepath = "" # if set, the cache is persisted to this filepath (see init)
+    entries = OrderedDict() # key -> list of results
+    lock = threading.Lock()
+    hits = 0
+    misses = 0
+    _atexit_registered = False
+
+    @classmethod
+    def init(cls, filepath: str = CACHE_FILEPATH, max_entries: int = 1000000, store_data_atexit: bool = True):
+        """
+        Initialises the statistics cache and loads the persisted results from 'filepath' (if it exists).
+
+        Parameters:
+          - (str) filepath: the json file of the persisted results. If "", the results are only kept in memory.
+          - (int) max_entries: the maximum amount of memoised results
+          - (bool) store_data_atexit: if True, the results are saved to 'filepath' at program exit
+        """
+        with cls.lock:
+            cls.filepath = filepath
+            cls.max_entries = max_entries
+        if filepath != "" and os.path.exists(filepath):
+            try:
+                with open(filepath, "r") as f:
+                    data = json.load(f)
+                with cls.lock:
+                    for key, value in data.get("entries", {}).items():
+                        cls.entries[key] = value
+                    cls._evict()
+                logger.info(f"Loaded {len(data.get('entries', {}))} statistical test results from {filepath}.")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Couldn't load the statistics cache from {filepath}: {e}")
+        if filepath != "" and store_data_atexit and not cls._atexit_registered:
+            atexit.register(cls.save)
+            cls._atexit_registered = True
+
+    @classmethod
+    def make_key(cls, test: str, alternative: str, *params) -> str:
+        """
+        Returns the memo key of a test, eg. 'fisher_exact|two-sided|3,97,12,18868'.
+        """
+        return f"{test}|{alternative}|{','.join(str(param) for param in params)}"
+
+    @classmethod
+    def get(cls, key: str):
+        """
+        Returns the memoised results of 'key' (a list), or None if the test wasn't memoised yet.
+        """
+        with cls.lock:
+            value = cls.entries.get(key)
+            if value == None:
+                cls.misses += 1
+                return None
+            cls.entries.move_to_end(key)
+            cls.hits += 1
+            return value
+
+    @classmethod
+    def set(cls, key: str, value: list):
+        with cls.lock:
+            cls.entries[key] = value
+            cls.entries.move_to_end(key)
+            cls._evict()
+
+    @classmethod
+    def _evict(cls):
+        # the caller holds cls.lock
+        while len(cls.entries) > cls.max_entries:
+            cls.entries.popitem(last=False)
+
+    @classmethod
+    def clear(cls):
+        with cls.lock:
+            cls.entries.clear()
+            cls.hits = 0
+            cls.misses = 0
+
+    @classmethod
+    def save(cls, filepath: str = ""):
+        """
+        Saves the memoised results to 'filepath' (or cls.filepath). Does nothing if neither is set.
+        """
+        if filepath == "":
+            filepath = cls.filepath
+        if filepath == "":
+            return
+        with cls.lock:
+            entries = dict(cls.entries)
+        if os.path.dirname(filepath) != "":
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "w") as f:
+            json.dump({"timestamp": Timer.get_current_time(), "entries": entries}, f)
+        logger.info(f"Saved {len(entries)} statistical test results to {filepath} (hits: {cls.hits}, misses: {cls.misses}).")
+
+class StatisticsUtil:
+    """
+    Vectorised implementations of the statistical tests used by the scoring algorithms (see Metrics.py). Each test is computed
+    for many inputs at once (one element of the input arrays per test), instead of calling scipy.stats for every single test.
+    """
+    FISHER_RELATIVE_TOLERANCE = 1e-14 # relative tolerance of the pmf comparison of the two-sided Fisher exact test (the same as in scipy.stats.fisher_exact)
+    FISHER_FAST_PMF_TOLERANCE = 1e-8 # pmf comparisons closer than this (relative) are recomputed with scipy's hypergeom.pmf (see _fisher_two_sided)
+
+    @classmethod
+    def fisher_exact(cls, a, b, c, d, alternative: str = "two-sided", use_cache: bool = True):
+        """
+        Computes the Fisher exact test for all 2x2 contingency tables [[a, b], [c, d]] at once. The results match scipy.stats.fisher_exact
+        for each table: the p-values are computed from the hypergeometric distribution of 'a' given the row and column sums of the table.
+
+        Parameters:
+          - (array-like) a, b, c, d: the (non-negative) elements of the contingency tables; the i-th table is [[a[i], b[i]], [c[i], d[i]]]
+          - (str) alternative: 'two-sided', 'less' or 'greater'
+          - (bool) use_cache: if True, each distinct table is tested only once and the results are memoised in StatisticsCache
+
+        Returns:
+          - (np.ndarray) odds_ratios: the sample odds ratios a*d / (b*c) (inf if b*c == 0, nan if any row or column sum of the table is 0)
+          - (np.ndarray) pvalues: the p-values of the tests (1.0 if any row or column sum of the table is 0)
+        """
+        if use_cache == False:
+            return cls._fisher_exact(a, b, c, d, alternative=alternative)
+        
+        tables = list(zip(*(np.atleast_1d(np.asarray(x, dtype=np.int64)).tolist() for x in (a, b, c, d))))
+        results = {} # table -> (odds ratio, pvalue)
+        missing_tables = []
+        for table in tables:
+            if table in results:
+                continue
+            cached = StatisticsCache.get(StatisticsCache.make_key("fisher_exact", alternative, *table))
+            if cached != None:
+                results[table] = cached
+            else:
+                results[table] = None
+                missing_tables.append(table)
+        
+        if missing_tables != []:
+            missing_a, missing_b, missing_c, missing_d = (np.array(x, dtype=np.int64) for x in zip(*missing_tables))
+            odds_ratios, pvalues = cls._fisher_exact(missing_a, missing_b, missing_c, missing_d, alternative=alternative)
+            for table, odds_ratio, pvalue in zip(missing_tables, odds_ratios.tolist(), pvalues.tolist()):
+                results[table] = [odds_ratio, pvalue]
+                StatisticsCache.set(StatisticsCache.make_key("fisher_exact", alternative, *table), [odds_ratio, pvalue])
+        
+        odds_ratios = np.array([results[table][0] for table in tables], dtype=float)
+        pvalues = np.array([results[table][1] for table in tables], dtype=float)
+        return odds_ratios, pvalues
+
+    @classmethod
+    def _fisher_exact(cls, a, b, c, d, alternative: str = "two-sided"):
+        """
+        The (uncached) implementation of fisher_exact.
+        """
+        a = np.atleast_1d(np.asarray(a, dtype=np.int64))
+        b = np.atleast_1d(np.asarray(b, dtype=np.int64))
+        c = np.atleast_1d(np.asarray(c, dtype=np.int64))
+        d = np.atleast_1d(np.asarray(d, dtype=np.int64))
+        if np.any(a < 0) or np.any(b < 0) or np.any(c < 0) or np.any(d < 0):
+            raise ValueError("All values in the contingency tables must be non-negative.")
+
+        row_1 = a + b # number of 'successes' in the hypergeometric distribution
+        row_2 = c + d
+        column_1 = a + c # number of draws
+        total = row_1 + row_2
+
+        odds_ratios = np.full(a.shape, np.inf)
+        finite = (b > 0) & (c > 0)
+        odds_ratios[finite] = (a[finite].astype(float) * d[finite]) / (b[finite].astype(float) * c[finite])
+        degenerate = (row_1 == 0) | (row_2 == 0) | (column_1 == 0) | (b + d == 0)
+        odds_ratios[degenerate] = np.nan
+
+        pvalues = np.ones(a.shape)
+        valid = ~degenerate
+        if alternative == "less":
+            pvalues[valid] = hypergeom.cdf(a[valid], total[valid], row_1[valid], column_1[valid])
+        elif alternative == "greater":
+            pvalues[valid] = hypergeom.sf(a[valid] - 1, total[valid], row_1[valid], column_1[valid])
+        elif alternative == "two-sided":
+            pvalues[valid] = cls._fisher_two_sided(a[valid], total[valid], row_1[valid], column_1[valid])
+        else:
+            raise ValueError(f"alternative should be one of 'two-sided', 'less' or 'greater', but is {alternative}")
+        return odds_ratios, np.minimum(pvalues, 1.0)
+
+    @classmethod
+    def fisher_required_a(cls, a, b, c, d, pvalues, significance: float = 0.05, use_cache: bool = True):
+        """
+        For each contingency table [[a, b], [c, d]] with the (two-sided Fisher exact) p-value above 'significance', finds the smallest a' > a for which the table
+        [[a', b-(a'-a)], [c-(a'-a), d+(a'-a)]] has a p-value of at most 'significance'. Such a shift of the table keeps all of its row and column sums, therefore all of the shifted
+        tables belong to the same hypergeometric distribution as the original table:
+          - left of the mode, the p-value increases with a' (the search is abandoned after the first step, -1 is returned)
+          - right of the mode, the p-value decreases monotonically with a', so a' is found with a vectorised bisection over [a+1, a+min(b, c)] (the tables with non-negative elements),
+            instead of testing every a' one by one
+
+        Parameters:
+          - (array-like) a, b, c, d: the (non-negative) elements of the contingency tables
+          - (array-like) pvalues: the two-sided Fisher exact p-values of the tables (see fisher_exact)
+          - (float) significance: the target p-value
+          - (bool) use_cache: if True, the p-values of the shifted tables are memoised in StatisticsCache (see fisher_exact)
+
+        Returns:
+          - (np.ndarray) required_a: the smallest a' for each table; a for tables which are already significant, -1 if there is no such a' (or if the p-value increases when a is incremented)
+        """
+        a = np.atleast_1d(np.asarray(a, dtype=np.int64))
+        b = np.atleast_1d(np.asarray(b, dtype=np.int64))
+        c = np.atleast_1d(np.asarray(c, dtype=np.int64))
+        d = np.atleast_1d(np.asarray(d, dtype=np.int64))
+        pvalues = np.atleast_1d(np.asarray(pvalues, dtype=float))
+
+        def _shifted_pvalues(positions: np.ndarray, new_a: np.ndarray) -> np.ndarray:
+            shift = new_a - a[positions]
+            _, shifted_pvalues = cls.fisher_exact(new_a, b[positions] - shift, c[positions] - shift, d[positions] + shift, use_cache=use_cache)
+            return shifted_pvalues
+
+        required_a = np.where(pvalues > significance, -1, a)
+        positions = np.flatnonzero((pvalues > significance) & (np.minimum(b, c) > 0)) # if b or c is 0, a can't be incremented without a negative table element
+        if positions.size == 0:
+            return required_a
+
+        # first step: a+1
+        first_pvalues = _shifted_pvalues(positions, a[positions] + 1)
+        increased = first_pvalues > pvalues[positions]
+        if np.any(increased):
+            logger.debug(f"The p-value increases with num_goterms_product_process for {np.count_nonzero(increased)} contingency tables, these are left at -1.")
+        significant = ~increased & (first_pvalues <= significance)
+        required_a[positions[significant]] = a[positions[significant]] + 1
+        positions = positions[~increased & ~significant]
+        if positions.size == 0:
+            return required_a
+
+        # the last table with non-negative elements is the most significant one
+        lo = a[positions] + 1 # p-value > significance
+        hi = a[positions] + np.minimum(b[positions], c[positions]) # p-value <= significance
+        reachable = _shifted_pvalues(positions, hi) <= significance
+        positions, lo, hi = positions[reachable], lo[reachable], hi[reachable]
+
+        active = hi - lo > 1
+        while np.any(active):
+            mid = (lo + hi) // 2
+            mid_significant = np.zeros(mid.shape, dtype=bool)
+            mid_significant[active] = _shifted_pvalues(positions[active], mid[active]) <= significance
+            move_hi = active & mid_significant
+            move_lo = active & ~mid_significant
+            hi[move_hi] = mid[move_hi]
+            lo[move_lo] = mid[move_lo]
+            active = hi - lo > 1
+        required_a[positions] = hi
+        return required_a
+
+    @classmethod
+    def binomtest(cls, k: int, n: int, p: float, alternative: str = "greater", use_cache: bool = True) -> float:
+        """
+        Returns the p-value of the binomial test (scipy.stats.binomtest) of 'k' successes in 'n' trials with the success probability 'p'.
+        If use_cache is True, the p-value is memoised in StatisticsCache.
+        """
+        if use_cache == False:
+            return float(binomtest(k, n, p, alternative=alternative).pvalue)
+        key = StatisticsCache.make_key("binomtest", alternative, k, n, repr(float(p)))
+        cached = StatisticsCache.get(key)
+        if cached != None:
+            return cached[0]
+        pvalue = float(binomtest(k, n, p, alternative=alternative).pvalue)
+        StatisticsCache.set(key, [pvalue])
+        return pvalue
+
+    @classmethod
+    def binomtest_all(cls, k, n, p, alternative: str = "greater", use_cache: bool = True) -> np.ndarray:
+        """
+        Computes the binomial tests of 'k[i]' successes in 'n[i]' trials with the success probability 'p[i]' at once. The p-values match scipy.stats.binomtest:
+        the one-sided p-values are computed from the binomial survival function (alternative 'greater') or cdf (alternative 'less') for all tests at once, while
+        the two-sided p-values are computed with scipy.stats.binomtest for each test.
+
+        Parameters:
+          - (array-like) k, n: the numbers of successes and trials
+          - (array-like) p: the success probabilities
+          - (str) alternative: 'greater', 'less' or 'two-sided'
+          - (bool) use_cache: if True, each distinct test is computed only once and the p-values are memoised in StatisticsCache (shared with binomtest)
+
+        Returns:
+          - (np.ndarray) pvalues: the p-values of the tests (1.0 if there are no trials, ie. n[i] == 0)
+        """
+        k = np.atleast_1d(np.asarray(k, dtype=np.int64))
+        n = np.atleast_1d(np.asarray(n, dtype=np.int64))
+        p = np.atleast_1d(np.asarray(p, dtype=float))
+        if use_cache == False:
+            return cls._binomtest_all(k, n, p, alternative=alternative)
+
+        tests = list(zip(k.tolist(), n.tolist(), (repr(value) for value in p.tolist())))
+        results = {} # (k, n, repr(p)) -> pvalue
+        missing_positions = []
+        for position, test in enumerate(tests):
+            if test in results:
+                continue
+            cached = StatisticsCache.get(StatisticsCache.make_key("binomtest", alternative, *test))
+            if cached != None:
+                results[test] = cached[0]
+            else:
+                results[test] = None
+                missing_positions.append(position)
+
+        if missing_positions != []:
+            missing_positions = np.array(missing_positions)
+            pvalues = cls._binomtest_all(k[missing_positions], n[missing_positions], p[missing_positions], alternative=alternative)
+            for position, pvalue in zip(missing_positions.tolist(), pvalues.tolist()):
+                results[tests[position]] = pvalue
+                StatisticsCache.set(StatisticsCache.make_key("binomtest", alternative, *tests[position]), [pvalue])
+
+        return np.array([results[test] for test in tests], dtype=float)
+
+    @classmethod
+    def _binomtest_all(cls, k: np.ndarray, n: np.ndarray, p: np.ndarray, alternative: str = "greater") -> np.ndarray:
+        """
+        The (uncached) implementation of binomtest_all.
+        """
+        pvalues = np.ones(k.shape)
+        valid = n > 0 # bugfix: scipy.stats.binomtest raises a ValueError for n == 0 (eg. a process without GO Terms)
+        if alternative == "greater":
+            pvalues[valid] = binom.sf(k[valid] - 1, n[valid], p[valid])
+        elif alternative == "less":
+            pvalues[valid] = binom.cdf(k[valid], n[valid], p[valid])
+        elif alternative == "two-sided":
+            pvalues[valid] = [binomtest(int(k_i), int(n_i), float(p_i), alternative=alternative).pvalue for k_i, n_i, p_i in zip(k[valid], n[valid], p[valid])]
+        else:
+            raise ValueError(f"alternative should be one of 'two-sided', 'less' or 'greater', but is {alternative}")
+        return np.minimum(pvalues, 1.0)
+
+    @classmethod
+    def _fisher_two_sided(cls, x: np.ndarray, total: np.ndarray, successes: np.ndarray, draws: np.ndarray, exact: bool = False) -> np.ndarray:
+        """
+        Two-sided Fisher exact p-values: the sum of the probabilities of all outcomes, which are at most as probable as the observed outcome 'x'.
+        The hypergeometric distribution is unimodal, so one tail is the cdf (or sf) of 'x', while the boundary of the other tail (on the other side of the mode)
+        is found with a vectorised bisection.
+
+        If 'exact' is False, the probabilities of the outcomes are compared using the fast _hypergeom_pmf. The tables, in which any of the compared probabilities are closer
+        than FISHER_FAST_PMF_TOLERANCE (where the fast comparison could differ from scipy's), are then recomputed with scipy's hypergeom.pmf (exact = True).
+        """
+        pvalues = np.ones(x.shape)
+        if x.size == 0:
+            return pvalues
+
+        pmf = hypergeom.pmf if exact == True else cls._hypergeom_pmf
+        epsilon = cls.FISHER_RELATIVE_TOLERANCE
+        tolerance = cls.FISHER_FAST_PMF_TOLERANCE
+        mode = ((draws + 1) * (successes + 1)) // (total + 2)
+        pexact = pmf(x, total, successes, draws)
+        pmode = pmf(mode, total, successes, draws)
+        threshold = pexact * (1 + epsilon)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative_difference = np.abs(pexact - pmode) / np.maximum(pexact, pmode)
+        at_mode = relative_difference <= epsilon # the observed outcome is the most probable outcome -> p = 1
+        ambiguous = (x != mode) & (relative_difference <= tolerance)
+
+        def _close_to_threshold(outcomes, end, positions):
+            # whether the probabilities of the outcomes (and of the next outcomes) are too close to the threshold to be compared with the fast pmf
+            close = np.zeros(outcomes.shape, dtype=bool)
+            for outcome in (outcomes, np.minimum(outcomes + 1, end)):
+                close |= np.abs(pmf(outcome, total[positions], successes[positions], draws[positions]) - threshold[positions]) <= tolerance * threshold[positions]
+            return close
+
+        # the observed outcome is left of the mode: the other tail is right of the mode
+        lower = ~at_mode & (x < mode)
+        if np.any(lower):
+            plower = hypergeom.cdf(x[lower], total[lower], successes[lower], draws[lower])
+            # the last outcome in [mode, draws], which is more probable than the observed outcome
+            boundary = cls._bisect_pmf(mode[lower], draws[lower], total[lower], successes[lower], draws[lower], threshold[lower], lo_above_threshold=True, pmf=pmf)
+            pvalues[lower] = plower + hypergeom.sf(boundary, total[lower], successes[lower], draws[lower])
+            if exact == False:
+                ambiguous[lower] |= _close_to_threshold(boundary, draws[lower], lower)
+
+        # the observed outcome is right of the mode: the other tail is left of the mode
+        upper = ~at_mode & (x >= mode)
+        if np.any(upper):
+            pupper = hypergeom.sf(x[upper] - 1, total[upper], successes[upper], draws[upper])
+            # the last outcome in [0, mode], which is at most as probable as the observed outcome (-1 if there is none)
+            lo = np.zeros(np.count_nonzero(upper), dtype=np.int64)
+            boundary = cls._bisect_pmf(lo, mode[upper], total[upper], successes[upper], draws[upper], threshold[upper], lo_above_threshold=False, pmf=pmf)
+            pmf_lo = pmf(lo, total[upper], successes[upper], draws[upper])
+            if exact == False:
+                ambiguous[upper] |= _close_to_threshold(boundary, mode[upper], upper) | _close_to_threshold(lo, lo, upper)
+            boundary = np.where(pmf_lo > threshold[upper], -1, boundary)
+            pvalues[upper] = pupper + hypergeom.cdf(boundary, total[upper], successes[upper], draws[upper])
+
+        if exact == False and np.any(ambiguous):
+            pvalues[ambiguous] = cls._fisher_two_sided(x[ambiguous], total[ambiguous], successes[ambiguous], draws[ambiguous], exact=True)
+        return np.minimum(pvalues, 1.0)
+
+    @classmethod
+    def _bisect_pmf(cls, lo: np.ndarray, hi: np.ndarray, total: np.ndarray, successes: np.ndarray, draws: np.ndarray, threshold: np.ndarray, lo_above_threshold: bool, pmf=hypergeom.pmf) -> np.ndarray:
+        """
+        Vectorised bisection over a monotonic part [lo, hi] of the hypergeometric pmf. Returns the last outcome in [lo, hi], on the same side of the threshold as 'lo'
+        (pmf > threshold if lo_above_threshold, else pmf <= threshold). If 'hi' is also on the side of 'lo', 'hi' is returned.
+        """
+        lo = lo.copy()
+        hi = hi.copy()
+        pmf_hi = pmf(hi, total, successes, draws)
+        hi_same_side = (pmf_hi > threshold) == lo_above_threshold
+        lo[hi_same_side] = hi[hi_same_side]
+
+        active = hi - lo > 1
+        while np.any(active):
+            mid = (lo + hi) // 2
+            mid_above_threshold = pmf(mid, total, successes, draws) > threshold
+            move_lo = active & (mid_above_threshold == lo_above_threshold)
+            move_hi = active & ~move_lo
+            lo[move_lo] = mid[move_lo]
+            hi[move_hi] = mid[move_hi]
+            active = hi - lo > 1
+        return lo
+
+    @classmethod
+    def _hypergeom_pmf(cls, x: np.ndarray, total: np.ndarray, successes: np.ndarray, draws: np.ndarray) -> np.ndarray:
+        """
+        The hypergeometric pmf computed from the logarithms of the binomial coefficients (relative error of about 1e-10). It is used instead of scipy's hypergeom.pmf
+        (which is more accurate, but a lot slower) in _fisher_two_sided.
+        """
+        def _log_binomial(n, k):
+            return gammaln(n + 1) - gammaln(k + 1) - gammaln(n - k + 1)
+        x = np.asarray(x, dtype=float)
+        total = np.asarray(total, dtype=float)
+        successes = np.asarray(successes, dtype=float)
+        draws = np.asarray(draws, dtype=float)
+        in_support = (x >= np.maximum(0, draws - (total - successes))) & (x <= np.minimum(successes, draws))
+        with np.errstate(invalid="ignore"):
+            pmf = np.exp(_log_binomial(successes, x) + _log_binomial(total - successes, draws - x) - _log_binomial(total, draws))
+        return np.where(in_support, pmf, 0.0)
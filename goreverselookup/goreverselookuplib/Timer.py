@@ -49,6 +49,15 @@ class Timer:
         formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
         return formatted_time
     
+    @classmethod
+    def get_past_time(cls, days:float):
+        """
+        Gets the time 'days' days before the current time and returns it in the format "%Y-%m-%d %H:%M:%S".
+        Timestamps in this format can be compared as strings, eg. timestamp < Timer.get_past_time(30) is True for timestamps older than 30 days.
+        """
+        past_time = datetime.now() - timedelta(days=days)
+        return past_time.strftime("%Y-%m-%d %H:%M:%S")
+    
     @classmethod
     def compare_time(cls, timestamp_one:str, timestamp_two:str) -> bool:
         """
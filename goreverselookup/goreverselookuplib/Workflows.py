@@ -2,6 +2,7 @@ from .Model import ReverseLookup
 from .Metrics import Metrics, adv_product_score, nterms, fisher_exact_test, binomial_test, basic_mirna_score
 from .Report import ReportGenerator
 from .AnnotationProcessor import GOAnnotiationsFile
+from .CachePrewarmer import CachePrewarmer
 import os
 
 class WorkflowChecker:
@@ -56,6 +57,7 @@ class Workflow:
         self.computed_scores = {} # a dictionary between Metrics: (Metrics) aka metrics class - metrics instance of computed scores, computed scores are saved here from self.scores and cannot be deleted.
         self.scores = [] # a list of scoring algorithms, temporary, can be deleted
         self.goaf = GOAnnotiationsFile(go_categories=self.model.go_categories) # self.model.go_categories to ensure that model is initialised !!!
+        self.model.async_runtime.goaf = self.goaf # share the goaf with the async stages of the model, so that it isn't read again
         
         self.input_file_fpath = input_file_fpath
         self.save_folder_dir = save_folder_dir
@@ -110,7 +112,7 @@ class Workflow:
         # instantiate all Metrics scoring algorithms on the current model state
         for scoring_class in scoring_classes:
             scoring_instance = None
-            if isinstance(scoring_class, fisher_exact_test) or isinstance(scoring_class, binomial_test):
+            if scoring_class in (fisher_exact_test, binomial_test): # bugfix: scoring_classes are classes, not instances (isinstance was always False)
                 scoring_instance = scoring_class(self.model, self.goaf)
             else: # if adv_product_score or nterms
                 try:
@@ -185,9 +187,14 @@ class Workflow:
     def run_workflow(self):
         """
         Sequentially runs the functions specified in self.execution_sequence.
+        All async functions of the model share the model's AsyncRuntime (event loop, pooled client session and api instances), which is closed after the workflow.
         """
-        for function, args, kwargs in self.execution_sequence:
-            function(*args, **kwargs)
+        try:
+            for function, args, kwargs in self.execution_sequence:
+                function(*args, **kwargs)
+        finally:
+            # close the pooled connections of the async stages
+            self.model.async_runtime.close()
     
 class WorkflowOne(Workflow):
     def __init__(self, input_file_fpath: str, save_folder_dir: str, model: ReverseLookup = None, name: str = "", debug: bool = False):
@@ -227,9 +234,19 @@ class WorkflowOne(Workflow):
         self.add_function(self.generate_report, product_scoring_algorithm = adv_product_score, miRNA_scoring_algorithm = basic_mirna_score)
 
 class WorkflowTwo(Workflow):
-    def __init__(self, input_file_fpath: str = "", save_folder_dir: str = "", model: ReverseLookup = None, name: str = "", debug: bool = False):
+    STATISTICAL_TESTS = {"fisher_test": fisher_exact_test, "binomial_test": binomial_test} # the statistical tests (scoring engines), which can be used for the statistical analysis of products
+
+    def __init__(self, input_file_fpath: str = "", save_folder_dir: str = "", model: ReverseLookup = None, name: str = "", debug: bool = False, statistical_test: str = "fisher_test"):
+        """
+        Parameters (besides the parameters of Workflow):
+          - (str) statistical_test: the statistical test, the results of which are used for the statistical analysis of the products (see ReverseLookup.perform_statistical_analysis).
+                                    Either 'fisher_test' (fisher_exact_test) or 'binomial_test' (binomial_test). Only the chosen test is scored (besides adv_product_score and nterms).
+        """
         # constructor chooses appropriate method to initialise the Model based on supplied parameters. A ReverseLookup 'model' instance takes precedence over input_file_fpath.
         super().__init__(input_file_fpath, save_folder_dir, model, name)
+        if statistical_test not in self.STATISTICAL_TESTS:
+            raise ValueError(f"statistical_test should be one of {list(self.STATISTICAL_TESTS.keys())}, but is {statistical_test}")
+        self.statistical_test = statistical_test
         self.create_workflow(debug=debug)
     
     def create_workflow(self, debug:bool = False, fetch_mirna = False):
@@ -249,7 +266,7 @@ class WorkflowTwo(Workflow):
         self.add_function(self.model.save_model, self.model_save_filepath)
 
         # Score products with the scores supplied in scoring_classes
-        self.add_function(self.perform_scoring, scoring_classes=[adv_product_score, nterms, binomial_test, fisher_exact_test])
+        self.add_function(self.perform_scoring, scoring_classes=[adv_product_score, nterms, self.STATISTICAL_TESTS[self.statistical_test]])
         self.add_function(self.model.save_model, self.model_save_filepath)
 
         # Pull mRNA, perform mRNA-miRNA scoring 
@@ -265,11 +282,24 @@ class WorkflowTwo(Workflow):
             self.add_function(self.model.save_model, self.model_save_filepath)
         
         # Perform statistical analysis of relevant products according to the chosen statistical test score
-        # TODO: allow the user to choose which statistical test to use
-        self.add_function(self.model.perform_statistical_analysis, test_name="fisher_test", filepath=self.model_statistically_relevant_products_filepath)
+        self.add_function(self.model.perform_statistical_analysis, test_name=self.statistical_test, filepath=self.model_statistically_relevant_products_filepath)
 
         # TODO: generate report
         
 
             
         
+
+class WorkflowPrewarm(Workflow):
+    def __init__(self, input_file_fpath: str = "", save_folder_dir: str = "", model: ReverseLookup = None, name: str = "", default_request_time: float = 0.5):
+        """
+        Fills the cache with the requests of a (WorkflowTwo) run of the input file, eg. overnight, so that the following runs are served from the cache.
+        The predicted requests are diffed against the cache and only the missing ones are fetched (see CachePrewarmer). The model isn't saved,
+        the prewarm report is saved to CachePrewarmer.REPORT_FILEPATH.
+        """
+        super().__init__(input_file_fpath, save_folder_dir, model, name)
+        self.prewarmer = CachePrewarmer(self.model, default_request_time=default_request_time)
+        self.create_workflow()
+
+    def create_workflow(self):
+        self.add_function(self.prewarmer.run)
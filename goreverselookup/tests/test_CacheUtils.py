@@ -0,0 +1,470 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from goreverselookuplib.CacheUtils import Cacher, CacheBackend, CacheStatistics, CacheWriter, FileLock, JsonCacheBackend, SqliteCacheBackend
+from goreverselookuplib.Timer import Timer
+
+class CacherTestCase(unittest.TestCase):
+    """
+    Runs each test in a temporary working directory (Cacher.init uses the relative cache/ filepaths). The class state of Cacher is restored after each test.
+    NOTE: JsonUtil resolves relative filepaths with a backwards folder search (which would find the cache files of the repository), therefore the
+    json backend of the tests is created with absolute filepaths (see create_json_backend) instead of Cacher.init(backend="json").
+    """
+    CACHER_STATE = ["backend", "writer", "store_data_atexit", "read_only", "ttls", "max_size", "negative_ttl", "statistics", "_dirty_locations",
+                    "cached_urls", "cached_uniprot", "cached_ensembl", "cached_geneontology"]
+
+    def setUp(self):
+        self._cacher_state = {name: getattr(Cacher, name) for name in self.CACHER_STATE}
+        Cacher.backend = None
+        Cacher.writer = None
+        Cacher.statistics = CacheStatistics()
+        self._previous_cwd = os.getcwd()
+        self._temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self._temp_dir.name)
+        self.cache_dir = os.path.join(self._temp_dir.name, "cache")
+
+    def create_json_backend(self, read_only:bool = False, load_callback = None) -> JsonCacheBackend:
+        json_filepaths = {data_location: os.path.join(self.cache_dir, f"{data_location}_cache.json") for data_location in Cacher.DATA_LOCATIONS}
+        return JsonCacheBackend(json_filepaths, meta_filepath=os.path.join(self.cache_dir, "cache_meta.json"), read_only=read_only, load_callback=load_callback)
+
+    def tearDown(self):
+        if Cacher.writer != None:
+            Cacher.writer.stop()
+        if Cacher.backend != None:
+            Cacher.backend.close()
+        os.chdir(self._previous_cwd)
+        self._temp_dir.cleanup()
+        for name, value in self._cacher_state.items():
+            setattr(Cacher, name, value)
+
+class TestCacheKeys(CacherTestCase):
+    """
+    Cacher.canonical_url, canonical_key and _migrate_keys_once rewrite the stored cache keys, which can't be undone.
+    """
+    def test_canonical_url(self):
+        cases = [
+            # (url, canonical url)
+            # Ensembl ';' separated query params are treated as '&' separated, the params are sorted
+            ("https://rest.ensembl.org/lookup/symbol/mouse/MGI:95537?mane=1;expand=1", "https://rest.ensembl.org/lookup/symbol/mouse/MGI:95537?expand=1&mane=1"),
+            # %3A == :
+            ("https://rest.ensembl.org/lookup/symbol/mouse/MGI%3A95537?expand=1&mane=1", "https://rest.ensembl.org/lookup/symbol/mouse/MGI:95537?expand=1&mane=1"),
+            ("http://api.geneontology.org/api/bioentity/function/GO%3A0001525/genes?rows=10000", "http://api.geneontology.org/api/bioentity/function/GO:0001525/genes?rows=10000"),
+            # default ports, uppercase scheme and host
+            ("HTTPS://Rest.Ensembl.org:443/lookup/id/ENSG00000100191?mane=1", "https://rest.ensembl.org/lookup/id/ENSG00000100191?mane=1"),
+            ("http://api.geneontology.org:80/api/ontology/term/GO:0001525", "http://api.geneontology.org/api/ontology/term/GO:0001525"),
+            # non-default ports are kept
+            ("https://localhost:8443/lookup/id/ENSG00000100191", "https://localhost:8443/lookup/id/ENSG00000100191"),
+            # trailing dot of the host
+            ("https://rest.ensembl.org./lookup/id/ENSG00000100191?mane=1", "https://rest.ensembl.org/lookup/id/ENSG00000100191?mane=1"),
+            # param order, '+' == '%20'
+            ("https://rest.uniprot.org/uniprotkb/search?query=Q9NY91+AND+organism_id:9606&format=json", "https://rest.uniprot.org/uniprotkb/search?format=json&query=Q9NY91%20AND%20organism_id:9606"),
+            ("https://rest.uniprot.org/uniprotkb/search?format=json&query=Q9NY91%20AND%20organism_id%3A9606", "https://rest.uniprot.org/uniprotkb/search?format=json&query=Q9NY91%20AND%20organism_id:9606"),
+            # empty query and fragment
+            ("https://rest.ensembl.org/lookup/id/ENSG00000100191?", "https://rest.ensembl.org/lookup/id/ENSG00000100191"),
+            ("https://rest.ensembl.org/lookup/id/ENSG00000100191#top", "https://rest.ensembl.org/lookup/id/ENSG00000100191"),
+        ]
+        for url, expected in cases:
+            with self.subTest(url=url):
+                self.assertEqual(Cacher.canonical_url(url), expected)
+                self.assertEqual(Cacher.canonical_url(expected), expected) # canonical urls are stable
+
+    def test_canonical_key(self):
+        cases = [
+            # (data_location, data_key, canonical key)
+            ("ensembl", "[C][f_async][b=1][a=2]", "[C][f][a=2][b=1]"),
+            ("ensembl", "[EnsemblAPI][get_human_ortholog_async][id=MGI:95537]", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]"),
+            ("go", "[GOApi][fetch_products_async_v3][term_id=GO:0001525]", "[GOApi][fetch_products][term_id=GO:0001525]"),
+            ("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=Q9NY91]", "[UniProtAPI][get_uniprot_info][uniprot_id=Q9NY91]"),
+            ("ensembl", "not a function key", "not a function key"),
+            ("url", "https://rest.ensembl.org/lookup/id/ENSG00000100191?mane=1;expand=1", "https://rest.ensembl.org/lookup/id/ENSG00000100191?expand=1&mane=1"),
+        ]
+        for data_location, data_key, expected in cases:
+            with self.subTest(data_key=data_key):
+                self.assertEqual(Cacher.canonical_key(data_location, data_key), expected)
+        self.assertEqual(Cacher.function_key("C", "f_async", b=1, a=2), "[C][f][a=2][b=1]")
+
+    def test_migrate_keys_merge(self):
+        """
+        When several stored keys have the same canonical key, an answer beats a negative entry, and otherwise the newer entry beats the older one.
+        """
+        cases = [
+            # (entry stored under the canonical key, entry stored under the old key, the expected data_value after the migration)
+            ({"data_value": "old", "timestamp": "2023-08-01 10:00:00"}, {"data_value": "new", "timestamp": "2023-09-01 10:00:00"}, "new"), # newer beats older
+            ({"data_value": "new", "timestamp": "2023-09-01 10:00:00"}, {"data_value": "old", "timestamp": "2023-08-01 10:00:00"}, "new"),
+            ({"data_value": None, "timestamp": "2023-09-01 10:00:00", "entry_type": "negative"}, {"data_value": "answer", "timestamp": "2023-08-01 10:00:00"}, "answer"), # answer beats negative
+            ({"data_value": "answer", "timestamp": "2023-08-01 10:00:00"}, {"data_value": None, "timestamp": "2023-09-01 10:00:00", "entry_type": "negative"}, "answer"),
+        ]
+        for i, (canonical_entry, old_entry, expected_value) in enumerate(cases):
+            with self.subTest(canonical_entry=canonical_entry, old_entry=old_entry):
+                backend = SqliteCacheBackend(filepath=f"cache/cache_{i}.sqlite3")
+                Cacher.backend = backend
+                backend.set("ensembl", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]", canonical_entry)
+                backend.set("ensembl", "[EnsemblAPI][get_human_ortholog_async][id=MGI:95537]", old_entry)
+                backend.set("url", "https://rest.ensembl.org/lookup/id/ENSG00000100191?mane=1;expand=1", {"data_value": {"id": "ENSG00000100191"}, "timestamp": "2023-08-01 10:00:00"})
+                Cacher._migrate_keys_once()
+                self.assertEqual(sorted(backend.keys("ensembl")), ["[EnsemblAPI][get_human_ortholog][id=MGI:95537]"])
+                self.assertEqual(backend.get("ensembl", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]")["data_value"], expected_value)
+                self.assertEqual(backend.keys("url"), ["https://rest.ensembl.org/lookup/id/ENSG00000100191?expand=1&mane=1"])
+                self.assertEqual(backend.get_meta("key_version"), str(Cacher.KEY_VERSION))
+                backend.close()
+
+    def test_lookup_without_record(self):
+        """
+        A lookup with record=False (the CachePrewarmer's plan) doesn't touch the entry (LRU recency) and isn't counted in the statistics.
+        """
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3")
+        Cacher.backend = backend
+        Cacher.store_data("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]", {"genename": "VEGFA"})
+        touched_keys = []
+        backend.touch = lambda data_location, data_key: touched_keys.append(data_key)
+        statistics_before = json.dumps(Cacher.statistics.to_dict(), sort_keys=True)
+
+        self.assertEqual(Cacher.lookup("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]", record=False), (Cacher.HIT, {"genename": "VEGFA"}))
+        self.assertEqual(Cacher.lookup("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=Q00000]", record=False), (Cacher.MISS, None))
+        self.assertEqual(touched_keys, [])
+        self.assertEqual(json.dumps(Cacher.statistics.to_dict(), sort_keys=True), statistics_before)
+
+        # a regular lookup still touches the entry and is counted
+        Cacher.lookup("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]")
+        self.assertEqual(touched_keys, ["[UniProtAPI][get_uniprot_info][uniprot_id=P15692]"])
+        self.assertNotEqual(json.dumps(Cacher.statistics.to_dict(), sort_keys=True), statistics_before)
+
+class TestCacheBackends(CacherTestCase):
+    """
+    SqliteCacheBackend and JsonCacheBackend: the round-trip of the entries, the json import, the expiry (ttls, max_age, negative_ttl),
+    the LRU eviction and the read-only mode.
+    """
+    def _set_entries(self, backend, num_entries:int) -> list:
+        data_keys = [f"[UniProtAPI][get_uniprot_info][uniprot_id=P{i:05d}]" for i in range(num_entries)]
+        for data_key in data_keys:
+            backend.set("uniprot", data_key, {"data_value": {"genename": "X" * 100}, "timestamp": Timer.get_current_time()})
+            time.sleep(0.002) # distinct last access times
+        return data_keys
+
+    def test_sqlite_round_trip(self):
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3")
+        backend.set("url", "https://rest.uniprot.org/uniprotkb/P15692.json", {"data_value": {"primaryAccession": "P15692"}, "timestamp": "2023-08-01 10:00:00"})
+        backend.set("ensembl", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]", {"data_value": {"reason": "not found"}, "timestamp": "2023-08-01 10:00:00", "entry_type": "negative"})
+        backend.set("ensembl", "[EnsemblAPI][get_human_ortholog][id=RGD:3774]", {"data_value": "ENSG00000112715", "timestamp": "2023-08-01 10:00:00"})
+        backend.delete("ensembl", "[EnsemblAPI][get_human_ortholog][id=RGD:3774]")
+        backend.close()
+
+        # the entries are persisted across connections
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3")
+        self.assertEqual(backend.count(), 2)
+        self.assertEqual(backend.count("ensembl"), 1)
+        self.assertEqual(backend.keys("ensembl"), ["[EnsemblAPI][get_human_ortholog][id=MGI:95537]"])
+        entry = backend.get("url", "https://rest.uniprot.org/uniprotkb/P15692.json")
+        self.assertEqual((entry["data_value"], entry["timestamp"]), ({"primaryAccession": "P15692"}, "2023-08-01 10:00:00"))
+        self.assertNotIn("entry_type", entry)
+        self.assertEqual(backend.get("ensembl", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]")["entry_type"], "negative")
+        self.assertEqual(backend.get("ensembl", "[EnsemblAPI][get_human_ortholog][id=RGD:3774]"), None)
+        backend.close()
+
+    def test_import_json_files(self):
+        os.makedirs(self.cache_dir)
+        with open(os.path.join(self.cache_dir, "url_cache.json"), "w") as f:
+            # ConnectionCacher stored the url responses as {"response": ..., "timestamp": ...}
+            json.dump({"https://rest.uniprot.org/uniprotkb/P15692.json": {"response": {"primaryAccession": "P15692"}, "timestamp": "2023-08-01 10:00:00"}}, f)
+        with open(os.path.join(self.cache_dir, "uniprot_cache.json"), "w") as f:
+            json.dump({"[UniProtAPI][get_uniprot_info][uniprot_id=P15692]": {"data_value": {"genename": "VEGFA"}, "timestamp": "2023-08-02 10:00:00"}}, f)
+        json_filepaths = {data_location: os.path.join(self.cache_dir, f"{data_location}_cache.json") for data_location in Cacher.DATA_LOCATIONS}
+
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", json_filepaths=json_filepaths)
+        self.assertEqual(backend.get("url", "https://rest.uniprot.org/uniprotkb/P15692.json")["data_value"], {"primaryAccession": "P15692"})
+        self.assertEqual(backend.get("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]")["timestamp"], "2023-08-02 10:00:00")
+        self.assertNotEqual(backend.get_meta("json_imported"), None)
+        backend.delete("url", "https://rest.uniprot.org/uniprotkb/P15692.json")
+        backend.close()
+
+        # the json files are only imported once, also after the database was emptied
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", json_filepaths=json_filepaths)
+        backend.delete("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]")
+        backend.close()
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", json_filepaths=json_filepaths)
+        self.assertEqual(backend.count(), 0)
+        backend.close()
+
+    def _init_backend(self, backend:str, **settings):
+        if backend == "sqlite":
+            Cacher.init(backend="sqlite", **settings)
+        else:
+            Cacher.ttls, Cacher.negative_ttl = settings["ttls"], settings["negative_ttl"]
+            Cacher.store_data_atexit, Cacher.read_only = True, False
+            Cacher.backend = self.create_json_backend(load_callback=Cacher._purge_expired) # as Cacher.init(backend="json")
+
+    def test_expiry(self):
+        for backend in ["sqlite", "json"]:
+            with self.subTest(backend=backend):
+                self._init_backend(backend, ttls={"url": 30}, negative_ttl=7)
+                Cacher.store_data("url", "https://example.org/old", {"id": 1}, timestamp=Timer.get_past_time(40))
+                Cacher.store_data("url", "https://example.org/recent", {"id": 2}, timestamp=Timer.get_past_time(10))
+                Cacher.store_data("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]", {"genename": "VEGFA"}, timestamp=Timer.get_past_time(400)) # no ttl
+                Cacher.store_negative("ensembl", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]", timestamp=Timer.get_past_time(10))
+                Cacher.store_negative("ensembl", "[EnsemblAPI][get_human_ortholog][id=RGD:3774]", timestamp=Timer.get_past_time(1))
+
+                self.assertEqual(Cacher.lookup("url", "https://example.org/old"), (Cacher.MISS, None)) # older than the ttl
+                self.assertEqual(Cacher.lookup("url", "https://example.org/recent"), (Cacher.HIT, {"id": 2}))
+                self.assertEqual(Cacher.lookup("url", "https://example.org/recent", max_age=5), (Cacher.MISS, None))
+                self.assertEqual(Cacher.lookup("url", "https://example.org/recent", max_age=60), (Cacher.HIT, {"id": 2})) # the ttl applies, even if max_age is larger
+                self.assertEqual(Cacher.lookup("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]"), (Cacher.HIT, {"genename": "VEGFA"}))
+                self.assertEqual(Cacher.lookup("ensembl", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]"), (Cacher.MISS, None)) # older than the negative_ttl
+                self.assertEqual(Cacher.lookup("ensembl", "[EnsemblAPI][get_human_ortholog][id=RGD:3774]"), (Cacher.NEGATIVE, None))
+                Cacher.save_data()
+
+                # the expired entries are deleted at init (the json backend deletes them when the data location is loaded)
+                self._init_backend(backend, ttls={"url": 30}, negative_ttl=7)
+                self.assertEqual(Cacher.backend.keys("url"), ["https://example.org/recent"])
+                self.assertEqual(Cacher.backend.keys("ensembl"), ["[EnsemblAPI][get_human_ortholog][id=RGD:3774]"])
+                self.assertEqual(Cacher.backend.count("uniprot"), 1)
+                Cacher.save_data()
+                Cacher.backend = None
+
+    def test_sqlite_lru_eviction(self):
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", compression_level=0) # uncompressed, all entries have the same size
+        data_keys = self._set_entries(backend, 10)
+        for data_key in data_keys[:3]:
+            backend.touch("uniprot", data_key)
+        backend.save() # writes the buffered accesses
+        max_size = backend.get_size() // 2
+
+        self.assertEqual(backend.evict(max_size), 6) # evicted down to 90% of max_size
+        self.assertEqual(sorted(backend.keys("uniprot")), data_keys[:3] + data_keys[-1:])
+        self.assertLessEqual(backend.get_size(), max_size * 0.9)
+        self.assertEqual(backend.evict(max_size), 0) # below the maximum size
+        backend.close()
+
+    def test_json_lru_eviction(self):
+        backend = self.create_json_backend()
+        data_keys = self._set_entries(backend, 10)
+        for data_key in data_keys[:3]:
+            backend.touch("uniprot", data_key)
+        max_size = backend.get_size() // 2
+
+        self.assertEqual(backend.evict(max_size), 6)
+        self.assertEqual(sorted(backend.keys("uniprot")), data_keys[:3] + data_keys[-1:])
+        backend.save()
+        # the evicted entries aren't merged back from disk on save
+        with open(os.path.join(self.cache_dir, "uniprot_cache.json")) as f:
+            self.assertEqual(sorted(json.load(f).keys()), data_keys[:3] + data_keys[-1:])
+
+    def test_read_only(self):
+        self.assertRaises(FileNotFoundError, SqliteCacheBackend, filepath="cache/cache.sqlite3", read_only=True)
+        Cacher.init(backend="sqlite")
+        Cacher.store_data("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]", {"genename": "VEGFA"})
+        Cacher.save_data()
+
+        Cacher.init(backend="sqlite", read_only=True, write_behind=True)
+        self.assertEqual(Cacher.writer, None)
+        self.assertEqual(Cacher.lookup("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]"), (Cacher.HIT, {"genename": "VEGFA"}))
+        Cacher.store_data("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=Q00000]", {"genename": "SIRT3"})
+        Cacher.store_negative("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=Q11111]")
+        self.assertEqual(Cacher.backend.count(), 1)
+        self.assertRaises(sqlite3.OperationalError, Cacher.backend.set, "uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=Q00000]", {"data_value": {}, "timestamp": Timer.get_current_time()})
+        Cacher.save_data()
+
+        # the json files aren't written in read-only mode
+        backend = self.create_json_backend(read_only=True)
+        backend.set("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=Q00000]", {"data_value": {}, "timestamp": Timer.get_current_time()})
+        backend.save()
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "uniprot_cache.json")))
+
+class TestCompression(CacherTestCase):
+    """
+    SqliteCacheBackend stores the values larger than COMPRESSION_MIN_SIZE as "zlib-v1" (zlib with the preset ZLIB_DICTIONARY), the 'encoding'
+    column records how each value is stored.
+    """
+    LARGE_VALUE = {"results": [{"id": f"GO:{i:07d}", "label": "positive regulation of angiogenesis", "category": ["biological_process"]} for i in range(20)]}
+    SMALL_VALUE = {"genename": "VEGFA"}
+
+    def _encodings(self, filepath:str) -> dict:
+        connection = sqlite3.connect(filepath)
+        encodings = dict(connection.execute("SELECT key, encoding FROM cache").fetchall())
+        connection.close()
+        return encodings
+
+    def test_encode_decode_round_trip(self):
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3")
+        stored_value, encoding = backend.encode_value(self.LARGE_VALUE)
+        self.assertEqual(encoding, "zlib-v1")
+        self.assertLess(len(stored_value), len(json.dumps(self.LARGE_VALUE, separators=(",", ":"))))
+        self.assertEqual(backend.decode_value(stored_value, encoding), self.LARGE_VALUE)
+        # the size is the size of the decoded json
+        self.assertEqual(backend.decode_value(stored_value, encoding, return_size=True), (self.LARGE_VALUE, len(json.dumps(self.LARGE_VALUE, separators=(",", ":")))))
+        stored_value, encoding = backend.encode_value(self.SMALL_VALUE) # below COMPRESSION_MIN_SIZE
+        self.assertEqual((stored_value, encoding), ('{"genename":"VEGFA"}', "json"))
+        self.assertEqual(backend.decode_value(stored_value, encoding), self.SMALL_VALUE)
+        backend.close()
+
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", compression_level=0)
+        self.assertEqual(backend.encode_value(self.LARGE_VALUE)[1], "json")
+        backend.close()
+
+    def test_read_regardless_of_compression_level(self):
+        # the entries stored uncompressed (eg. before the compression was enabled) and the compressed entries are read with any compression_level
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", compression_level=0)
+        backend.set("go", "uncompressed", {"data_value": self.LARGE_VALUE, "timestamp": Timer.get_current_time()})
+        backend.close()
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", compression_level=9)
+        backend.set("go", "compressed", {"data_value": self.LARGE_VALUE, "timestamp": Timer.get_current_time()})
+        backend.set("go", "small", {"data_value": self.SMALL_VALUE, "timestamp": Timer.get_current_time()})
+        backend.close()
+        self.assertEqual(self._encodings("cache/cache.sqlite3"), {"uncompressed": "json", "compressed": "zlib-v1", "small": "json"})
+
+        for compression_level in [0, 6]:
+            with self.subTest(compression_level=compression_level):
+                backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", compression_level=compression_level)
+                self.assertEqual(backend.get("go", "uncompressed")["data_value"], self.LARGE_VALUE)
+                self.assertEqual(backend.get("go", "compressed")["data_value"], self.LARGE_VALUE)
+                self.assertEqual(backend.get("go", "small")["data_value"], self.SMALL_VALUE)
+                backend.close()
+
+    def test_json_import_is_compressed(self):
+        os.makedirs(self.cache_dir)
+        with open(os.path.join(self.cache_dir, "go_cache.json"), "w") as f:
+            json.dump({"large": {"data_value": self.LARGE_VALUE, "timestamp": "2023-08-01 10:00:00"}, "small": {"data_value": self.SMALL_VALUE, "timestamp": "2023-08-01 10:00:00"}}, f)
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3", json_filepaths={"go": os.path.join(self.cache_dir, "go_cache.json")})
+        self.assertEqual(backend.get("go", "large")["data_value"], self.LARGE_VALUE)
+        backend.close()
+        self.assertEqual(self._encodings("cache/cache.sqlite3"), {"large": "zlib-v1", "small": "json"})
+
+def save_json_entries(filepath:str, data_keys:list, barrier):
+    """
+    A process sharing the json cache file 'filepath' (see TestJsonMerge): loads it, waits for the other processes, stores 'data_keys' and saves.
+    """
+    backend = JsonCacheBackend({"uniprot": filepath}, meta_filepath=os.path.join(os.path.dirname(filepath), "cache_meta.json"))
+    backend.count("uniprot") # loads the file before the other processes save
+    barrier.wait()
+    for data_key in data_keys:
+        backend.set("uniprot", data_key, {"data_value": {"genename": data_key}, "timestamp": Timer.get_current_time()})
+    backend.save()
+
+class TestJsonMerge(CacherTestCase):
+    """
+    JsonCacheBackend.save merges the entries stored on disk by the other processes (under a FileLock), so that processes sharing the json files
+    don't overwrite each other's entries.
+    """
+    def test_disjoint_keys_survive(self):
+        first_backend = self.create_json_backend()
+        second_backend = self.create_json_backend()
+        first_backend.count("uniprot") # both backends load the (missing) file before either of them saves
+        second_backend.count("uniprot")
+        first_backend.set("uniprot", "first", {"data_value": 1, "timestamp": "2023-08-01 10:00:00"})
+        second_backend.set("uniprot", "second", {"data_value": 2, "timestamp": "2023-08-01 10:00:00"})
+        first_backend.save()
+        second_backend.save()
+        with open(os.path.join(self.cache_dir, "uniprot_cache.json")) as f:
+            self.assertEqual(sorted(json.load(f).keys()), ["first", "second"])
+
+    def test_newer_timestamp_and_deletes(self):
+        first_backend = self.create_json_backend()
+        first_backend.set("uniprot", "shared", {"data_value": "old", "timestamp": "2023-08-01 10:00:00"})
+        first_backend.set("uniprot", "deleted", {"data_value": "deleted", "timestamp": "2023-08-01 10:00:00"})
+        first_backend.save()
+
+        second_backend = self.create_json_backend()
+        second_backend.set("uniprot", "shared", {"data_value": "new", "timestamp": "2023-09-01 10:00:00"})
+        second_backend.save()
+        first_backend.delete("uniprot", "deleted")
+        first_backend.save() # the newer entry on disk wins, the deleted entry isn't merged back
+        self.assertEqual(first_backend.get("uniprot", "shared")["data_value"], "new")
+        self.assertEqual(self.create_json_backend().keys("uniprot"), ["shared"])
+
+    def test_processes_save_concurrently(self):
+        filepath = os.path.join(self.cache_dir, "uniprot_cache.json")
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(2)
+        data_keys = [[f"process_{i}_{j}" for j in range(50)] for i in range(2)]
+        processes = [context.Process(target=save_json_entries, args=(filepath, data_keys[i], barrier)) for i in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            self.assertEqual(process.exitcode, 0)
+        with open(filepath) as f:
+            self.assertEqual(sorted(json.load(f).keys()), sorted(data_keys[0] + data_keys[1]))
+
+class TestFileLock(CacherTestCase):
+    def test_timeout(self):
+        with FileLock("cache/test.lock"):
+            start_time = time.time()
+            with self.assertRaises(TimeoutError):
+                with FileLock("cache/test.lock", timeout=0.3):
+                    pass
+            self.assertLess(time.time() - start_time, 5)
+        self.assertFalse(os.path.exists("cache/test.lock"))
+
+    def test_stale_lock_is_removed(self):
+        os.makedirs("cache")
+        open("cache/test.lock", "w").close() # left behind by a killed process
+        os.utime("cache/test.lock", (time.time() - 600, time.time() - 600))
+        with FileLock("cache/test.lock", timeout=0.3, stale_timeout=300):
+            self.assertTrue(os.path.exists("cache/test.lock"))
+        self.assertFalse(os.path.exists("cache/test.lock"))
+
+class TestCacheWriter(CacherTestCase):
+    """
+    The CacheWriter (write-behind queue) never blocks put, coalesces the writes, which don't fit into the queue, and is flushed by Cacher.save_data.
+    """
+    def test_overflow_is_coalesced(self):
+        started, release = threading.Event(), threading.Event()
+        applied = []
+        def apply_write(data_location, data_key, entry):
+            started.set()
+            release.wait(timeout=30) # the writer is stuck on the disk
+            applied.append((data_key, entry["data_value"]))
+
+        writer = CacheWriter(apply_write, CacheBackend(), max_pending=2, flush_interval=60)
+        writer.put("uniprot", "k0", {"data_value": 0})
+        self.assertTrue(started.wait(timeout=10)) # k0 is taken from the queue, the writer waits in apply_write
+        start_time = time.time()
+        for data_key, data_value in [("k1", 1), ("k2", 2), ("k3", 3), ("k3", 4), ("k4", 5), ("k3", 6)]:
+            writer.put("uniprot", data_key, {"data_value": data_value})
+        self.assertLess(time.time() - start_time, 1) # put never waits for the writer
+        self.assertEqual({data_key: entry["data_value"] for (_, data_key), entry in writer._overflow.items()}, {"k3": 6, "k4": 5}) # k1 and k2 are queued
+        # the writes, which aren't applied yet, are returned by get_pending (and Cacher.lookup)
+        self.assertEqual(writer.get_pending("uniprot", "k3")["data_value"], 6)
+        self.assertEqual(writer.get_pending("uniprot", "k1")["data_value"], 1)
+
+        release.set()
+        writer.flush()
+        self.assertEqual(applied, [("k0", 0), ("k1", 1), ("k2", 2), ("k3", 6), ("k4", 5)]) # the overflowed writes of k3 are applied once
+        self.assertEqual((writer.pending, writer._overflow), ({}, {}))
+        writer.stop()
+
+    def test_stop_applies_the_queued_writes(self):
+        applied = []
+        writer = CacheWriter(lambda data_location, data_key, entry: applied.append(data_key), CacheBackend(), max_pending=5, flush_interval=60, batch_size=2)
+        data_keys = [f"k{i}" for i in range(20)] # more writes than the queue holds: the rest overflows
+        for data_key in data_keys:
+            writer.put("uniprot", data_key, {"data_value": data_key})
+        writer.stop()
+        self.assertEqual(sorted(applied), sorted(data_keys))
+        self.assertEqual((writer.pending, writer._overflow), ({}, {}))
+
+    def test_save_data_flushes_the_queue(self):
+        Cacher.init(backend="sqlite", write_behind=True, flush_interval=60)
+        self.assertNotEqual(Cacher.writer, None)
+        Cacher.store_data("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]", {"genename": "VEGFA"})
+        Cacher.store_negative("ensembl", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]")
+        self.assertEqual(Cacher.lookup("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]"), (Cacher.HIT, {"genename": "VEGFA"}))
+        Cacher.save_data()
+        self.assertEqual((Cacher.writer, Cacher.backend), (None, None))
+
+        backend = SqliteCacheBackend(filepath="cache/cache.sqlite3")
+        self.assertEqual(backend.get("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]")["data_value"], {"genename": "VEGFA"})
+        self.assertEqual(backend.get("ensembl", "[EnsemblAPI][get_human_ortholog][id=MGI:95537]")["entry_type"], "negative")
+        backend.close()
+
+    def test_write_behind_is_off_by_default(self):
+        Cacher.init(backend="sqlite")
+        self.assertEqual(Cacher.writer, None)
+        Cacher.store_data("uniprot", "[UniProtAPI][get_uniprot_info][uniprot_id=P15692]", {"genename": "VEGFA"})
+        self.assertEqual(Cacher.backend.count("uniprot"), 1) # written immediately
+        Cacher.save_data()
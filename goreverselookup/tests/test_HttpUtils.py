@@ -0,0 +1,239 @@
+import asyncio
+import json
+import time
+import unittest
+
+from aiohttp import web, ClientSession
+from aiohttp.test_utils import TestServer
+
+from goreverselookuplib.HttpUtils import AsyncRetryPolicy, CircuitBreaker
+
+class ScriptedServerTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs a local aiohttp server, whose endpoint /{name} answers with the scripted responses of self.responses[name] in order
+    (the last response is repeated), after self.delays[name] seconds. The amount of requests of each endpoint is counted in self.request_counts.
+    """
+    async def asyncSetUp(self):
+        self.responses = {} # name -> list of (status, body, headers), body is json-encoded unless it is a str
+        self.delays = {} # name -> seconds before the response is sent
+        self.request_counts = {}
+        app = web.Application()
+        app.router.add_get("/{name}", self._handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.session = ClientSession()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.server.close()
+
+    async def _handle(self, request:web.Request) -> web.Response:
+        name = request.match_info["name"]
+        self.request_counts[name] = self.request_counts.get(name, 0) + 1
+        await asyncio.sleep(self.delays.get(name, 0))
+        scripted_responses = self.responses[name]
+        status, body, headers = scripted_responses.pop(0) if len(scripted_responses) > 1 else scripted_responses[0]
+        text = body if isinstance(body, str) or body == None else json.dumps(body)
+        return web.Response(status=status, text=text, headers=headers, content_type="application/json")
+
+    def url(self, name:str) -> str:
+        return str(self.server.make_url(f"/{name}"))
+
+class TestAsyncRetryPolicy(ScriptedServerTestCase):
+    """
+    AsyncRetryPolicy.request retries the transient errors (retry_statuses, connection errors, invalid bodies) with capped exponential backoff,
+    honours Retry-After, returns the definitive error answers without retrying and records the items, which failed after all retries.
+    """
+    async def test_retryable_status_is_retried(self):
+        self.responses["flaky"] = [(503, None, {}), (502, None, {}), (200, {"id": "P15692"}, {})]
+        retry_policy = AsyncRetryPolicy(max_retries=3, backoff_factor=0.01, jitter=0)
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("flaky"), item_id="P15692"), {"id": "P15692"})
+        self.assertEqual(self.request_counts["flaky"], 3)
+        statistics = retry_policy.statistics
+        self.assertEqual((statistics.requests, statistics.retries, statistics.successes, statistics.failures), (3, 2, 1, 0))
+        self.assertEqual(statistics.status_counts, {503: 1, 502: 1, 200: 1})
+        self.assertFalse(statistics.has_failed("P15692"))
+
+    async def test_invalid_body_is_retried(self):
+        self.responses["truncated"] = [(200, '{"id": "P156', {}), (200, {"id": "P15692"}, {})]
+        retry_policy = AsyncRetryPolicy(max_retries=1, backoff_factor=0.01, jitter=0)
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("truncated")), {"id": "P15692"})
+        self.assertEqual(retry_policy.statistics.exception_counts, {"JSONDecodeError": 1})
+
+    async def test_retry_after(self):
+        self.responses["rate_limited"] = [(429, None, {"Retry-After": "0.3"}), (200, {"id": "P15692"}, {})]
+        retry_policy = AsyncRetryPolicy(max_retries=1, backoff_factor=0.01, max_backoff=5, jitter=0)
+        start_time = time.monotonic()
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("rate_limited")), {"id": "P15692"})
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.3) # waits for Retry-After instead of the (shorter) backoff
+        self.assertFalse(retry_policy.is_circuit_open(f"{self.server.host}:{self.server.port}")) # rate limiting means the host is up
+
+        # Retry-After is capped at max_backoff
+        self.responses["rate_limited"] = [(429, None, {"Retry-After": "100"}), (200, {"id": "P15692"}, {})]
+        retry_policy = AsyncRetryPolicy(max_retries=1, backoff_factor=0.01, max_backoff=0.2, jitter=0)
+        start_time = time.monotonic()
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("rate_limited")), {"id": "P15692"})
+        self.assertLess(time.monotonic() - start_time, 5)
+
+    async def test_definitive_status_is_not_retried(self):
+        self.responses["not_found"] = [(400, {"error": "No valid lookup found for symbol Oxct2a"}, {})]
+        self.responses["no_body"] = [(404, "", {})]
+        retry_policy = AsyncRetryPolicy(max_retries=3, backoff_factor=0.01, jitter=0)
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("not_found"), item_id="Oxct2a"), {"error": "No valid lookup found for symbol Oxct2a"})
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("no_body"), item_id="Oxct2b"), None)
+        self.assertEqual((self.request_counts["not_found"], self.request_counts["no_body"]), (1, 1))
+        statistics = retry_policy.statistics
+        self.assertEqual((statistics.definitive_errors, statistics.retries, statistics.failures), (2, 0, 0))
+        self.assertEqual(statistics.failed_items, {}) # a definitive answer isn't a failure, the item isn't re-queued
+
+    async def test_failure_after_all_retries(self):
+        self.responses["down"] = [(503, None, {})]
+        retry_policy = AsyncRetryPolicy(max_retries=2, backoff_factor=0.01, jitter=0)
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("down"), item_id="P15692"), None)
+        self.assertEqual(self.request_counts["down"], 3) # max_retries + 1
+        statistics = retry_policy.statistics
+        self.assertEqual((statistics.requests, statistics.retries, statistics.failures), (3, 2, 1))
+        self.assertTrue(statistics.has_failed(["P15692", "Q00000"]))
+        self.assertIn("status = 503", statistics.failed_items["P15692"])
+        # without an item_id, the url is recorded
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("down")), None)
+        self.assertTrue(statistics.has_failed(self.url("down")))
+
+    async def test_failure_without_record_failure(self):
+        self.responses["down"] = [(503, None, {})]
+        retry_policy = AsyncRetryPolicy(max_retries=1, backoff_factor=0.01, jitter=0)
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("down"), item_id="P15692", record_failure=False), None)
+        self.assertEqual(self.request_counts["down"], 2)
+        self.assertEqual((retry_policy.statistics.failures, retry_policy.statistics.failed_items), (0, {}))
+
+class TestBackoffTime(unittest.TestCase):
+    def test_capped_exponential_backoff(self):
+        retry_policy = AsyncRetryPolicy(backoff_factor=0.5, max_backoff=3, jitter=0)
+        self.assertEqual([retry_policy.get_backoff_time(retry_number) for retry_number in range(5)], [0.5, 1, 2, 3, 3])
+
+    def test_retry_after(self):
+        retry_policy = AsyncRetryPolicy(backoff_factor=0.5, max_backoff=3, jitter=0)
+        self.assertEqual(retry_policy.get_backoff_time(0, retry_after="2.5"), 2.5)
+        self.assertEqual(retry_policy.get_backoff_time(2, retry_after="1"), 2) # the backoff is longer than Retry-After
+        self.assertEqual(retry_policy.get_backoff_time(0, retry_after="100"), 3) # capped at max_backoff
+        self.assertEqual(retry_policy.get_backoff_time(0, retry_after="Wed, 21 Oct 2026 07:28:00 GMT"), 0.5) # http dates are ignored
+
+    def test_jitter(self):
+        retry_policy = AsyncRetryPolicy(backoff_factor=1, max_backoff=10, jitter=0.5)
+        for _ in range(100):
+            backoff_time = retry_policy.get_backoff_time(1)
+            self.assertTrue(1 <= backoff_time <= 3)
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    The transitions of CircuitBreaker: closed -> open after failure_threshold consecutive failures, open -> half-open after reset_timeout
+    (a single probe request), half-open -> closed on a successful probe and half-open -> open on a failed probe.
+    """
+    def test_opens_after_consecutive_failures(self):
+        circuit_breaker = CircuitBreaker("rest.uniprot.org", failure_threshold=3, reset_timeout=60)
+        circuit_breaker.record_failure()
+        circuit_breaker.record_failure()
+        circuit_breaker.record_success() # resets the consecutive failures
+        circuit_breaker.record_failure()
+        circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(circuit_breaker.allow_request())
+        circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(circuit_breaker.is_open())
+        self.assertFalse(circuit_breaker.allow_request())
+
+    def test_half_open_probe(self):
+        for probe_succeeds in [True, False]:
+            with self.subTest(probe_succeeds=probe_succeeds):
+                circuit_breaker = CircuitBreaker("rest.uniprot.org", failure_threshold=1, reset_timeout=0.1)
+                circuit_breaker.record_failure()
+                self.assertFalse(circuit_breaker.allow_request())
+                time.sleep(0.15)
+                self.assertTrue(circuit_breaker.allow_request()) # the probe
+                self.assertEqual(circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+                self.assertTrue(circuit_breaker.is_open())
+                self.assertFalse(circuit_breaker.allow_request()) # only a single probe is in flight
+                if probe_succeeds:
+                    circuit_breaker.record_success()
+                    self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+                    self.assertTrue(circuit_breaker.allow_request())
+                else:
+                    circuit_breaker.record_failure() # opens again for another reset_timeout
+                    self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+                    self.assertFalse(circuit_breaker.allow_request())
+                    time.sleep(0.15)
+                    self.assertTrue(circuit_breaker.allow_request())
+
+    def test_release_probe(self):
+        circuit_breaker = CircuitBreaker("rest.uniprot.org", failure_threshold=1, reset_timeout=0.1)
+        circuit_breaker.release_probe() # no effect on a closed breaker
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+        circuit_breaker.record_failure()
+        time.sleep(0.15)
+        self.assertTrue(circuit_breaker.allow_request())
+        circuit_breaker.release_probe() # the probe ended without a result
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(circuit_breaker.allow_request()) # the next request is the probe
+        self.assertFalse(circuit_breaker.allow_request())
+
+    def test_lost_probe_is_replaced(self):
+        circuit_breaker = CircuitBreaker("rest.uniprot.org", failure_threshold=1, reset_timeout=0.1)
+        circuit_breaker.record_failure()
+        time.sleep(0.15)
+        self.assertTrue(circuit_breaker.allow_request())
+        self.assertFalse(circuit_breaker.allow_request())
+        time.sleep(0.15) # the probe didn't report back within reset_timeout
+        self.assertTrue(circuit_breaker.allow_request())
+
+class TestRetryPolicyCircuitBreaker(ScriptedServerTestCase):
+    """
+    AsyncRetryPolicy.request short-circuits the requests to a host with an open circuit breaker and reports the results of the requests to the breaker.
+    """
+    def host(self) -> str:
+        return f"{self.server.host}:{self.server.port}"
+
+    async def test_open_breaker_short_circuits(self):
+        self.responses["down"] = [(503, None, {})]
+        retry_policy = AsyncRetryPolicy(max_retries=1, backoff_factor=0.01, jitter=0, failure_threshold=2, reset_timeout=0.2)
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("down"), item_id="P15692"), None)
+        self.assertTrue(retry_policy.is_circuit_open(self.host()))
+
+        # the requests aren't sent while the breaker is open
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("down"), item_id="Q00000"), None)
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("down"), item_id="Q11111", record_failure=False), None)
+        self.assertEqual(self.request_counts["down"], 2)
+        self.assertEqual(retry_policy.statistics.short_circuits, 2)
+        self.assertTrue(retry_policy.statistics.has_failed("Q00000"))
+        self.assertFalse(retry_policy.statistics.has_failed("Q11111"))
+
+        # after reset_timeout, a successful probe closes the breaker
+        self.responses["down"] = [(200, {"id": "Q00000"}, {})]
+        await asyncio.sleep(0.25)
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("down"), item_id="Q00000"), {"id": "Q00000"})
+        self.assertFalse(retry_policy.is_circuit_open(self.host()))
+
+    async def test_cancelled_probe_is_released(self):
+        self.responses["down"] = [(503, None, {})]
+        retry_policy = AsyncRetryPolicy(max_retries=0, backoff_factor=0.01, jitter=0, failure_threshold=1, reset_timeout=10)
+        await retry_policy.get_json(self.session, self.url("down"))
+        circuit_breaker = retry_policy.get_circuit_breaker(self.host())
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+        circuit_breaker.opened_at -= 10 # reset_timeout has passed
+
+        # the probe is cancelled (eg. by a timeout of the caller) before the host answers
+        self.responses["slow"] = [(200, {"id": "P15692"}, {})]
+        self.delays["slow"] = 5
+        probe = asyncio.create_task(retry_policy.get_json(self.session, self.url("slow")))
+        while self.request_counts.get("slow", 0) == 0:
+            await asyncio.sleep(0.01)
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+
+        # bugfix: the cancelled probe left the breaker half-open with a probe in flight, so all further requests were short-circuited
+        self.delays["slow"] = 0
+        self.assertEqual(await retry_policy.get_json(self.session, self.url("slow")), {"id": "P15692"})
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(retry_policy.statistics.short_circuits, 0)
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from goreverselookuplib.Model import ReverseLookup, Product
+from goreverselookuplib.OboParser import OboParser
+
+def create_test_model(products, goterms = [], target_processes = []):
+    """
+    Creates a ReverseLookup model of 'products' and 'goterms' (without GO Terms by default) with an empty obo file, for the tests which don't query any data.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        obo_filepath = os.path.join(temp_dir, "go.obo")
+        open(obo_filepath, "w").close()
+        return ReverseLookup(goterms=goterms, target_processes=target_processes, products=products, obo_parser=OboParser(obo_filepath))
+
+class TestProductIndex(unittest.TestCase):
+    """
+    get_product and get_product_by use hash indexes over self.products, which have to return the same products as the former linear scan.
+    """
+    def test_identifier_changed_outside_of_model(self):
+        model = create_test_model([Product(["MGI:95537"], genename="VEGFA"), Product(["RGD:3774"]), Product(["UniProtKB:Q9NTG7"])])
+        self.assertEqual(model.get_product("VEGFA").id_synonyms, ["MGI:95537"]) # builds the indexes
+        model.products[1].genename = "SIRT3"
+        model.products[2].ensg_id = "ENSG00000142082"
+        self.assertEqual(model.get_product_by("genename", "SIRT3").id_synonyms, ["RGD:3774"])
+        self.assertEqual(model.get_product("ENSG00000142082").id_synonyms, ["UniProtKB:Q9NTG7"])
+        self.assertEqual(model.get_product("UniProtKB:Q9NTG7").uniprot_id, "UniProtKB:Q9NTG7")
+        model.products[0].genename = "VEGFB"
+        self.assertEqual(model.get_product_by("genename", "VEGFA"), None)
+        self.assertRaises(StopIteration, model.get_product, "VEGFA")
+
+    def test_first_product_in_list_order(self):
+        # "P15692" is the genename of the second product and the uniprot_id of the first product -> the first product is returned
+        model = create_test_model([Product(["MGI:95537"], uniprot_id="P15692"), Product(["RGD:3774"], genename="P15692")])
+        self.assertIs(model.get_product("P15692"), model.products[0])
+        model.products[0].uniprot_id = None
+        self.assertIs(model.get_product("P15692"), model.products[1])
+
+class TestPruneProducts(unittest.TestCase):
+    """
+    prune_products merges the products, which share a value of any of the identifier fields, transitively (union-find).
+    """
+    def _id_synonym_groups(self, products):
+        return sorted(sorted(product.id_synonyms) for product in products)
+
+    def test_transitive_chain(self):
+        # A~B via uniprot_id, B~C via ensg_id, A and C don't share any identifier -> one product
+        model = create_test_model([
+            Product(["MGI:95537"], uniprot_id="P15692"),
+            Product(["RGD:3774"], uniprot_id="P15692", ensg_id="ENSG00000112715"),
+            Product(["ZFIN:ZDB-GENE-990415-282"], ensg_id="ENSG00000112715"),
+            Product(["MGI:1927664"], genename="SIRT3"),
+        ])
+        model.prune_products()
+        self.assertEqual(len(model.products), 2)
+        self.assertEqual(model.products[0].id_synonyms, ["MGI:95537", "RGD:3774", "ZFIN:ZDB-GENE-990415-282"])
+        self.assertEqual(model.products[0].uniprot_id, "P15692")
+        self.assertEqual(model.products[0].ensg_id, "ENSG00000112715")
+        self.assertEqual(model.products[1].id_synonyms, ["MGI:1927664"])
+        self.assertIs(model.get_product("ZFIN:ZDB-GENE-990415-282"), model.products[0])
+
+    def test_field_precedence(self):
+        # the first non-None value (in the order of self.products) of each field wins, the first product wins for duplicated score keys
+        model = create_test_model([
+            Product(["MGI:95537"], genename="VEGFA", description=None, enst_id="ENST00000372055", scores={"fisher": 1}),
+            Product(["RGD:3774"], genename="VEGFA", description="vascular endothelial growth factor A", enst_id="ENST00000523125", scores={"fisher": 2, "adv": 3}),
+            Product(["UniProtKB:P15692"], genename="VEGFA", description="other description", refseq_nt_id="NM_001025366"),
+        ])
+        model.prune_products()
+        self.assertEqual(len(model.products), 1)
+        product = model.products[0]
+        self.assertEqual(product.id_synonyms, ["MGI:95537", "RGD:3774", "UniProtKB:P15692"])
+        self.assertEqual(product.description, "vascular endothelial growth factor A")
+        self.assertEqual(product.enst_id, "ENST00000372055")
+        self.assertEqual(product.refseq_nt_id, "NM_001025366")
+        self.assertEqual(product.uniprot_id, "UniProtKB:P15692")
+        self.assertEqual(product.scores, {"fisher": 1, "adv": 3})
+
+    def test_default_fields_against_genename_only(self):
+        def create_products():
+            return [
+                Product(["MGI:95537"], genename="VEGFA", uniprot_id="P15692"),
+                Product(["RGD:3774"], genename="VEGFA"),
+                Product(["MGI:1927664"], genename="SIRT3"),
+                Product(["RGD:1308542"], genename="SIRT3"),
+                Product(["ZFIN:ZDB-GENE-040426-1"], genename="SIRT1"),
+                Product(["Xenbase:XB-GENE-5818802"]), # without a genename, never merged by genename
+                Product(["Xenbase:XB-GENE-1"], uniprot_id="P15692"), # shares only the uniprot_id with the first product
+            ]
+        # the former prune_products merged the products with the same genename
+        expected_genename_groups = [["MGI:1927664", "RGD:1308542"], ["MGI:95537", "RGD:3774"], ["Xenbase:XB-GENE-1"], ["Xenbase:XB-GENE-5818802"], ["ZFIN:ZDB-GENE-040426-1"]]
+
+        genename_model = create_test_model(create_products())
+        genename_model.prune_products(identifier_fields=["genename"])
+        self.assertEqual(self._id_synonym_groups(genename_model.products), expected_genename_groups)
+
+        # the default identifier fields merge a superset of the genename groups: here, also the product sharing the uniprot_id
+        default_model = create_test_model(create_products())
+        default_model.prune_products()
+        self.assertEqual(self._id_synonym_groups(default_model.products), [["MGI:1927664", "RGD:1308542"], ["MGI:95537", "RGD:3774", "Xenbase:XB-GENE-1"], ["Xenbase:XB-GENE-5818802"], ["ZFIN:ZDB-GENE-040426-1"]])
+
+        # without duplicates in the other identifier fields, the default identifier fields give the same products as the genename only pruning
+        products = create_products()[:-1]
+        default_model = create_test_model(products)
+        default_model.prune_products()
+        self.assertEqual(self._id_synonym_groups(default_model.products), expected_genename_groups[:2] + expected_genename_groups[3:])
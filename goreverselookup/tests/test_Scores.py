@@ -0,0 +1,171 @@
+import unittest
+
+import numpy as np
+import scipy.stats
+
+from goreverselookuplib.GOTerm import GOTerm
+from goreverselookuplib.Metrics import adv_product_score, nterms
+from goreverselookuplib.Model import Product
+from goreverselookuplib.StatisticsUtils import StatisticsUtil
+
+from .test_Model import create_test_model
+
+def create_test_contingency_tables(num_tables: int, seed: int = 0) -> list:
+    """
+    Returns 'num_tables' random 2x2 contingency tables [a, b, c, d] shaped like the fisher_exact_test tables (a: num_goterms_product_process,
+    a+b: num_goterms_all_process, a+c: num_goterms_product_general, total: num_goterms_all_general), followed by the edge cases.
+    """
+    rng = np.random.default_rng(seed)
+    tables = []
+    for _ in range(num_tables):
+        num_goterms_all_general = int(rng.integers(1, 3000))
+        num_goterms_all_process = int(rng.integers(0, min(num_goterms_all_general, 300) + 1))
+        num_goterms_product_general = int(rng.integers(0, min(num_goterms_all_general - num_goterms_all_process, 200) + 1)) + int(rng.integers(0, num_goterms_all_process + 1))
+        a = int(rng.integers(max(0, num_goterms_product_general - (num_goterms_all_general - num_goterms_all_process)), min(num_goterms_all_process, num_goterms_product_general) + 1))
+        tables.append([a, num_goterms_all_process - a, num_goterms_product_general - a, num_goterms_all_general - num_goterms_all_process - num_goterms_product_general + a])
+    tables += [
+        [0, 0, 0, 0], [0, 0, 5, 7], [3, 4, 0, 0], # zero rows
+        [0, 3, 0, 4], [3, 0, 4, 0], # zero columns
+        [0, 10, 20, 1000], [0, 1, 1, 0], [0, 250, 3, 18000], # a == 0
+        [1, 0, 0, 5], [5, 0, 2, 9], [4, 2, 0, 7], # b == 0 or c == 0
+    ]
+    return tables
+
+class TestFisherExact(unittest.TestCase):
+    """
+    StatisticsUtil.fisher_exact and fisher_required_a replace the per-table scipy.stats.fisher_exact calls (and the a+1, a+2, ... loop) of fisher_exact_test.
+    """
+    def test_fisher_exact_against_scipy(self):
+        tables = create_test_contingency_tables(500)
+        a, b, c, d = (np.array(column) for column in zip(*tables))
+        for alternative in ["two-sided", "less", "greater"]:
+            odds_ratios, pvalues = StatisticsUtil.fisher_exact(a, b, c, d, alternative=alternative, use_cache=False)
+            for i, table in enumerate(tables):
+                with self.subTest(table=table, alternative=alternative):
+                    scipy_result = scipy.stats.fisher_exact([table[:2], table[2:]], alternative=alternative)
+                    np.testing.assert_allclose(odds_ratios[i], scipy_result[0], rtol=1e-12, equal_nan=True)
+                    np.testing.assert_allclose(pvalues[i], scipy_result[1], rtol=1e-12)
+
+    def _required_a_loop(self, table: list, pvalue: float, significance: float) -> int:
+        """
+        The former fisher_exact_test loop: increments a (keeping the row and column sums) until the p-value is at most 'significance',
+        returns -1 if a table element turns negative or if the p-value increases.
+        """
+        a, b, c, d = table
+        previous_pvalue = pvalue
+        new_a = a
+        while previous_pvalue > significance:
+            new_a += 1
+            shift = new_a - a
+            new_table = [[new_a, b - shift], [c - shift, d + shift]]
+            if min(new_table[0] + new_table[1]) < 0:
+                return -1
+            new_pvalue = scipy.stats.fisher_exact(new_table)[1]
+            if new_pvalue > previous_pvalue:
+                return -1
+            previous_pvalue = new_pvalue
+        return new_a
+
+    def _check_required_a(self, tables: list, significance: float):
+        a, b, c, d = (np.array(column) for column in zip(*tables))
+        _, pvalues = StatisticsUtil.fisher_exact(a, b, c, d, use_cache=False)
+        required_a = StatisticsUtil.fisher_required_a(a, b, c, d, pvalues, significance=significance, use_cache=False)
+        for i, table in enumerate(tables):
+            with self.subTest(table=table, significance=significance):
+                if pvalues[i] > significance:
+                    self.assertEqual(required_a[i], self._required_a_loop(table, pvalues[i], significance))
+                else:
+                    self.assertEqual(required_a[i], table[0]) # already significant
+        return required_a
+
+    def test_fisher_required_a_against_loop(self):
+        self._check_required_a(create_test_contingency_tables(300, seed=1), significance=0.05)
+
+    def test_fisher_required_a_pvalue_at_significance(self):
+        # the significance is exactly the p-value of a shifted table -> the shifted table is significant (p-value <= significance)
+        table = [2, 60, 40, 1500]
+        shift = 3
+        _, shifted_pvalues = StatisticsUtil.fisher_exact([table[0] + shift], [table[1] - shift], [table[2] - shift], [table[3] + shift], use_cache=False)
+        self.assertEqual(shifted_pvalues[0], scipy.stats.fisher_exact([[table[0] + shift, table[1] - shift], [table[2] - shift, table[3] + shift]])[1])
+        required_a = self._check_required_a([table], significance=float(shifted_pvalues[0]))
+        self.assertEqual(required_a[0], table[0] + shift)
+        # a table with the p-value exactly at the significance is already significant
+        _, pvalues = StatisticsUtil.fisher_exact([table[0]], [table[1]], [table[2]], [table[3]], use_cache=False)
+        self.assertEqual(StatisticsUtil.fisher_required_a([table[0]], [table[1]], [table[2]], [table[3]], pvalues, significance=float(pvalues[0]), use_cache=False)[0], table[0])
+
+class TestBinomialTest(unittest.TestCase):
+    """
+    StatisticsUtil.binomtest_all replaces the per-product scipy.stats.binomtest calls of binomial_test.
+    """
+    def _create_tests(self, num_tests: int, seed: int = 0) -> tuple:
+        """
+        Returns (k, n, p) of 'num_tests' random binomial tests, followed by the edge cases.
+        """
+        rng = np.random.default_rng(seed)
+        n = rng.integers(0, 300, num_tests)
+        k = np.array([rng.integers(0, n_i + 1) for n_i in n])
+        p = rng.uniform(0.0001, 0.5, num_tests)
+        edge_cases = [(0, 0, 0.1), (0, 5, 0.1), (5, 5, 0.1), (1, 1, 0.5), (3, 10, 0.3), (0, 1000, 0.0001), (1000, 1000, 0.0001)]
+        k = np.concatenate([k, [case[0] for case in edge_cases]])
+        n = np.concatenate([n, [case[1] for case in edge_cases]])
+        p = np.concatenate([p, [case[2] for case in edge_cases]])
+        return k, n, p
+
+    def test_binomtest_all_against_scipy(self):
+        k, n, p = self._create_tests(300)
+        for alternative in ["greater", "less", "two-sided"]:
+            for use_cache in [False, True]:
+                pvalues = StatisticsUtil.binomtest_all(k, n, p, alternative=alternative, use_cache=use_cache)
+                for i in range(len(k)):
+                    with self.subTest(k=k[i], n=n[i], p=p[i], alternative=alternative, use_cache=use_cache):
+                        if n[i] == 0:
+                            self.assertEqual(pvalues[i], 1.0) # scipy.stats.binomtest raises a ValueError without trials
+                        else:
+                            np.testing.assert_allclose(pvalues[i], scipy.stats.binomtest(int(k[i]), int(n[i]), float(p[i]), alternative=alternative).pvalue, rtol=1e-10, atol=1e-300)
+
+    def test_binomtest_all_unknown_alternative(self):
+        self.assertRaises(ValueError, StatisticsUtil.binomtest_all, [1], [2], [0.5], alternative="both", use_cache=False)
+
+def create_synthetic_model(num_products: int, num_goterms: int, seed: int = 0):
+    """
+    Returns a model with random GO Terms (processes, directions and weights) annotated with random products (by their id synonyms),
+    including products without GO Terms and GO Terms of processes outside of the target processes.
+    """
+    rng = np.random.default_rng(seed)
+    products = [Product([f"UniProtKB:P{i:05d}"] + ([f"MGI:{i}"] if i % 3 == 0 else []), genename=f"GENE{i}") for i in range(num_products)]
+    product_ids = [product_id for product in products[:-5] for product_id in product.id_synonyms] # the last products have no GO Terms
+    goterms = []
+    for j in range(num_goterms):
+        processes = [{"process": str(rng.choice(["angio", "diabetes", "obesity"])), "direction": str(rng.choice(["+", "-", "0"]))} for _ in range(int(rng.integers(1, 4)))]
+        annotated_products = [str(product_id) for product_id in rng.choice(product_ids, size=int(rng.integers(0, 8)), replace=False)]
+        goterms.append(GOTerm(f"GO:{j:07d}", processes=processes, weight=float(rng.choice([0.5, 1.0, 2.0])), products=annotated_products))
+    target_processes = [{"process": "angio", "direction": "+"}, {"process": "diabetes", "direction": "-"}]
+    return create_test_model(products, goterms=goterms, target_processes=target_processes)
+
+class TestMetricAll(unittest.TestCase):
+    """
+    The vectorised metric_all of adv_product_score and nterms scores all products with the sparse incidence matrices of the model,
+    which have to give the same scores as 'metric' for each product.
+    """
+    def test_adv_product_score(self):
+        for seed in range(3):
+            model = create_synthetic_model(60, 40, seed=seed)
+            for scoring in [adv_product_score(model), adv_product_score(model, a=5, b1=1, b2=1.5, c1=0.5, c2=0.3)]:
+                with self.subTest(seed=seed, parameters=(scoring.a, scoring.b1, scoring.b2, scoring.c1, scoring.c2)):
+                    np.testing.assert_allclose(scoring.metric_all(model.products), [scoring.metric(product) for product in model.products], rtol=1e-12, atol=1e-12)
+
+    def test_nterms(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                model = create_synthetic_model(60, 40, seed=seed)
+                scoring = nterms(model)
+                self.assertEqual(scoring.metric_all(model.products), [scoring.metric(product) for product in model.products])
+
+    def test_products_subset(self):
+        # metric_all of a subset (in a different order) of self.products, which doesn't use the cached incidence matrix of self.products
+        model = create_synthetic_model(60, 40)
+        products = model.products[::-3]
+        scoring = adv_product_score(model)
+        np.testing.assert_allclose(scoring.metric_all(products), [scoring.metric(product) for product in products], rtol=1e-12, atol=1e-12) # the sums differ in the order of the floating point additions
+        scoring = nterms(model)
+        self.assertEqual(scoring.metric_all(products), [scoring.metric(product) for product in products])
@@ -1,12 +1,14 @@
 # The main class
 from goreverselookuplib import ReverseLookup
 from goreverselookuplib.AnnotationProcessor import GOAnnotiationsFile
-from goreverselookuplib.Workflows import WorkflowOne, WorkflowTwo
+from goreverselookuplib.Workflows import WorkflowOne, WorkflowTwo, WorkflowPrewarm
 from goreverselookuplib.AnnotationProcessor import GOApi
 from goreverselookuplib.JsonUtil import SimpleNamespaceUtil, JsonToClass
 from goreverselookuplib.AnnotationProcessor import HumanOrthologFinder, UniProtAPI, EnsemblAPI, GOAnnotiationsFile
 from goreverselookuplib.CacheUtils import ConnectionCacher, Cacher
+from goreverselookuplib.HttpTransport import HttpTransport
 from goreverselookuplib.Metrics import fisher_exact_test, adv_product_score, nterms, binomial_test
+from goreverselookuplib.StatisticsUtils import StatisticsCache
 
 import logging
 
@@ -21,6 +23,12 @@ file_handler.setFormatter(logging.Formatter('%(asctime)s [%(filename)s:%(lineno)
 logger = logging.getLogger(__name__)
 
 Cacher.init()
+# Cacher.init(write_behind=True) # queues the cache writes for a background thread (only in the main process, not in pool workers)
+# Cacher.init(backend="sqlite") # stores the cache in cache/cache.sqlite3 with per-entry writes; the json cache files are imported on the first run
+# StatisticsCache.init() # persists the memoised Fisher/binomial test results in cache/statistics_cache.json across runs
+# HttpTransport.init(mode="record") # records the server responses into cache/http_archive.jsonl.gz
+# HttpTransport.init(mode="replay", latency=0.05, rate_limit_rate=0.02, seed=42) # replays the recorded responses from a local server, without network
+# WorkflowPrewarm(input_file_fpath="chronic_infl_cancer_1/input_03-09-2023.txt").run_workflow() # fetches only the requests missing from the cache, eg. overnight
 workflow = WorkflowTwo(input_file_fpath="chronic_infl_cancer_1/input_03-09-2023.txt", save_folder_dir="chronic_infl_cancer_1")
 workflow.run_workflow()
 